@@ -1,8 +1,11 @@
 from flask import Flask, render_template
 from flask_cors import CORS
 from database.db import init_db
-from routes.health_routes import health_bp
+from routes.health_routes import health_bp, requeue_pending_reports
+from models.predict_simple import request_reload
 import os
+import signal
+import threading
 
 def create_app():
     app = Flask(__name__)
@@ -13,6 +16,14 @@ def create_app():
     
     # Register routes
     app.register_blueprint(health_bp, url_prefix="/api")
+
+    # Reports a previous run stored but never scored (REPORT_ASYNC_SCORING)
+    requeue_pending_reports()
+
+    # `kill -HUP <pid>` makes this process pick up a newly activated model on its next prediction
+    reload_signal = getattr(signal, os.environ.get("MODEL_RELOAD_SIGNAL", "SIGHUP"), None)
+    if reload_signal is not None and threading.current_thread() is threading.main_thread():
+        signal.signal(reload_signal, request_reload)
     
     @app.route("/")
     def home():
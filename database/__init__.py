@@ -7,6 +7,9 @@ from .db import (
     init_db,
     get_collection,
     close_db,
+    get_pool_stats,
+    flush_writes,
+    BulkWriteError,
 )
 from .migration_db import create_unique_index_with_report, find_duplicate_values
 import os
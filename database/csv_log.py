@@ -0,0 +1,428 @@
+# database/csv_log.py
+"""
+Helpers for the append-only reports CSV log.
+
+`tail_records` returns the last rows of a CSV file without parsing the whole
+file: it reads fixed-size blocks backwards from the end and finds record
+boundaries by quote parity (a newline ends a record only when the text after
+it contains an even number of `"` characters), so quoted fields such as
+"Mild fever, stomach upset" - including ones spanning lines - are handled.
+Only the returned rows are parsed.
+
+With `use_index=True` a sidecar `<file>.idx` holding the byte offset of every
+record is kept up to date incrementally, which makes deep pages O(limit).
+
+`CSVAuditLog` is the matching writer: buffered, rotating, and safe to share
+between worker processes.
+"""
+import atexit
+import csv
+import gzip
+import hashlib
+import io
+import logging
+import os
+import shutil
+import struct
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows - index updates are not cross-process locked
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 64 * 1024
+
+# Sidecar index layout: magic, inode, covered bytes, header end, length and hash
+# of the first record (0 until there is one), then uint64 offsets
+_INDEX_MAGIC = b"CSVIDX2\0"
+_INDEX_HEADER = struct.Struct("<8sQQQQ8s")
+_NO_RECORD = bytes(8)
+
+
+def read_header(path: str) -> Tuple[List[str], int]:
+    """Return the CSV header fields and the byte offset where data starts."""
+    with open(path, "rb") as f:
+        line = f.readline()
+    fields = next(csv.reader([line.decode("utf-8-sig")]), [])
+    return fields, len(line)
+
+
+def _scan_backward(f, header_end: int, end: int, count: int) -> List[int]:
+    """Start offsets of (up to) the last `count` records in [header_end, end), ascending."""
+    starts: List[int] = []
+    quotes = 0
+    pos = end
+    while pos > header_end and len(starts) < count:
+        start = max(header_end, pos - BLOCK_SIZE)
+        f.seek(start)
+        chunk = f.read(pos - start)
+        j = len(chunk)
+        while len(starts) < count:
+            k = chunk.rfind(b"\n", 0, j)
+            if k < 0:
+                quotes += chunk.count(b'"', 0, j)
+                break
+            quotes += chunk.count(b'"', k + 1, j)
+            record_start = start + k + 1
+            # An even number of quotes after the newline means it is outside a quoted field
+            if quotes % 2 == 0 and record_start < end:
+                starts.append(record_start)
+            j = k
+        pos = start
+    if pos <= header_end and len(starts) < count and header_end < end:
+        starts.append(header_end)
+    starts.reverse()
+    return starts
+
+
+def _scan_forward(f, start: int, end: int) -> Tuple[List[int], int]:
+    """Record start offsets in [start, end) and the end of the last complete record."""
+    starts: List[int] = []
+    complete = start
+    record_start = start
+    quotes = 0
+    pos = start
+    f.seek(start)
+    while pos < end:
+        chunk = f.read(min(BLOCK_SIZE, end - pos))
+        if not chunk:
+            break
+        i = 0
+        while True:
+            k = chunk.find(b"\n", i)
+            if k < 0:
+                quotes += chunk.count(b'"', i)
+                break
+            quotes += chunk.count(b'"', i, k)
+            i = k + 1
+            if quotes % 2 == 0:
+                starts.append(record_start)
+                record_start = complete = pos + i
+                quotes = 0
+        pos += len(chunk)
+    return starts, complete
+
+
+def _parse(f, fields: List[str], start: int, end: int) -> List[Dict[str, str]]:
+    f.seek(start)
+    text = f.read(end - start).decode("utf-8")
+    return list(csv.DictReader(io.StringIO(text, newline=""), fieldnames=fields))
+
+
+def tail_records(path: str, limit: int, offset: int = 0, use_index: bool = False) -> List[Dict[str, str]]:
+    """Last `limit` records of a CSV file (skipping the `offset` newest), oldest first."""
+    if limit <= 0 or not os.path.exists(path):
+        return []
+    fields, header_end = read_header(path)
+    if not fields:
+        return []
+
+    if use_index:
+        try:
+            return _tail_with_index(path, fields, header_end, limit, offset)
+        except OSError as e:
+            logger.warning(f"CSV offset index unavailable, scanning instead: {e}")
+
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        starts = _scan_backward(f, header_end, end, limit + offset)
+        if offset:
+            if len(starts) <= offset:
+                return []
+            end = starts[-offset]
+            starts = starts[:-offset]
+        if not starts:
+            return []
+        return _parse(f, fields, starts[0], end)
+
+
+def index_path(path: str) -> str:
+    return path + ".idx"
+
+
+def remove_index(path: str):
+    """Delete the sidecar index of a CSV that was removed or rotated away."""
+    try:
+        os.remove(index_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def _record_hash(f, start: int, length: int) -> bytes:
+    f.seek(start)
+    return hashlib.blake2b(f.read(length), digest_size=8).digest()
+
+
+def _tail_with_index(path, fields, header_end, limit, offset):
+    count, covered = update_index(path)
+    if count <= offset:
+        return []
+    first = max(0, count - offset - limit)
+    last = count - offset  # exclusive
+    with open(index_path(path), "rb") as idx:
+        idx.seek(_INDEX_HEADER.size + first * 8)
+        offsets = array("Q")
+        offsets.frombytes(idx.read((last - first) * 8))
+        end = covered
+        if last < count:
+            end_offset = array("Q")
+            end_offset.frombytes(idx.read(8))
+            end = end_offset[0]
+    with open(path, "rb") as f:
+        return _parse(f, fields, offsets[0], end)
+
+
+def update_index(path: str) -> Tuple[int, int]:
+    """Bring the sidecar offset index up to date; returns (record count, bytes covered).
+
+    Only the part of the CSV appended since the last update is scanned. The
+    index is rebuilt if the CSV was replaced or truncated: besides the inode
+    and size it records a hash of the first record, because a recreated file
+    can reuse the inode.
+    """
+    stat = os.stat(path)
+    _, header_end = read_header(path)
+    idx_file = index_path(path)
+    mode = "r+b" if os.path.exists(idx_file) else "w+b"
+    with open(idx_file, mode) as idx, open(path, "rb") as f:
+        if fcntl is not None:
+            fcntl.flock(idx.fileno(), fcntl.LOCK_EX)
+        try:
+            raw = idx.read(_INDEX_HEADER.size)
+            valid = False
+            if len(raw) == _INDEX_HEADER.size:
+                magic, inode, covered, stored_header_end, first_len, first_hash = _INDEX_HEADER.unpack(raw)
+                valid = (magic == _INDEX_MAGIC and inode == stat.st_ino
+                         and stored_header_end == header_end and covered <= stat.st_size
+                         and (first_hash == _NO_RECORD
+                              or _record_hash(f, header_end, first_len) == first_hash))
+            if not valid:
+                covered, first_len, first_hash = header_end, 0, _NO_RECORD
+                idx.seek(0)
+                idx.truncate()
+                idx.write(_INDEX_HEADER.pack(_INDEX_MAGIC, stat.st_ino, covered, header_end, 0, _NO_RECORD))
+
+            if covered < stat.st_size:
+                starts, complete = _scan_forward(f, covered, stat.st_size)
+                if starts:
+                    if first_hash == _NO_RECORD:
+                        first_len = (starts[1] if len(starts) > 1 else complete) - starts[0]
+                        first_hash = _record_hash(f, starts[0], first_len)
+                    idx.seek(0, os.SEEK_END)
+                    idx.write(array("Q", starts).tobytes())
+                    covered = complete
+                    idx.seek(0)
+                    idx.write(_INDEX_HEADER.pack(_INDEX_MAGIC, stat.st_ino, covered, header_end,
+                                                 first_len, first_hash))
+
+            count = (idx.seek(0, os.SEEK_END) - _INDEX_HEADER.size) // 8
+            return count, covered
+        finally:
+            if fcntl is not None:
+                fcntl.flock(idx.fileno(), fcntl.LOCK_UN)
+
+
+class CSVAuditLog:
+    """Buffered, rotating append-only CSV log shared safely between processes.
+
+    Rows are formatted into an in-memory buffer and written with a single
+    `os.write` on an O_APPEND descriptor when `flush_rows` rows are pending
+    or `flush_interval` seconds have passed (a background thread handles the
+    time threshold). Each flush holds an exclusive `flock` on `<path>.lock`,
+    so rows from several worker processes never interleave, and checks
+    whether another process rotated the file underneath us.
+
+    The file is rotated to `<path>.<YYYYmmdd-HHMMSS>` (gzip-compressed in the
+    background) once it would exceed `max_bytes`, or at the first flush of a
+    new day with `rotate_daily=True`.
+    """
+
+    def __init__(self, path: str, header: List[str], flush_rows: int = 64,
+                 flush_interval: float = 1.0, max_bytes: int = 0,
+                 rotate_daily: bool = False, compress: bool = True):
+        self.path = path
+        self.header = list(header)
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._pending = 0
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._counters = {
+            "rows": 0, "flushes": 0, "bytes": 0, "rotations": 0,
+            "flush_ms_total": 0.0, "flush_ms_max": 0.0, "flush_ms_last": 0.0,
+        }
+        self._thread: Optional[threading.Thread] = None
+        if flush_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="csv-audit-log", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, row: List[Any]):
+        """Queue one row; flushes immediately once `flush_rows` rows are pending."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("audit log is closed")
+            self._writer.writerow(row)
+            self._pending += 1
+            if self._pending >= self.flush_rows:
+                self._flush_locked()
+
+    def flush(self):
+        """Write all pending rows to the file."""
+        with self._lock:
+            self._flush_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters, pending=self._pending)
+        flushes = stats["flushes"]
+        stats["flush_ms_avg"] = stats["flush_ms_total"] / flushes if flushes else 0.0
+        return stats
+
+    def clear(self):
+        """Drop pending rows and delete the current file (rotated archives are kept)."""
+        with self._lock, self._file_lock():
+            self._reset_buffer()
+            self._close_fd()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            remove_index(self.path)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._close_fd()
+            self._closed = True
+        self._wake.set()
+        atexit.unregister(self.close)
+
+    # -- internals --------------------------------------------------------
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            if self._closed:
+                return
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error(f"CSV audit log flush failed: {e}")
+
+    def _reset_buffer(self):
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._pending = 0
+
+    @contextmanager
+    def _file_lock(self):
+        fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # closing the descriptor releases the flock
+
+    def _close_fd(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _open(self) -> int:
+        """Descriptor for the current file, reopening it if it was rotated or removed."""
+        if self._fd is not None:
+            try:
+                current = os.stat(self.path)
+                mine = os.fstat(self._fd)
+                if (current.st_ino, current.st_dev) == (mine.st_ino, mine.st_dev):
+                    return self._fd
+            except FileNotFoundError:
+                pass
+            self._close_fd()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def _header_bytes(self) -> bytes:
+        out = io.StringIO()
+        csv.writer(out).writerow(self.header)
+        return out.getvalue().encode("utf-8")
+
+    def _needs_rotation(self, st: os.stat_result, incoming: int) -> bool:
+        if st.st_size == 0:
+            return False
+        if self.max_bytes and st.st_size + incoming > self.max_bytes:
+            return True
+        if self.rotate_daily:
+            return datetime.fromtimestamp(st.st_mtime).date() != datetime.now().date()
+        return False
+
+    def _rotate(self, st: os.stat_result):
+        stamp = datetime.fromtimestamp(st.st_mtime).strftime("%Y%m%d-%H%M%S")
+        target = f"{self.path}.{stamp}"
+        n = 1
+        while os.path.exists(target) or os.path.exists(target + ".gz"):
+            target = f"{self.path}.{stamp}.{n}"
+            n += 1
+        os.rename(self.path, target)
+        remove_index(self.path)
+        self._close_fd()
+        self._counters["rotations"] += 1
+        logger.info(f"✅ Rotated {self.path} -> {target}")
+        if self.compress:
+            threading.Thread(target=_gzip_file, args=(target,), daemon=True).start()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        started = time.perf_counter()
+        data = self._buffer.getvalue().encode("utf-8")
+        with self._file_lock():
+            fd = self._open()
+            st = os.fstat(fd)
+            if self._needs_rotation(st, len(data)):
+                self._rotate(st)
+                fd = self._open()
+                st = os.fstat(fd)
+            if st.st_size == 0:
+                data = self._header_bytes() + data
+            # One write of whole rows on an O_APPEND descriptor under the lock
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        counters = self._counters
+        counters["rows"] += self._pending
+        counters["flushes"] += 1
+        counters["bytes"] += len(data)
+        counters["flush_ms_total"] += elapsed_ms
+        counters["flush_ms_last"] = elapsed_ms
+        counters["flush_ms_max"] = max(counters["flush_ms_max"], elapsed_ms)
+        self._reset_buffer()
+
+
+def _gzip_file(path: str):
+    try:
+        with open(path, "rb") as src, gzip.open(path + ".gz.tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(path + ".gz.tmp", path + ".gz")
+        os.remove(path)
+    except OSError as e:
+        logger.error(f"Failed to compress rotated log {path}: {e}")
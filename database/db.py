@@ -10,7 +10,10 @@ from .sqlite_db import (
     init_db as sqlite_init_db,
     get_collection as sqlite_get_collection,
     close_db as sqlite_close_db,
+    get_pool_stats as sqlite_get_pool_stats,
+    flush_writes as sqlite_flush_writes,
     COLLECTIONS,
+    BulkWriteError,
     mongo as sqlite_mongo
 )
 
@@ -46,6 +49,16 @@ def get_collection(name: str):
     return sqlite_get_collection(name)
 
 
+def get_pool_stats():
+    """Connection pool counters (checkouts, waits, open connections)."""
+    return sqlite_get_pool_stats()
+
+
+def flush_writes():
+    """Wait for queued write-behind inserts to be committed."""
+    sqlite_flush_writes()
+
+
 def close_db():
     """Close database connection."""
     sqlite_close_db()
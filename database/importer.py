@@ -0,0 +1,319 @@
+# database/importer.py
+"""
+Streaming bulk import of CSV / NDJSON files into the SQLite store.
+
+    python -m database.importer database/reports.csv --source reports
+    python -m database.importer models/outbreak_master.csv --source outbreaks
+    python -m database.importer exports/reports.ndjson --source reports
+
+Rows are read one record at a time (the file is never loaded whole), coerced
+to the target column types and inserted in chunked transactions. Secondary
+indexes on the target table are dropped for the duration of the import and
+rebuilt once at the end. The byte offset of the last committed row is stored
+in the `import_checkpoints` table in the same transaction as the rows, so an
+interrupted import resumes exactly where it stopped when re-run.
+
+Rows carry no dedup key, so the checkpoint also records a fingerprint of the
+file (its first record, header included). A file whose fingerprint changed is
+not resumed, and a file that was already imported is not imported again
+unless forced.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import sqlite_db
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "2000"))
+
+_INT_RE = re.compile(r"^[+-]?\d+$")
+_DDMMYY_RE = re.compile(r"^\d{1,2}-\d{1,2}-\d{2}$")
+
+
+def to_int(value):
+    """'05' -> 5; empty -> None; anything else is kept as-is."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str) and _INT_RE.match(value.strip()):
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def to_float(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def to_date(value):
+    """'02-01-19' (DD-MM-YY) -> '2019-01-02'; unparseable values are kept as-is."""
+    if not value or not isinstance(value, str) or not _DDMMYY_RE.match(value.strip()):
+        return value or None
+    try:
+        return datetime.strptime(value.strip(), "%d-%m-%y").date().isoformat()
+    except ValueError:
+        return value
+
+
+def _column_types(conn, table: str) -> Dict[str, Callable]:
+    """Coercions for a table's structured columns, from its declared SQLite types."""
+    coerce = {"INTEGER": to_int, "REAL": to_float}
+    rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    return {row[1]: coerce[row[2]] for row in rows if row[2] in coerce and row[1] != "id"}
+
+
+def _outbreak_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    # Free-text comments contain unquoted commas, which spill into extra columns
+    extra = row.pop(None, None)
+    if extra:
+        row["Comments"] = ",".join([row.get("Comments") or ""] + extra)
+    row["location_name"] = row.get("District")
+    row["timestamp"] = to_date(row.get("Start_Date"))
+    return row
+
+
+# Known import sources: target table, per-field coercions, an optional row hook and
+# the schema's own indexes (recreated by create_tables) that are dropped for the load
+SOURCES: Dict[str, Dict[str, Any]] = {
+    "reports": {"table": "reports", "types": {}, "transform": None,
+                "indexes": ("idx_reports_ai_status", "idx_reports_timestamp")},
+    "outbreaks": {
+        "table": "datasets",
+        "indexes": ("idx_datasets_location",),
+        "types": {"Cases": to_int, "Deaths": to_int, "Start_Date": to_date, "Report_Date": to_date},
+        "transform": _outbreak_row,
+    },
+}
+
+
+def iter_csv(path: str, start: int = 0) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Yield (row, end offset) for each CSV record from byte offset `start`.
+
+    Records are split on newlines outside quoted fields, so the offset after
+    every record is known and can be checkpointed.
+    """
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8-sig")]), [])
+        if start:
+            f.seek(start)
+        pending = b""
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            pending += line
+            if pending.count(b'"') % 2:
+                continue  # newline inside a quoted field
+            record, pending = pending.decode("utf-8"), b""
+            if not record.strip():
+                continue
+            values = next(csv.reader([record]))
+            row: Dict[Any, Any] = dict(zip(header, values))
+            if len(values) > len(header):
+                row[None] = values[len(header):]
+            yield row, f.tell()
+
+
+def iter_ndjson(path: str, start: int = 0) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Yield (object, end offset) for each line of a newline-delimited JSON file."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        for line in iter(f.readline, b""):
+            if line.strip():
+                yield json.loads(line), f.tell()
+
+
+def fingerprint(reader: Callable, path: str) -> Optional[str]:
+    """Hash of a file's first record (CSV rows are keyed by the header), or None if it is empty."""
+    for row, _ in reader(path):
+        row.pop(None, None)
+        return hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return None
+
+
+def _load_checkpoint(conn, path: str, digest: Optional[str], force: bool = False) -> Tuple[int, int]:
+    row = conn.execute(
+        "SELECT byte_offset, rows, size, fingerprint FROM import_checkpoints WHERE source = ?", (path,)
+    ).fetchone()
+    if row is None:
+        return 0, 0
+    offset, rows, size, stored = row
+    if stored is not None and stored != digest:
+        if not force:
+            raise ValueError(f"{path} is not the file that was imported before ({rows} rows); "
+                             f"its rows would be inserted again. Pass force=True (--force) to import it anyway")
+        logger.warning(f"⚠️ {path} changed since the last import, starting over")
+        return 0, 0
+    if size > os.path.getsize(path):
+        if not force:
+            raise ValueError(f"{path} shrank since the last import ({rows} rows); "
+                             f"pass force=True (--force) to import it from the start")
+        logger.warning(f"⚠️ {path} shrank since the last import, starting over")
+        return 0, 0
+    return offset, rows
+
+
+def _drop_indexes(conn, table: str, names: Tuple[str, ...]) -> List[str]:
+    """Drop the named non-unique indexes of a table and return the SQL to recreate them.
+
+    Only schema-owned indexes are named here: create_tables() recreates them if
+    an import is killed before the rebuild, and none of them can fail to
+    rebuild over the imported rows. UNIQUE, migration and user indexes stay.
+    """
+    unique = {row[1] for row in conn.execute(f"PRAGMA index_list({table})") if row[2]}
+    indexes = [
+        (name, sql) for name, sql in conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,),
+        )
+        if name in names and name not in unique
+    ]
+    with conn:
+        for name, _ in indexes:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+    return [sql for _, sql in indexes]
+
+
+def import_file(path: str, source: str = "reports", fmt: Optional[str] = None,
+                chunk_size: int = IMPORT_CHUNK_SIZE, restart: bool = False, force: bool = False) -> Dict[str, Any]:
+    """Import a CSV/NDJSON file; returns {"rows", "skipped", "seconds", "rows_per_sec"}.
+
+    `restart` ignores the checkpoint of a partial import. Re-importing a file
+    that was imported before (restart after rows were committed, or a file
+    replaced under the same path) raises ValueError unless `force` is set,
+    since the rows would be duplicated.
+
+    Requires init_db() to have been called.
+    """
+    spec = SOURCES[source]
+    table = spec["table"]
+    fmt = fmt or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+    reader = iter_ndjson if fmt == "ndjson" else iter_csv
+    transform = spec["transform"]
+    insert_sql = sqlite_db._insert_sql(table)
+    abs_path = os.path.abspath(path)
+    stamp_created = "created_at" in sqlite_db.table_columns(table)
+    digest = fingerprint(reader, abs_path)
+
+    with sqlite_db.write_connection() as conn:
+        types = {**_column_types(conn, table), **spec["types"]}
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS import_checkpoints (
+                source TEXT PRIMARY KEY,
+                byte_offset INTEGER,
+                rows INTEGER,
+                size INTEGER,
+                updated_at TEXT,
+                fingerprint TEXT
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(import_checkpoints)")}
+        if "fingerprint" not in columns:
+            conn.execute("ALTER TABLE import_checkpoints ADD COLUMN fingerprint TEXT")
+        offset, done = _load_checkpoint(conn, abs_path, digest, force)
+        if restart:
+            if done and not force:
+                raise ValueError(f"{path} was already imported ({done} rows); restarting would insert them "
+                                 f"again. Pass force=True (--force) to import it anyway")
+            offset, done = 0, 0
+            with conn:
+                conn.execute("DELETE FROM import_checkpoints WHERE source = ?", (abs_path,))
+        if done:
+            logger.info(f"↩️ Resuming {path} after {done} rows (byte {offset})")
+
+        index_sql = _drop_indexes(conn, table, spec["indexes"])
+        imported = 0
+        started = time.perf_counter()
+        try:
+            chunk: List[tuple] = []
+            for row, end in reader(abs_path, offset):
+                if transform:
+                    row = transform(row)
+                row.pop(None, None)
+                for field, coerce in types.items():
+                    if field in row:
+                        row[field] = coerce(row[field])
+                if stamp_created:
+                    row.setdefault("created_at", datetime.utcnow())
+                chunk.append(sqlite_db._insert_values(table, row))
+                offset = end
+                if len(chunk) >= chunk_size:
+                    imported += _commit_chunk(conn, insert_sql, chunk, abs_path, offset, done + imported, digest)
+                    chunk = []
+                    _log_rate(path, done + imported, imported, started)
+            if chunk:
+                imported += _commit_chunk(conn, insert_sql, chunk, abs_path, offset, done + imported, digest)
+        finally:
+            index_started = time.perf_counter()
+            with conn:
+                for sql in index_sql:
+                    conn.execute(sql)
+            if index_sql:
+                logger.info(f"✅ Rebuilt {len(index_sql)} index(es) on {table} "
+                            f"in {time.perf_counter() - index_started:.2f}s")
+
+    seconds = time.perf_counter() - started
+    rate = imported / seconds if seconds > 0 else 0.0
+    logger.info(f"✅ Imported {imported} rows from {path} into {table} "
+                f"in {seconds:.2f}s ({rate:,.0f} rows/sec)")
+    return {"rows": imported, "skipped": done, "seconds": seconds, "rows_per_sec": rate}
+
+
+def _commit_chunk(conn, sql: str, chunk: List[tuple], source: str, offset: int, total: int,
+                  digest: Optional[str]) -> int:
+    """Insert a chunk and advance the checkpoint in the same transaction."""
+    with conn:
+        conn.executemany(sql, chunk)
+        conn.execute(
+            "INSERT OR REPLACE INTO import_checkpoints (source, byte_offset, rows, size, updated_at, fingerprint) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (source, offset, total + len(chunk), os.path.getsize(source), datetime.utcnow().isoformat(), digest),
+        )
+    return len(chunk)
+
+
+def _log_rate(path: str, total: int, imported: int, started: float):
+    elapsed = time.perf_counter() - started
+    if elapsed > 0:
+        logger.info(f"   {path}: {total} rows ({imported / elapsed:,.0f} rows/sec)")
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Bulk import CSV/NDJSON into the SQLite store")
+    parser.add_argument("path")
+    parser.add_argument("--source", choices=sorted(SOURCES), default="reports")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default=None)
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    parser.add_argument("--force", action="store_true",
+                        help="import even if this file (or a different one at this path) was imported before")
+    args = parser.parse_args(argv)
+
+    sqlite_db.init_db()
+    try:
+        import_file(args.path, args.source, args.format, args.chunk_size, args.restart, args.force)
+    finally:
+        sqlite_db.close_db()
+
+
+if __name__ == "__main__":
+    main()
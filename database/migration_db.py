@@ -8,17 +8,32 @@ logger = logging.getLogger(__name__)
 
 
 def find_duplicate_values(collection, field):
-    """Find duplicate values for a given field in a collection."""
-    # SQLite version - simplified without MongoDB aggregation
-    # This is a stub for compatibility
-    logger.info("find_duplicate_values is not fully implemented for SQLite")
-    return []
+    """Find duplicate values for a given field in a collection.
+
+    Returns [{"_id": value, "count": n}, ...], most duplicated first. The
+    grouping runs in SQLite as a single GROUP BY ... HAVING query.
+    """
+    pipeline = [
+        {"$match": {field: {"$exists": True}}},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1}},
+    ]
+    return list(collection.aggregate(pipeline))
 
 
 def create_unique_index_with_report(collection, field):
     """Report duplicates before creating a unique index."""
-    # SQLite version - indexes are already created in schema
-    logger.info("✅ Unique index already exists on '%s.%s' (SQLite schema)", collection.name, field)
+    duplicates = find_duplicate_values(collection, field)
+    if duplicates:
+        logger.error("❌ Cannot create unique index on '%s.%s': %d duplicate value(s)",
+                     collection.name, field, len(duplicates))
+        for dup in duplicates[:20]:
+            logger.error("   %r appears %d times", dup["_id"], dup["count"])
+        return False
+
+    collection.create_index(field, unique=True)
+    logger.info("✅ Unique index ready on '%s.%s'", collection.name, field)
     return True
 
 
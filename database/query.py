@@ -0,0 +1,340 @@
+# database/query.py
+"""
+Compile MongoDB-style filter documents into parameterized SQLite WHERE clauses.
+
+Structured columns are compared directly (so the table indexes apply); any
+other field is read from the JSON `data` column with json_extract().
+Compiled SQL is cached per query *shape* - the operators and field names
+without the values - so repeated queries only pay for collecting parameters.
+
+Aggregation pipelines ($match, $group, $sort, $limit) compile the same way
+into a single GROUP BY statement.
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+COMPARISON_OPS = {
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+}
+SUPPORTED_OPS = set(COMPARISON_OPS) | {"$eq", "$ne", "$in", "$nin", "$exists"}
+
+
+def _bind(value):
+    """Normalize a query value to what is stored in SQLite."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def field_sql(field: str, columns: Iterable[str]) -> str:
+    """SQL expression for a document field."""
+    if field == "_id":
+        return "id"
+    if field in columns:
+        return field
+    if not _FIELD_RE.match(field):
+        raise ValueError(f"Invalid field name: {field!r}")
+    return f"json_extract(data, '$.{field}')"
+
+
+def _shape(query: Dict[str, Any], params: List[Any]) -> tuple:
+    """Walk a filter once, returning its hashable shape and appending bound values."""
+    parts = []
+    for key, value in query.items():
+        if key in ("$and", "$or"):
+            if not isinstance(value, (list, tuple)) or not value:
+                raise ValueError(f"{key} expects a non-empty list")
+            parts.append((key, tuple(_shape(sub, params) for sub in value)))
+            continue
+        if key.startswith("$"):
+            raise ValueError(f"Unsupported operator: {key}")
+
+        if isinstance(value, dict) and value and all(k.startswith("$") for k in value):
+            ops = []
+            for op, arg in value.items():
+                if op not in SUPPORTED_OPS:
+                    raise ValueError(f"Unsupported operator: {op}")
+                if op in ("$in", "$nin"):
+                    values = [_bind(v) for v in arg]
+                    params.extend(values)
+                    ops.append((op, len(values)))
+                elif op == "$exists":
+                    ops.append((op, bool(arg)))
+                elif arg is None:
+                    ops.append((op, None))
+                else:
+                    params.append(_bind(arg))
+                    ops.append((op, "?"))
+            parts.append(("field", key, tuple(ops)))
+        elif isinstance(value, (dict, list, tuple)):
+            raise ValueError(f"Unsupported value for field {key!r}")
+        elif value is None:
+            parts.append(("field", key, (("$eq", None),)))
+        else:
+            params.append(_bind(value))
+            parts.append(("field", key, (("$eq", "?"),)))
+    return tuple(parts)
+
+
+def _op_sql(expr: str, op: str, arg) -> str:
+    if op == "$eq":
+        return f"{expr} IS NULL" if arg is None else f"{expr} = ?"
+    if op == "$ne":
+        # Mongo's $ne also matches documents where the field is missing
+        return f"{expr} IS NOT NULL" if arg is None else f"({expr} IS NULL OR {expr} != ?)"
+    if op == "$exists":
+        return f"{expr} IS NOT NULL" if arg else f"{expr} IS NULL"
+    if op == "$in":
+        return f"{expr} IN ({', '.join('?' * arg)})" if arg else "0"
+    if op == "$nin":
+        return f"({expr} IS NULL OR {expr} NOT IN ({', '.join('?' * arg)}))" if arg else "1"
+    if arg is None:
+        # Ordering comparisons against null never match
+        return "0"
+    return f"{expr} {COMPARISON_OPS[op]} ?"
+
+
+def _alias_sql(field: str, outputs: tuple) -> str:
+    """Quoted reference to an output column of a $group stage."""
+    # SQLite reads an unknown double-quoted identifier as a string literal
+    if field not in outputs:
+        raise ValueError(f"Unknown field after $group: {field!r} (have {', '.join(outputs)})")
+    return f'"{field}"'
+
+
+def _where_sql(shape: tuple, columns: frozenset, aliases: Optional[tuple] = None) -> str:
+    clauses = []
+    for part in shape:
+        if part[0] == "$and":
+            clauses.append("(" + " AND ".join(_where_sql(sub, columns, aliases) for sub in part[1]) + ")")
+        elif part[0] == "$or":
+            clauses.append("(" + " OR ".join(_where_sql(sub, columns, aliases) for sub in part[1]) + ")")
+        else:
+            _, field, ops = part
+            expr = _alias_sql(field, aliases) if aliases is not None else field_sql(field, columns)
+            clauses.extend(_op_sql(expr, op, arg) for op, arg in ops)
+    return " AND ".join(clauses) if clauses else "1"
+
+
+@lru_cache(maxsize=512)
+def _compile_select(table: str, columns: frozenset, select: str, shape: tuple,
+                    sort: Tuple[Tuple[str, int], ...], limited: bool) -> str:
+    sql = f"SELECT {select} FROM {table}"
+    if shape:
+        sql += f" WHERE {_where_sql(shape, columns)}"
+    if sort:
+        order = ", ".join(
+            f"{field_sql(field, columns)} {'ASC' if direction == 1 else 'DESC'}"
+            for field, direction in sort
+        )
+        sql += f" ORDER BY {order}"
+    if limited:
+        sql += " LIMIT ?"
+    return sql
+
+
+def compile_find(table: str, columns: frozenset, query: Optional[Dict[str, Any]] = None,
+                 sort: Tuple[Tuple[str, int], ...] = (), limit: Optional[int] = None,
+                 select: str = "*") -> Tuple[str, List[Any]]:
+    """Compile a find() into (sql, params)."""
+    params: List[Any] = []
+    shape = _shape(query, params) if query else ()
+    sql = _compile_select(table, columns, select, shape, tuple(sort), bool(limit))
+    if limit:
+        params.append(int(limit))
+    return sql, params
+
+
+def compile_where(columns: frozenset, query: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """Compile just the WHERE condition of a filter into (sql, params)."""
+    params: List[Any] = []
+    shape = _shape(query, params) if query else ()
+    return _cached_where(shape, columns), params
+
+
+@lru_cache(maxsize=512)
+def _cached_where(shape: tuple, columns: frozenset) -> str:
+    return _where_sql(shape, columns) if shape else "1"
+
+
+ACCUMULATORS = {
+    "$sum": "SUM",
+    "$avg": "AVG",
+    "$min": "MIN",
+    "$max": "MAX",
+    "$count": "COUNT",
+}
+
+
+def _field_ref(value) -> str:
+    if not isinstance(value, str) or not value.startswith("$"):
+        raise ValueError(f"Expected a field reference like '$field', got {value!r}")
+    return value[1:]
+
+
+def _group_shape(spec: Dict[str, Any]) -> tuple:
+    """Hashable description of a $group stage."""
+    if "_id" not in spec:
+        raise ValueError("$group requires an _id")
+    key = spec["_id"]
+    if key is None:
+        key_shape = None
+    elif isinstance(key, dict):
+        for name in key:
+            if not _FIELD_RE.match(name) or "." in name:
+                raise ValueError(f"Invalid _id field name: {name!r}")
+        key_shape = tuple((name, _field_ref(ref)) for name, ref in key.items())
+    else:
+        key_shape = _field_ref(key)
+
+    accumulators = []
+    for name, acc in spec.items():
+        if name == "_id":
+            continue
+        if not _FIELD_RE.match(name) or "." in name:
+            raise ValueError(f"Invalid output field name: {name!r}")
+        if not isinstance(acc, dict) or len(acc) != 1:
+            raise ValueError(f"Accumulator for {name!r} must be a single-operator dict")
+        (op, arg), = acc.items()
+        if op not in ACCUMULATORS:
+            raise ValueError(f"Unsupported accumulator: {op}")
+        if op == "$count":
+            arg_shape = None
+        elif isinstance(arg, bool) or not isinstance(arg, (int, float, str)):
+            raise ValueError(f"Unsupported argument for {op}: {arg!r}")
+        elif isinstance(arg, str):
+            arg_shape = ("field", _field_ref(arg))
+        else:
+            arg_shape = ("const", arg)
+        accumulators.append((name, op, arg_shape))
+    return key_shape, tuple(accumulators)
+
+
+def _accumulator_sql(op: str, arg_shape, columns: frozenset) -> str:
+    if op == "$count" or (op == "$sum" and arg_shape == ("const", 1)):
+        return "COUNT(*)"
+    if arg_shape[0] == "const":
+        constant = repr(arg_shape[1])
+        return f"COUNT(*) * {constant}" if op == "$sum" else f"{ACCUMULATORS[op]}({constant})"
+    expr = field_sql(arg_shape[1], columns)
+    if op == "$sum":
+        # Mongo's $sum ignores missing values and returns 0 for an empty group
+        return f"COALESCE(SUM({expr}), 0)"
+    return f"{ACCUMULATORS[op]}({expr})"
+
+
+def _pipeline_shape(pipeline: List[Dict[str, Any]], params: List[Any]) -> tuple:
+    """Validate a pipeline and return its shape; bound values go into params."""
+    stages = []
+    where_params: List[Any] = []
+    having_params: List[Any] = []
+    seen_group = seen_sort = seen_limit = False
+    for stage in pipeline:
+        if not isinstance(stage, dict) or len(stage) != 1:
+            raise ValueError("Each pipeline stage must be a single-key dict")
+        (name, spec), = stage.items()
+        if seen_limit:
+            raise ValueError(f"{name} after $limit is not supported")
+        if name == "$match":
+            if seen_sort:
+                raise ValueError("$match after $sort is not supported")
+            target = having_params if seen_group else where_params
+            stages.append(("$having" if seen_group else "$match", _shape(spec, target)))
+        elif name == "$group":
+            if seen_group or seen_sort:
+                raise ValueError("Only one $group, before any $sort, is supported")
+            seen_group = True
+            stages.append(("$group", _group_shape(spec)))
+        elif name == "$sort":
+            if seen_sort:
+                raise ValueError("Only one $sort stage is supported")
+            seen_sort = True
+            stages.append(("$sort", tuple((f, 1 if d == 1 else -1) for f, d in spec.items())))
+        elif name == "$limit":
+            seen_limit = True
+            limit_value = int(spec)
+            stages.append(("$limit", None))
+        else:
+            raise ValueError(f"Unsupported pipeline stage: {name}")
+    params.extend(where_params)
+    params.extend(having_params)
+    if seen_limit:
+        params.append(limit_value)
+    return tuple(stages)
+
+
+@lru_cache(maxsize=256)
+def _compile_aggregate(table: str, columns: frozenset, shape: tuple, select_all: str) -> Tuple[str, tuple]:
+    """SQL for a pipeline shape, plus the output columns it produces."""
+    where, having, group, order, limited = [], [], None, (), False
+    for name, spec in shape:
+        if name == "$match":
+            where.append(spec)
+        elif name == "$having":
+            having.append(spec)
+        elif name == "$group":
+            group = spec
+        elif name == "$sort":
+            order = spec
+        elif name == "$limit":
+            limited = True
+
+    select, group_by, outputs = [], [], []
+    if group is not None:
+        key_shape, accumulators = group
+        if key_shape is None:
+            select.append('NULL AS "_id"')
+            outputs.append("_id")
+        elif isinstance(key_shape, tuple):
+            for key_name, field in key_shape:
+                expr = field_sql(field, columns)
+                select.append(f'{expr} AS "_id.{key_name}"')
+                group_by.append(expr)
+                outputs.append(f"_id.{key_name}")
+        else:
+            expr = field_sql(key_shape, columns)
+            select.append(f'{expr} AS "_id"')
+            group_by.append(expr)
+            outputs.append("_id")
+        for out_name, op, arg_shape in accumulators:
+            select.append(f'{_accumulator_sql(op, arg_shape, columns)} AS "{out_name}"')
+            outputs.append(out_name)
+    else:
+        select.append(select_all)
+
+    sql = f"SELECT {', '.join(select)} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(_where_sql(s, columns) for s in where)
+    if group_by:
+        sql += " GROUP BY " + ", ".join(group_by)
+    if having:
+        sql += " HAVING " + " AND ".join(_where_sql(s, columns, aliases=tuple(outputs)) for s in having)
+    if order:
+        sql += " ORDER BY " + ", ".join(
+            f"{_alias_sql(field, tuple(outputs)) if group is not None else field_sql(field, columns)} "
+            f"{'ASC' if direction == 1 else 'DESC'}"
+            for field, direction in order
+        )
+    if limited:
+        sql += " LIMIT ?"
+    return sql, tuple(outputs)
+
+
+def compile_aggregate(table: str, columns: frozenset, pipeline: List[Dict[str, Any]],
+                      select: str = "*") -> Tuple[str, List[Any], tuple]:
+    """Compile an aggregation pipeline into (sql, params, output_columns).
+
+    Pipelines without $group return `output_columns == ()`; their rows are
+    table rows with the given `select` list.
+    """
+    params: List[Any] = []
+    shape = _pipeline_shape(pipeline, params)
+    sql, outputs = _compile_aggregate(table, columns, shape, select)
+    return sql, params, outputs
@@ -1,42 +1,42 @@
-# seed_data.py placeholder
-# scripts/seed_csv.py
-import os, csv
-from dotenv import load_dotenv
-from pymongo import MongoClient
-from datetime import datetime
+# database/seed_data.py
+"""
+Seed the SQLite store with the bundled datasets.
 
-load_dotenv()
-uri = os.environ.get("MONGO_URI")
-if not uri:
-    raise RuntimeError("MONGO_URI not found in .env")
+    python database/seed_data.py
 
-client = MongoClient(uri)
-dbname = os.environ.get("MONGO_DBNAME") or client.get_default_database().name or "healthcore"
-db = client[dbname]
-coll = db["datasets"]
+Loads models/outbreak_master.csv into `datasets` and database/reports.csv into
+`reports` using the streaming importer (see database/importer.py). Re-running
+is safe: each file resumes from its checkpoint, so nothing is imported twice
+(a file that was replaced since its last import is skipped).
+"""
+import logging
+import os
+import sys
 
-csv_path = "models/water_quality_master.csv"  # change if different
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-if not os.path.exists(csv_path):
-    raise FileNotFoundError(f"{csv_path} not found. Update path in script.")
+from database import sqlite_db
+from database.importer import import_file
 
-with open(csv_path, newline="", encoding="utf8") as f:
-    reader = csv.DictReader(f)
-    batch = []
-    for i, row in enumerate(reader, start=1):
-        # try convert numeric fields
-        for k in ["cases","turbidity","ph","chlorine","lat","lng"]:
-            if k in row and row[k] != "":
-                try:
-                    row[k] = float(row[k]) if "." in row[k] else int(row[k])
-                except:
-                    pass
-        row["created_at"] = datetime.utcnow()
-        batch.append(row)
-        if i % 500 == 0:
-            coll.insert_many(batch)
-            batch = []
-    if batch:
-        coll.insert_many(batch)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_FILES = [
+    (os.path.join(ROOT, "models", "outbreak_master.csv"), "outbreaks"),
+    (os.path.join(ROOT, "database", "reports.csv"), "reports"),
+]
 
-print("Seeding complete. Documents in datasets:", coll.count_documents({}))
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    sqlite_db.init_db()
+    try:
+        for path, source in SEED_FILES:
+            if not os.path.exists(path):
+                print(f"⚠️ {path} not found, skipping")
+                continue
+            try:
+                import_file(path, source)
+            except ValueError as e:
+                print(f"⚠️ {e}, skipping")
+        datasets = sqlite_db.get_connection().execute("SELECT COUNT(*) FROM datasets").fetchone()[0]
+        print("Seeding complete. Documents in datasets:", datasets)
+    finally:
+        sqlite_db.close_db()
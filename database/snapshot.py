@@ -0,0 +1,502 @@
+# database/snapshot.py
+"""
+Columnar snapshots of the reports table and the outbreak dataset.
+
+    python -m database.snapshot exports/             # both datasets
+    python -m database.snapshot exports/ --dataset reports --format parquet
+
+Each dataset is a directory with one raw, fixed-width binary file per column
+plus a `manifest.json` describing dtypes, the row count and the export
+watermark. Numbers are float64/int64, timestamps datetime64 and strings are
+dictionary-encoded (int32 codes + a JSON list of values), so `load_snapshot`
+can hand back `np.memmap` views of the files without parsing or copying.
+
+Exports are incremental: reports past the last exported id and CSV rows
+past the last exported byte offset are appended to the column files, and the
+manifest is replaced last, so a crashed export leaves the previous snapshot
+readable. Reports updated since the last export (tracked in the
+`report_changes` table) are rewritten copy-on-write: the column files are
+copied to a new generation, updated there, and published by the manifest
+swap, so readers never see half-updated rows or dictionary codes the
+published dictionary lacks. The previous generation is kept for one more
+export so open readers are not cut off. If any exported report was deleted
+the snapshot is rebuilt from scratch.
+
+`--format parquet` writes one Parquet part per export instead (requires
+pyarrow). Parquet parts are immutable, so a Parquet snapshot is rebuilt
+whenever exported reports changed.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import sqlite_db
+from database.importer import SOURCES, iter_csv
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = "healthcore-columnar/1"
+EXPORT_BATCH_SIZE = 50_000
+
+# Column name -> dtype ("str" columns are dictionary-encoded)
+REPORTS_SCHEMA = {
+    "id": "int64",
+    "timestamp": "datetime64[s]",
+    "reporter": "str",
+    "location_name": "str",
+    "lat": "float64",
+    "lng": "float64",
+    "symptoms": "str",
+    "cases": "int64",
+    "turbidity": "float64",
+    "ph": "float64",
+    "chlorine": "float64",
+    "tds": "float64",
+    "fluoride": "float64",
+    "nitrate": "float64",
+    "chloride": "float64",
+    "ec": "float64",
+    "ai_prediction": "str",
+    "ai_confidence": "float64",
+}
+
+OUTBREAKS_SCHEMA = {
+    "Unique_ID": "str",
+    "State": "str",
+    "District": "str",
+    "Disease": "str",
+    "Cases": "int64",
+    "Deaths": "int64",
+    "Start_Date": "datetime64[D]",
+    "Report_Date": "datetime64[D]",
+    "Status": "str",
+    "Comments": "str",
+}
+
+OUTBREAKS_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "models", "outbreak_master.csv")
+
+
+def _to_datetime(value, dtype: str):
+    if value in (None, ""):
+        return np.datetime64("NaT")
+    try:
+        return np.datetime64(value).astype(dtype)
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def _column_files(name: str, generation: int) -> Tuple[str, str]:
+    """Data and validity file names of a column generation."""
+    prefix = name if not generation else f"{name}.g{generation}"
+    return f"{prefix}.bin", f"{prefix}.valid.bin"
+
+
+class _ColumnWriter:
+    """Appends batches of Python values to one column's files.
+
+    With `copy_from`, the column's files of that generation are copied into
+    `generation` first, so updates never touch the published files.
+    """
+
+    def __init__(self, directory: str, name: str, dtype: str, rows: int,
+                 generation: int = 0, copy_from: Optional[int] = None):
+        self.name = name
+        self.dtype = dtype
+        data_file, valid_file = _column_files(name, generation)
+        self.path = os.path.join(directory, data_file)
+        self.valid_path = os.path.join(directory, valid_file)
+        self.dict_path = os.path.join(directory, f"{name}.dict.json")
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        if dtype == "str" and rows and os.path.exists(self.dict_path):
+            with open(self.dict_path, encoding="utf-8") as f:
+                self.values = json.load(f)
+            self.codes = {v: i for i, v in enumerate(self.values)}
+        if copy_from is not None:
+            old_data, old_valid = _column_files(name, copy_from)
+            shutil.copyfile(os.path.join(directory, old_data), self.path)
+            if self.nullable:
+                shutil.copyfile(os.path.join(directory, old_valid), self.valid_path)
+        # Drop anything a crashed export appended past the manifest's row count
+        self._truncate(self.path, rows * self.itemsize)
+        if self.nullable:
+            self._truncate(self.valid_path, rows)
+
+    @property
+    def storage_dtype(self) -> np.dtype:
+        return np.dtype("int32" if self.dtype == "str" else self.dtype)
+
+    @property
+    def itemsize(self) -> int:
+        return self.storage_dtype.itemsize
+
+    @property
+    def nullable(self) -> bool:
+        # Floats use NaN, datetimes NaT and strings code -1; ints need a validity mask
+        return self.dtype == "int64"
+
+    @staticmethod
+    def _truncate(path: str, size: int):
+        with open(path, "ab") as f:
+            if f.tell() > size:
+                f.truncate(size)
+
+    def _encode(self, batch: List[Any]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.dtype == "str":
+            codes = np.empty(len(batch), dtype="int32")
+            for i, value in enumerate(batch):
+                if value in (None, ""):
+                    codes[i] = -1
+                    continue
+                code = self.codes.get(value)
+                if code is None:
+                    code = self.codes[value] = len(self.values)
+                    self.values.append(value)
+                codes[i] = code
+            return codes, None
+        if self.dtype.startswith("datetime64"):
+            unit = self.dtype
+            return np.array([_to_datetime(v, unit) for v in batch], dtype=unit), None
+        if self.dtype == "int64":
+            valid = np.array([isinstance(v, (int, float)) and v == v for v in batch], dtype=bool)
+            data = np.array([int(v) if ok else 0 for v, ok in zip(batch, valid)], dtype="int64")
+            return data, valid
+        return np.array([v if isinstance(v, (int, float)) else np.nan for v in batch], dtype="float64"), None
+
+    def update(self, positions: np.ndarray, batch: List[Any]):
+        """Overwrite the rows at `positions` with `batch`."""
+        data, valid = self._encode(batch)
+        self._write_at(self.path, self.storage_dtype, positions, data)
+        if valid is not None:
+            self._write_at(self.valid_path, np.bool_, positions, valid)
+
+    @staticmethod
+    def _write_at(path: str, dtype, positions: np.ndarray, data: np.ndarray):
+        column = np.memmap(path, dtype=dtype, mode="r+")
+        column[positions] = data
+        column.flush()
+
+    def append(self, batch: List[Any]):
+        data, valid = self._encode(batch)
+        with open(self.path, "ab") as f:
+            f.write(data.tobytes())
+        if valid is not None:
+            with open(self.valid_path, "ab") as f:
+                f.write(valid.tobytes())
+
+    def finish(self) -> Dict[str, Any]:
+        if self.dtype == "str":
+            tmp = self.dict_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.values, f, ensure_ascii=False)
+            os.replace(tmp, self.dict_path)
+        return {"dtype": self.dtype, "storage": self.storage_dtype.str, "nullable": self.nullable}
+
+
+def _read_manifest(directory: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(directory: str, manifest: Dict[str, Any]):
+    path = os.path.join(directory, "manifest.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _batches(rows: Iterator[Tuple[Dict[str, Any], Any]], size: int):
+    batch, mark = [], None
+    for row, mark in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch, mark
+            batch = []
+    if batch:
+        yield batch, mark
+
+
+_REPORT_SELECT = f"SELECT {', '.join(REPORTS_SCHEMA)} FROM reports"
+
+
+def _report_rows(watermark: Dict[str, int]):
+    """Reports after the id watermark, in id order."""
+    cursor = sqlite_db.get_read_connection().execute(
+        _REPORT_SELECT + " WHERE id > ? ORDER BY id", (watermark["id"],)
+    )
+    while True:
+        chunk = cursor.fetchmany(sqlite_db.FETCH_BATCH_SIZE)
+        if not chunk:
+            return
+        for row in chunk:
+            yield dict(zip(REPORTS_SCHEMA, row)), dict(watermark, id=row[0])
+
+
+def _report_changes(watermark: Optional[Dict[str, int]]):
+    """Exported reports changed since the watermark.
+
+    Returns the watermark advanced to the latest change and the changed rows
+    in id order, or None for the rows if an exported report was deleted (or the
+    watermark predates id watermarks) and the snapshot has to be rebuilt.
+    """
+    conn = sqlite_db.get_read_connection()
+    seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM report_changes").fetchone()[0]
+    if watermark is None:
+        return {"id": 0, "change_seq": seq}, []
+    if not isinstance(watermark, dict):
+        return watermark, None
+    ids = [row[0] for row in conn.execute(
+        "SELECT report_id FROM report_changes WHERE seq > ? AND seq <= ? AND report_id <= ? ORDER BY report_id",
+        (watermark["change_seq"], seq, watermark["id"]),
+    )]
+    rows = []
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        rows.extend(dict(zip(REPORTS_SCHEMA, row)) for row in conn.execute(
+            _REPORT_SELECT + f" WHERE id IN ({', '.join('?' * len(chunk))}) ORDER BY id", chunk
+        ))
+    if len(rows) < len(ids):
+        return watermark, None
+    return dict(watermark, change_seq=seq), rows
+
+
+def _outbreak_rows(watermark: Optional[int]):
+    """Outbreak CSV rows after the byte-offset watermark, coerced like the importer does."""
+    spec = SOURCES["outbreaks"]
+    for row, end in iter_csv(OUTBREAKS_CSV, watermark or 0):
+        row = spec["transform"](row)
+        for field, coerce in spec["types"].items():
+            if field in row:
+                row[field] = coerce(row[field])
+        yield row, end
+
+
+# Dataset -> (schema, new rows after a watermark, changed rows since a watermark)
+DATASETS = {
+    "reports": (REPORTS_SCHEMA, _report_rows, _report_changes),
+    "outbreaks": (OUTBREAKS_SCHEMA, _outbreak_rows, None),
+}
+
+
+def _new_manifest(dataset: str, fmt: str) -> Dict[str, Any]:
+    return {
+        "format": FORMAT_VERSION if fmt == "npy" else "parquet",
+        "dataset": dataset, "rows": 0, "watermark": None, "parts": [],
+    }
+
+
+def _rebuild(directory: str, manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Discard a snapshot that can't be updated incrementally."""
+    logger.warning(f"⚠️ Exported rows in {directory} were deleted or changed format, rebuilding")
+    # Without a manifest a crash mid-rebuild just rebuilds again next time
+    os.remove(os.path.join(directory, "manifest.json"))
+    for part in manifest["parts"]:
+        os.remove(os.path.join(directory, part))
+    for filename in os.listdir(directory):
+        if filename.endswith(".bin"):
+            os.remove(os.path.join(directory, filename))
+    return _new_manifest(manifest["dataset"], "parquet" if manifest["format"] == "parquet" else "npy")
+
+
+def _apply_changes(writers: List[_ColumnWriter], rows: int, changed: List[Dict[str, Any]]) -> bool:
+    """Rewrite changed rows in the writers' (unpublished) files; False if one isn't in the snapshot."""
+    ids = np.array([row["id"] for row in changed], dtype="int64")
+    id_writer = next(w for w in writers if w.name == "id")
+    exported = np.memmap(id_writer.path, dtype="int64", mode="r", shape=(rows,))
+    positions = np.searchsorted(exported, ids)
+    if (positions >= rows).any() or (exported[np.minimum(positions, rows - 1)] != ids).any():
+        return False
+    for writer in writers:
+        writer.update(positions, [row.get(writer.name) for row in changed])
+    return True
+
+
+def export_dataset(directory: str, dataset: str = "reports", fmt: str = "npy",
+                   batch_size: int = EXPORT_BATCH_SIZE) -> Dict[str, Any]:
+    """Append rows past the snapshot's watermark and refresh changed ones; returns the new manifest."""
+    schema, source, changes = DATASETS[dataset]
+    if fmt == "parquet" and pa is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+    os.makedirs(directory, exist_ok=True)
+    manifest = _read_manifest(directory) or _new_manifest(dataset, fmt)
+    if (manifest["format"] == "parquet") != (fmt == "parquet"):
+        raise ValueError(f"{directory} holds a {manifest['format']} snapshot, not {fmt}")
+
+    started = time.perf_counter()
+    watermark, changed = manifest["watermark"], []
+    if changes is not None:
+        watermark, changed = changes(watermark if manifest["rows"] else None)
+        if changed is None or (changed and fmt == "parquet"):
+            manifest = _rebuild(directory, manifest)
+            watermark, changed = changes(None)
+    rows = manifest["rows"]
+    writers = None
+    published = generation = manifest.get("generation", 0)
+    if fmt == "npy":
+        if changed:
+            generation += 1
+        writers = [_ColumnWriter(directory, name, dtype, rows, generation,
+                                 copy_from=published if generation != published else None)
+                   for name, dtype in schema.items()]
+        if changed and not _apply_changes(writers, rows, changed):
+            manifest = _rebuild(directory, manifest)
+            watermark, changed = changes(None)
+            rows = published = generation = 0
+            writers = [_ColumnWriter(directory, name, dtype, rows) for name, dtype in schema.items()]
+    manifest["watermark"] = watermark
+    for batch, mark in _batches(source(watermark), batch_size):
+        if writers is not None:
+            for writer in writers:
+                writer.append([row.get(writer.name) for row in batch])
+        else:
+            part = f"part-{len(manifest['parts']):05d}.parquet"
+            pq.write_table(_arrow_table(schema, batch), os.path.join(directory, part))
+            manifest["parts"].append(part)
+        rows += len(batch)
+        manifest["watermark"] = mark
+
+    if writers is not None:
+        # Dictionaries only grow, so they can be replaced before the manifest that uses the new codes
+        manifest["columns"] = {w.name: w.finish() for w in writers}
+        manifest["generation"] = generation
+    added = rows - manifest["rows"]
+    manifest.update(rows=rows, updated_at=datetime.utcnow().isoformat())
+    _write_manifest(directory, manifest)
+    if generation != published and generation > 1:
+        # Readers that opened the previous generation keep it; the one before that goes
+        for name in schema:
+            for filename in _column_files(name, generation - 2):
+                if os.path.exists(os.path.join(directory, filename)):
+                    os.remove(os.path.join(directory, filename))
+    logger.info(f"✅ Exported {added} new and {len(changed)} changed {dataset} rows to {directory} "
+                f"({rows} total) in {time.perf_counter() - started:.2f}s")
+    return manifest
+
+
+def _arrow_table(schema: Dict[str, str], batch: List[Dict[str, Any]]):
+    arrays = {}
+    for name, dtype in schema.items():
+        values = [row.get(name) for row in batch]
+        if dtype.startswith("datetime64"):
+            arrays[name] = pa.array(np.array([_to_datetime(v, dtype) for v in values], dtype=dtype))
+        elif dtype == "str":
+            arrays[name] = pa.array([v or None for v in values], type=pa.string()).dictionary_encode()
+        else:
+            arrow_type = pa.int64() if dtype == "int64" else pa.float64()
+            arrays[name] = pa.array([v if isinstance(v, (int, float)) else None for v in values], type=arrow_type)
+    return pa.table(arrays)
+
+
+class Snapshot:
+    """Memory-mapped, read-only view of an exported dataset.
+
+    `snap["ph"]` is an `np.memmap` over the column file (string columns give
+    their int32 codes; see `values()`), so nothing is parsed or copied until
+    the data is actually touched.
+    """
+
+    def __init__(self, directory: str, manifest: Dict[str, Any]):
+        self.directory = directory
+        self.manifest = manifest
+        self.rows = manifest["rows"]
+        self.generation = manifest.get("generation", 0)
+        self.columns = list(manifest.get("columns", {}))
+        self._values: Dict[str, List[str]] = {}
+
+    def __len__(self):
+        return self.rows
+
+    def _map(self, filename: str, dtype) -> np.ndarray:
+        if self.rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.directory, filename), dtype=dtype, mode="r", shape=(self.rows,))
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        meta = self.manifest["columns"][name]
+        return self._map(_column_files(name, self.generation)[0], np.dtype(meta["storage"]))
+
+    def valid(self, name: str) -> Optional[np.ndarray]:
+        """Validity mask for nullable int columns (None for other columns)."""
+        if not self.manifest["columns"][name]["nullable"]:
+            return None
+        return self._map(_column_files(name, self.generation)[1], np.bool_)
+
+    def values(self, name: str) -> List[str]:
+        """Dictionary of a string column: codes index into this list."""
+        if name not in self._values:
+            with open(os.path.join(self.directory, f"{name}.dict.json"), encoding="utf-8") as f:
+                self._values[name] = json.load(f)
+        return self._values[name]
+
+    def to_pandas(self):
+        """DataFrame with categorical strings and nullable ints (pandas imported lazily)."""
+        import pandas as pd
+
+        data = {}
+        for name in self.columns:
+            dtype = self.manifest["columns"][name]["dtype"]
+            if dtype == "str":
+                data[name] = pd.Categorical.from_codes(self[name], categories=self.values(name))
+            elif dtype == "int64":
+                data[name] = pd.arrays.IntegerArray(np.asarray(self[name]), ~np.asarray(self.valid(name)))
+            else:
+                data[name] = self[name]
+        return pd.DataFrame(data, copy=False)
+
+
+def load_snapshot(directory: str):
+    """Open an exported dataset: a `Snapshot` for npy exports, a pyarrow Table for Parquet."""
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No snapshot manifest in {directory}")
+    if manifest["format"] == "parquet":
+        if pq is None:
+            raise RuntimeError("Reading a Parquet snapshot requires pyarrow")
+        return pa.concat_tables(
+            pq.read_table(os.path.join(directory, part), memory_map=True) for part in manifest["parts"]
+        )
+    if manifest["format"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format: {manifest['format']}")
+    return Snapshot(directory, manifest)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Export reports / outbreak data to columnar snapshots")
+    parser.add_argument("out", help="output directory (one sub-directory per dataset)")
+    parser.add_argument("--dataset", choices=["all"] + sorted(DATASETS), default="all")
+    parser.add_argument("--format", choices=["npy", "parquet"], default="npy")
+    args = parser.parse_args(argv)
+
+    datasets = sorted(DATASETS) if args.dataset == "all" else [args.dataset]
+    sqlite_db.init_db()
+    try:
+        for dataset in datasets:
+            export_dataset(os.path.join(args.out, dataset), dataset, args.format)
+    finally:
+        sqlite_db.close_db()
+
+
+if __name__ == "__main__":
+    main()
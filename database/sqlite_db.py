@@ -3,17 +3,40 @@ import os
 import sqlite3
 import json
 import logging
+import atexit
+import html
+import math
+import queue
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from urllib.parse import quote
+from functools import lru_cache
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from dotenv import load_dotenv
 
+from .query import compile_aggregate, compile_find, compile_where, field_sql
+
 # Load the main .env file
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 logger = logging.getLogger(__name__)
 
 # Globals
-connection: Optional[sqlite3.Connection] = None
+pool: Optional['ConnectionPool'] = None
+read_pool: Optional['ConnectionPool'] = None
+writer: Optional['GroupCommitWriter'] = None
 db_path: Optional[str] = None
+fts_enabled = False
+rtree_enabled = False
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Per-thread checkout of a pooled connection
+_local = threading.local()
 
 # Collection registry - maps to SQLite tables
 COLLECTIONS = {
@@ -26,10 +49,481 @@ COLLECTIONS = {
     "SESSIONS": "sessions",
 }
 
+# Connection tuning (override via .env)
+POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.environ.get("SQLITE_POOL_TIMEOUT", "10"))
+
+# "pooled": every connection reads and writes.
+# "split": one writer connection plus a pool of read-only (mode=ro) readers.
+STORAGE_MODE = os.environ.get("SQLITE_STORAGE_MODE", "pooled").lower()
+
+# Write-behind (group commit) mode for insert_one
+WRITE_BEHIND = os.environ.get("SQLITE_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+GROUP_COMMIT_SIZE = int(os.environ.get("SQLITE_GROUP_COMMIT_SIZE", "64"))
+GROUP_COMMIT_DELAY = float(os.environ.get("SQLITE_GROUP_COMMIT_DELAY_MS", "2")) / 1000
+WRITE_QUEUE_SIZE = int(os.environ.get("SQLITE_WRITE_QUEUE_SIZE", "1024"))
+PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Negative cache_size is in KiB: -16000 is ~16 MB of page cache per connection
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", "-16000")),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+    "busy_timeout": int(POOL_TIMEOUT * 1000),
+}
+
+
+# Structured columns per table; every table also keeps the full document in `data`
+TABLE_COLUMNS = {
+    "reports": [
+        "timestamp", "reporter", "location_name", "lat", "lng", "symptoms",
+        "cases", "turbidity", "ph", "chlorine", "tds", "fluoride", "nitrate",
+        "chloride", "ec", "ai_prediction", "ai_confidence", "ai_model_version", "ai_status",
+    ],
+    "users": ["email", "name", "password", "created_at"],
+    "datasets": ["location_name", "timestamp", "created_at"],
+    "alerts": ["level", "created_at"],
+    "sessions": ["session_id", "created_at"],
+}
+DEFAULT_COLUMNS = ["created_at"]
+
+
+def table_columns(table_name: str) -> frozenset:
+    """Structured (queryable) columns of a table, besides `id` and `data`."""
+    return frozenset(TABLE_COLUMNS.get(table_name, DEFAULT_COLUMNS))
+
+INSERT_CHUNK_SIZE = int(os.environ.get("SQLITE_INSERT_CHUNK_SIZE", "500"))
+FETCH_BATCH_SIZE = int(os.environ.get("SQLITE_FETCH_BATCH_SIZE", "256"))
+
+
+class BulkWriteError(Exception):
+    """Raised by insert_many when some documents could not be inserted."""
+
+    def __init__(self, details: Dict[str, Any]):
+        super().__init__(f"{len(details['writeErrors'])} document(s) failed to insert")
+        self.details = details
+
+
+def _serialize_value(value):
+    """Convert datetime objects to ISO format strings."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+_insert_sql_cache: Dict[str, str] = {}
+
+
+def _insert_sql(table_name: str) -> str:
+    """INSERT statement for a table, built once per table."""
+    sql = _insert_sql_cache.get(table_name)
+    if sql is None:
+        columns = TABLE_COLUMNS.get(table_name, DEFAULT_COLUMNS) + ["data"]
+        placeholders = ", ".join("?" * len(columns))
+        sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+        _insert_sql_cache[table_name] = sql
+    return sql
+
+
+def _insert_values(table_name: str, document: Dict[str, Any]) -> tuple:
+    """Parameter tuple matching _insert_sql() for one document."""
+    serialized_doc = {k: _serialize_value(v) for k, v in document.items()}
+    columns = TABLE_COLUMNS.get(table_name, DEFAULT_COLUMNS)
+    return tuple(serialized_doc.get(c) for c in columns) + (json.dumps(serialized_doc),)
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections with per-thread checkout."""
+
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT,
+                 pragmas: Optional[Dict[str, Any]] = None, read_only: bool = False):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.read_only = read_only
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        if read_only:
+            # Journal mode is a property of the file, set by the writer
+            self.pragmas.pop("journal_mode", None)
+            self.pragmas.pop("synchronous", None)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        # Checked-out connection -> thread holding it, so slots of dead threads can be reclaimed
+        self._owners: Dict[sqlite3.Connection, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "checkins": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "reclaimed": 0,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            conn = sqlite3.connect(f"file:{quote(self.path)}?mode=ro", uri=True,
+                                   timeout=self.timeout, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name}={value}")
+            except sqlite3.DatabaseError as e:
+                logger.warning(f"Could not apply PRAGMA {name}={value}: {e}")
+        return conn
+
+    def checkout(self) -> sqlite3.Connection:
+        """Take a connection from the pool, opening one if under the size limit."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed.")
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if len(self._all) < self.size:
+                    conn = self._connect()
+                    self._all.append(conn)
+
+        if conn is None and self._reclaim_dead():
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+        if conn is None:
+            # Pool exhausted - wait for another thread to check in
+            started = time.perf_counter()
+            with self._lock:
+                self._stats["waits"] += 1
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise TimeoutError(f"No SQLite connection available after {self.timeout}s")
+            finally:
+                with self._lock:
+                    self._stats["wait_time"] += time.perf_counter() - started
+
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._owners[conn] = threading.current_thread()
+        return conn
+
+    def _reclaim_dead(self) -> int:
+        """Check in connections still held by threads that have exited."""
+        with self._lock:
+            orphans = [conn for conn, owner in self._owners.items() if not owner.is_alive()]
+            self._stats["reclaimed"] += len(orphans)
+        for conn in orphans:
+            self.checkin(conn)
+        return len(orphans)
+
+    def checkin(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, discarding any uncommitted work."""
+        with self._lock:
+            self._owners.pop(conn, None)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Broken handle - drop it so the slot can be reopened
+            with self._lock:
+                if conn in self._all:
+                    self._all.remove(conn)
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            return
+
+        with self._lock:
+            self._stats["checkins"] += 1
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["open"] = len(self._all)
+        stats["idle"] = self._idle.qsize()
+        stats["in_use"] = stats["open"] - stats["idle"]
+        stats["size"] = self.size
+        return stats
 
-def init_db(app=None):
-    """Initialize global SQLite database connection."""
-    global connection, db_path
+    def close(self):
+        """Close every connection owned by the pool."""
+        self._closed = True
+        with self._lock:
+            conns, self._all = self._all, []
+            self._owners.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.error(f"Error closing SQLite connection: {e}")
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+
+class GroupCommitWriter:
+    """Single writer thread that drains a bounded queue and commits in groups.
+    
+    Concurrent callers share one transaction (and one fsync): a group is
+    committed once it reaches `max_batch` statements or `max_delay` seconds
+    after its first statement, whichever comes first.
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, pool: ConnectionPool, max_batch: int = GROUP_COMMIT_SIZE,
+                 max_delay: float = GROUP_COMMIT_DELAY, maxsize: int = WRITE_QUEUE_SIZE,
+                 put_timeout: float = POOL_TIMEOUT):
+        self.pool = pool
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.put_timeout = put_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        # Held across the stopped check and the enqueue, so nothing lands behind _STOP
+        self._submit_lock = threading.Lock()
+        self._stopped = False
+        # A pooled connection is held for the writer's lifetime; the single
+        # split-mode writer is shared with write_connection(), so per group
+        self._hold = self.pool.size > 1
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "errors": 0,
+            "commits": 0,
+            "full_waits": 0,
+            "max_group": 0,
+        }
+        self._thread = threading.Thread(target=self._run, name="sqlite-group-commit", daemon=True)
+        self._thread.start()
+    
+    def submit(self, sql: Optional[str], params=(), durable: bool = True):
+        """Queue a statement. Returns its lastrowid when durable, else a Future."""
+        future: Future = Future()
+        item = (sql, params, future)
+        with self._submit_lock:
+            if self._stopped:
+                raise RuntimeError("Write queue is stopped.")
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                # Backpressure: block the caller until the writer catches up
+                with self._lock:
+                    self._stats["full_waits"] += 1
+                try:
+                    self._queue.put(item, timeout=self.put_timeout)
+                except queue.Full:
+                    raise TimeoutError(f"Write queue full for {self.put_timeout}s")
+        
+        if sql is not None:
+            with self._lock:
+                self._stats["enqueued"] += 1
+        if durable:
+            return future.result()
+        return future
+    
+    def flush(self):
+        """Block until everything queued so far has been committed."""
+        if not self._stopped:
+            self.submit(None)
+    
+    def stop(self):
+        """Commit whatever is queued and stop the writer thread."""
+        with self._submit_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(self._STOP)
+        self._thread.join()
+        self._fail_pending(RuntimeError("Write queue is stopped."))
+    
+    def _fail_pending(self, error: Exception):
+        """Fail the Futures of statements the writer thread will never run."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not self._STOP and not item[2].done():
+                item[2].set_exception(error)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
+    
+    def _run(self):
+        stopping = False
+        try:
+            while not stopping:
+                item = self._queue.get()
+                if item is self._STOP:
+                    break
+                group = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(group) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is self._STOP:
+                        stopping = True
+                        break
+                    group.append(item)
+                self._commit(group)
+        except BaseException as e:
+            # Never leave callers waiting on a writer that is gone
+            with self._submit_lock:
+                self._stopped = True
+            self._fail_pending(e)
+            raise
+        finally:
+            if self._conn is not None:
+                self.pool.checkin(self._conn)
+                self._conn = None
+    
+    def _commit(self, group):
+        results = []
+        try:
+            if self._conn is None:
+                self._conn = self.pool.checkout()
+            conn = self._conn
+            for sql, params, future in group:
+                if sql is None:
+                    results.append((future, None, None))
+                    continue
+                try:
+                    results.append((future, conn.execute(sql, params).lastrowid, None))
+                except sqlite3.Error as e:
+                    # A failed statement only rolls back itself, not the group
+                    results.append((future, None, e))
+            conn.commit()
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += sum(1 for sql, _, _ in group if sql is not None)
+            for _, _, future in group:
+                future.set_exception(e)
+            return
+        finally:
+            if self._conn is not None and (not self._hold or self._conn.in_transaction):
+                self.pool.checkin(self._conn)  # rolls back a failed group
+                self._conn = None
+        
+        statements = sum(1 for sql, _, _ in group if sql is not None)
+        errors = sum(1 for _, _, error in results if error is not None)
+        with self._lock:
+            self._stats["commits"] += 1
+            self._stats["written"] += statements - errors
+            self._stats["errors"] += errors
+            self._stats["max_group"] = max(self._stats["max_group"], len(group))
+        for future, rowid, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(rowid)
+
+
+def get_connection() -> sqlite3.Connection:
+    """Return the connection checked out by the current thread, checking one out if needed."""
+    if pool is None:
+        raise RuntimeError("Database not initialized. Call init_db() first.")
+
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "pool", None) is not pool:
+        conn = pool.checkout()
+        _local.conn = conn
+        _local.pool = pool
+    return conn
+
+
+def get_read_connection() -> sqlite3.Connection:
+    """Connection for reads: a read-only pooled connection in split mode."""
+    if read_pool is None:
+        return get_connection()
+
+    conn = getattr(_local, "read_conn", None)
+    if conn is None or getattr(_local, "read_pool", None) is not read_pool:
+        conn = read_pool.checkout()
+        _local.read_conn = conn
+        _local.read_pool = read_pool
+    return conn
+
+
+@contextmanager
+def write_connection():
+    """Connection for a write.
+    
+    In split mode the single writer is checked out only for the duration of
+    the block, so a request never holds it while doing unrelated work.
+    """
+    held = getattr(_local, "conn", None)
+    if read_pool is None or (held is not None and getattr(_local, "pool", None) is pool):
+        yield get_connection()
+        return
+    if pool is None:
+        raise RuntimeError("Database not initialized. Call init_db() first.")
+    conn = pool.checkout()
+    try:
+        yield conn
+    finally:
+        pool.checkin(conn)
+
+
+def release_connection(exception=None):
+    """Check the current thread's connections back into their pools."""
+    for conn_attr, pool_attr in (("conn", "pool"), ("read_conn", "read_pool")):
+        conn = getattr(_local, conn_attr, None)
+        owner = getattr(_local, pool_attr, None)
+        setattr(_local, conn_attr, None)
+        setattr(_local, pool_attr, None)
+        if conn is not None and owner is not None:
+            owner.checkin(conn)
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Return connection pool counters (checkouts, waits, open count...)."""
+    if pool is None:
+        return {}
+    stats = pool.stats()
+    stats["mode"] = "split" if read_pool is not None else "pooled"
+    if read_pool is not None:
+        stats["readers"] = read_pool.stats()
+    if writer is not None:
+        stats["writer"] = writer.stats()
+    return stats
+
+
+@atexit.register
+def _stop_writer():
+    """Flush the write-behind queue on interpreter shutdown."""
+    if writer is not None:
+        writer.stop()
+
+
+def flush_writes():
+    """Wait for queued write-behind inserts to be committed."""
+    if writer is not None:
+        writer.flush()
+
+
+def init_db(app=None, write_behind: Optional[bool] = None, storage_mode: Optional[str] = None):
+    """Initialize the SQLite connection pool (and the group-commit writer if enabled)."""
+    global pool, read_pool, writer, db_path
     
     # Get database path from environment or use default
     db_path = os.environ.get("SQLITE_DB_PATH", "healthcore.db")
@@ -39,22 +533,34 @@ def init_db(app=None):
         db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), db_path)
     
     try:
-        connection = sqlite3.connect(db_path, check_same_thread=False)
-        connection.row_factory = sqlite3.Row  # Enable column access by name
-        logger.info(f"✅ SQLite database connected: {db_path}")
+        if pool is not None:
+            close_db()
+
+        split = (storage_mode or STORAGE_MODE) == "split"
+        pool = ConnectionPool(db_path, size=1 if split else POOL_SIZE)
+        logger.info(f"✅ SQLite database connected: {db_path} (pool size {pool.size})")
         
         # Create tables
         create_tables()
+        release_connection()
+        
+        if split:
+            read_pool = ConnectionPool(db_path, read_only=True)
+            logger.info(f"✅ Split storage: 1 writer, up to {read_pool.size} read-only connections")
+        
+        if WRITE_BEHIND if write_behind is None else write_behind:
+            writer = GroupCommitWriter(pool)
+            logger.info(f"✅ Group commit enabled (batch {writer.max_batch}, delay {writer.max_delay * 1000:.0f} ms)")
         
         if app:
-            app.db_connection = connection
-            app.db = _SQLiteCompat(connection)
+            app.db_pool = pool
+            app.db = _SQLiteCompat()
             
             @app.teardown_appcontext
-            def _close_db(exception=None):
-                close_db()
+            def _release_db(exception=None):
+                release_connection(exception)
         
-        return _SQLiteCompat(connection)
+        return _SQLiteCompat()
         
     except Exception as e:
         logger.error(f"Failed to initialize SQLite database: {e}")
@@ -63,6 +569,7 @@ def init_db(app=None):
 
 def create_tables():
     """Create tables for all collections if they don't exist."""
+    connection = get_connection()
     cursor = connection.cursor()
     
     # Users table
@@ -120,10 +627,33 @@ def create_tables():
             ec REAL,
             ai_prediction TEXT,
             ai_confidence REAL,
+            ai_model_version TEXT,
+            ai_status TEXT,
             data TEXT
         )
     """)
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_timestamp ON reports(timestamp DESC)")
+    # Databases created before predictions were versioned lack the column
+    report_columns = {row[1] for row in cursor.execute("PRAGMA table_info(reports)")}
+    if "ai_model_version" not in report_columns:
+        cursor.execute("ALTER TABLE reports ADD COLUMN ai_model_version TEXT")
+    # ...and the async scoring status, which used to live only in the JSON document
+    if "ai_status" not in report_columns:
+        cursor.execute("ALTER TABLE reports ADD COLUMN ai_status TEXT")
+        cursor.execute("""
+            UPDATE reports SET ai_status = json_extract(data, '$.ai_status')
+            WHERE json_extract(data, '$.ai_status') IS NOT NULL
+        """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_ai_status ON reports(ai_status)")
+    # Keyset paging orders by (timestamp, id); with id in the index no page needs a sort
+    timestamp_index = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = 'idx_reports_timestamp'"
+    ).fetchone()
+    if timestamp_index is not None and "id DESC" not in timestamp_index[0]:
+        cursor.execute("DROP INDEX idx_reports_timestamp")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_timestamp ON reports(timestamp DESC, id DESC)")
+    _create_search_index(cursor)
+    _create_spatial_index(cursor)
+    _create_change_log(cursor)
     
     # Alerts table
     cursor.execute("""
@@ -160,183 +690,582 @@ def create_tables():
     logger.info("✅ Database tables created successfully")
 
 
-class _SQLiteCollection:
-    """SQLite collection that mimics MongoDB collection interface."""
+def _create_search_index(cursor):
+    """Full-text index over report symptoms/location names, kept in sync by triggers."""
+    global fts_enabled
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports_fts'"
+    ).fetchone()
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+                symptoms, location_name,
+                content='reports', content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        fts_enabled = False
+        logger.warning(f"FTS5 not available, report search disabled: {e}")
+        return
     
-    def __init__(self, conn: sqlite3.Connection, table_name: str):
-        self.conn = conn
-        self.name = table_name
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_fts_insert AFTER INSERT ON reports BEGIN
+            INSERT INTO reports_fts(rowid, symptoms, location_name)
+            VALUES (new.id, new.symptoms, new.location_name);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_fts_delete AFTER DELETE ON reports BEGIN
+            INSERT INTO reports_fts(reports_fts, rowid, symptoms, location_name)
+            VALUES ('delete', old.id, old.symptoms, old.location_name);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_fts_update AFTER UPDATE OF symptoms, location_name ON reports BEGIN
+            INSERT INTO reports_fts(reports_fts, rowid, symptoms, location_name)
+            VALUES ('delete', old.id, old.symptoms, old.location_name);
+            INSERT INTO reports_fts(rowid, symptoms, location_name)
+            VALUES (new.id, new.symptoms, new.location_name);
+        END
+    """)
+    if not exists:
+        # Backfill rows written before the index existed
+        cursor.execute("INSERT INTO reports_fts(reports_fts) VALUES ('rebuild')")
+        logger.info("✅ Report search index built")
+    fts_enabled = True
+
+
+def _create_change_log(cursor):
+    """Latest change sequence per updated/deleted report, for incremental exports."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS report_changes (
+            report_id INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_changes_seq ON report_changes(seq)")
+    for event, row in (("UPDATE", "new"), ("DELETE", "old")):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS reports_change_{event.lower()} AFTER {event} ON reports BEGIN
+                INSERT OR REPLACE INTO report_changes (report_id, seq)
+                VALUES ({row}.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM report_changes));
+            END
+        """)
+
+
+def _create_spatial_index(cursor):
+    """R*Tree over report coordinates, kept in sync by triggers."""
+    global rtree_enabled
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports_geo'"
+    ).fetchone()
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS reports_geo USING rtree(
+                id, min_lat, max_lat, min_lng, max_lng
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        rtree_enabled = False
+        logger.warning(f"R*Tree not available, spatial queries will scan reports: {e}")
+        return
     
-    def insert_one(self, document: Dict[str, Any]) -> Any:
-        """Insert a single document."""
-        cursor = self.conn.cursor()
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_geo_insert AFTER INSERT ON reports
+        WHEN new.lat IS NOT NULL AND new.lng IS NOT NULL BEGIN
+            INSERT INTO reports_geo VALUES (new.id, new.lat, new.lat, new.lng, new.lng);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_geo_delete AFTER DELETE ON reports BEGIN
+            DELETE FROM reports_geo WHERE id = old.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_geo_update AFTER UPDATE OF lat, lng ON reports BEGIN
+            DELETE FROM reports_geo WHERE id = old.id;
+            INSERT INTO reports_geo
+            SELECT new.id, new.lat, new.lat, new.lng, new.lng
+            WHERE new.lat IS NOT NULL AND new.lng IS NOT NULL;
+        END
+    """)
+    if not exists:
+        # Backfill rows written before the index existed
+        cursor.execute("""
+            INSERT INTO reports_geo
+            SELECT id, lat, lat, lng, lng FROM reports WHERE lat IS NOT NULL AND lng IS NOT NULL
+        """)
+        logger.info("✅ Report spatial index built")
+    rtree_enabled = True
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox_around(lat: float, lng: float, radius_km: float):
+    """(min_lat, min_lng, max_lat, max_lng) box that contains the given circle.
+
+    Latitudes are clamped to the poles, and a circle reaching a pole spans
+    every longitude. Longitudes are wrapped into [-180, 180], so a circle
+    crossing the antimeridian gives min_lng > max_lng.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(angle)
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    ratio = math.sin(angle) / max(math.cos(math.radians(lat)), 1e-12)
+    if min_lat <= -90.0 or max_lat >= 90.0 or angle >= math.pi / 2 or ratio >= 1.0:
+        return min_lat, -180.0, max_lat, 180.0
+    dlng = math.degrees(math.asin(ratio))
+    lng = (lng + 180.0) % 360.0 - 180.0
+    min_lng, max_lng = lng - dlng, lng + dlng
+    if min_lng < -180.0:
+        min_lng += 360.0
+    if max_lng > 180.0:
+        max_lng -= 360.0
+    return min_lat, min_lng, max_lat, max_lng
+
+
+# Private-use markers wrapped around matches, swapped for <mark> after HTML escaping
+_HIT_START, _HIT_END = "\ue000", "\ue001"
+
+
+def _fts_query(text: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match (as a prefix)."""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _highlight(snippet: Optional[str]) -> Optional[str]:
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>")
+
+
+class _Projection:
+    """Which columns a find() selects and how its rows become documents."""
+    
+    def __init__(self, table_name: str, projection=None):
+        columns = table_columns(table_name)
+        include, exclude, include_id = _normalize_projection(projection)
         
-        # Helper to convert datetime objects to ISO format strings
-        def serialize_value(value):
-            if isinstance(value, datetime):
-                return value.isoformat()
-            return value
+        if include:
+            self.columns = [f for f in include if f in columns]
+            self.json_fields = [f for f in include if f not in columns]
+        elif table_name == "reports":
+            # Every report field has its own column - skip the JSON blob
+            self.columns = list(TABLE_COLUMNS["reports"])
+            self.json_fields = []
+        else:
+            self.columns = []
+            self.json_fields = None  # whole JSON document
+        self.exclude = exclude
+        self.include_id = include_id
         
-        # Serialize datetime objects in the document
-        serialized_doc = {k: serialize_value(v) for k, v in document.items()}
+        select = ["id"] + self.columns
+        if self.json_fields is None or self.json_fields:
+            select.append("data")
+        self.select = ", ".join(select)
+        self._data_index = len(select) - 1
         
-        # Special handling for reports table with structured columns
-        if self.name == "reports":
-            cursor.execute("""
-                INSERT INTO reports (
-                    timestamp, reporter, location_name, lat, lng, symptoms,
-                    cases, turbidity, ph, chlorine, tds, fluoride, nitrate,
-                    chloride, ec, ai_prediction, ai_confidence, data
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                serialized_doc.get('timestamp'),
-                serialized_doc.get('reporter'),
-                serialized_doc.get('location_name'),
-                serialized_doc.get('lat'),
-                serialized_doc.get('lng'),
-                serialized_doc.get('symptoms'),
-                serialized_doc.get('cases'),
-                serialized_doc.get('turbidity'),
-                serialized_doc.get('ph'),
-                serialized_doc.get('chlorine'),
-                serialized_doc.get('tds'),
-                serialized_doc.get('fluoride'),
-                serialized_doc.get('nitrate'),
-                serialized_doc.get('chloride'),
-                serialized_doc.get('ec'),
-                serialized_doc.get('ai_prediction'),
-                serialized_doc.get('ai_confidence'),
-                json.dumps(serialized_doc)
-            ))
+        self._tuple_fields = include if include else self.columns
+        self.row_type = namedtuple(
+            f"{table_name}_row", ["id"] + [f.replace(".", "_") for f in self._tuple_fields], rename=True
+        )
+        self._columns_only = not self.json_fields and self.json_fields is not None
+    
+    def to_dict(self, row) -> Dict[str, Any]:
+        if self.json_fields is None:
+            doc = json.loads(row[self._data_index]) if row[self._data_index] else {}
         else:
-            # Generic insert for other tables
-            data_json = json.dumps(serialized_doc)
-            
-            # Extract common fields if they exist
-            created_at = serialized_doc.get('created_at')
-            
-            if self.name == "users":
-                cursor.execute(
-                    "INSERT INTO users (email, name, password, created_at, data) VALUES (?, ?, ?, ?, ?)",
-                    (serialized_doc.get('email'), serialized_doc.get('name'), 
-                     serialized_doc.get('password'), created_at, data_json)
-                )
-            elif self.name == "datasets":
-                cursor.execute(
-                    "INSERT INTO datasets (location_name, timestamp, created_at, data) VALUES (?, ?, ?, ?)",
-                    (serialized_doc.get('location_name'), serialized_doc.get('timestamp'), 
-                     created_at, data_json)
-                )
-            else:
-                # Fallback for other tables
-                cursor.execute(
-                    f"INSERT INTO {self.name} (created_at, data) VALUES (?, ?)",
-                    (created_at, data_json)
-                )
-        
-        self.conn.commit()
+            doc = {}
+            if self.json_fields:
+                data = json.loads(row[self._data_index]) if row[self._data_index] else {}
+                for field in self.json_fields:
+                    found, value = _get_path(data, field)
+                    if found:
+                        _set_path(doc, field, value)
+            for index, column in enumerate(self.columns, start=1):
+                doc[column] = row[index]
+        if self.include_id:
+            doc["_id"] = row[0]
+        for field in self.exclude:
+            doc.pop(field, None)
+        return doc
+    
+    def to_tuple(self, row) -> tuple:
+        if self._columns_only:
+            return self.row_type._make(row)
+        doc = self.to_dict(row)
+        return self.row_type(row[0], *(_get_path(doc, f)[1] for f in self._tuple_fields))
+
+
+def _normalize_projection(projection):
+    """Split a Mongo projection into (include, exclude, include_id)."""
+    if not projection:
+        return [], [], True
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = bool(projection.get("_id", 1))
+    include = [f for f, v in projection.items() if v and f != "_id"]
+    exclude = [f for f, v in projection.items() if not v and f != "_id"]
+    if include and exclude:
+        raise ValueError("Projection cannot mix inclusion and exclusion")
+    return include, exclude, include_id
+
+
+@lru_cache(maxsize=256)
+def _projection_for(table_name: str, projection_key) -> _Projection:
+    return _Projection(table_name, dict(projection_key) if projection_key else None)
+
+
+def _get_projection(table_name: str, projection=None) -> _Projection:
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    return _projection_for(table_name, tuple(projection.items()) if projection else None)
+
+
+def _get_path(doc: Dict[str, Any], path: str):
+    """Look up a dotted path in a nested dict; returns (found, value)."""
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _set_path(doc: Dict[str, Any], path: str, value):
+    """Store a value under a dotted path, creating nested dicts as needed."""
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = value
+
+
+class _SQLiteCollection:
+    """SQLite collection that mimics MongoDB collection interface."""
+    
+    def __init__(self, conn: Optional[sqlite3.Connection], table_name: str):
+        self._conn = conn
+        self.name = table_name
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Bound connection, or the current thread's pooled (read) connection."""
+        return self._conn if self._conn is not None else get_read_connection()
+    
+    def _writing(self):
+        """Context manager yielding the connection to write with."""
+        return nullcontext(self._conn) if self._conn is not None else write_connection()
+    
+    def insert_one(self, document: Dict[str, Any], durable: bool = True) -> Any:
+        """Insert a single document.
         
+        In write-behind mode the insert goes through the group-commit writer:
+        durable=True waits for the shared commit, durable=False returns as soon
+        as the row is queued (inserted_id is then None).
+        """
         # Return object with inserted_id
         class InsertResult:
             def __init__(self, id):
                 self.inserted_id = id
         
+        sql, values = _insert_sql(self.name), _insert_values(self.name, document)
+        if writer is not None and self._conn is None:
+            rowid = writer.submit(sql, values, durable)
+            return InsertResult(rowid if durable else None)
+        
+        with self._writing() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, values)
+            conn.commit()
         return InsertResult(cursor.lastrowid)
     
-    def find_one(self, query: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+    def insert_many(self, documents, ordered: bool = True, chunk_size: int = INSERT_CHUNK_SIZE) -> Any:
+        """Insert many documents with one transaction (and one commit) per chunk.
+        
+        With ordered=True the first failing document stops the batch; earlier
+        documents stay committed. With ordered=False every valid document is
+        inserted and failures are collected. Either way errors are raised as
+        BulkWriteError once the batch is done.
+        """
+        sql = _insert_sql(self.name)
+        inserted_ids: List[int] = []
+        write_errors: List[Dict[str, Any]] = []
+        
+        chunk: List[tuple] = []
+        offset = 0
+        with self._writing() as conn:
+            for document in documents:
+                chunk.append(_insert_values(self.name, document))
+                if len(chunk) >= chunk_size:
+                    if not self._insert_chunk(conn, sql, chunk, offset, ordered, inserted_ids, write_errors):
+                        break
+                    offset += len(chunk)
+                    chunk = []
+            else:
+                if chunk:
+                    self._insert_chunk(conn, sql, chunk, offset, ordered, inserted_ids, write_errors)
+        
+        if write_errors:
+            raise BulkWriteError({
+                "writeErrors": write_errors,
+                "nInserted": len(inserted_ids),
+                "insertedIds": inserted_ids,
+            })
+        
+        class InsertManyResult:
+            def __init__(self, ids):
+                self.inserted_ids = ids
+        
+        return InsertManyResult(inserted_ids)
+    
+    def _insert_chunk(self, conn, sql, rows, offset, ordered, inserted_ids, write_errors) -> bool:
+        """Insert one chunk; returns False when an ordered batch must stop."""
+        try:
+            with conn:
+                cursor = conn.executemany(sql, rows)
+                last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            # AUTOINCREMENT ids are contiguous inside a single write transaction
+            inserted_ids.extend(range(last_id - cursor.rowcount + 1, last_id + 1))
+            return True
+        except sqlite3.Error:
+            pass
+        
+        # Retry the failing chunk row by row to find the offending documents
+        with conn:
+            for index, values in enumerate(rows):
+                try:
+                    inserted_ids.append(conn.execute(sql, values).lastrowid)
+                except sqlite3.Error as e:
+                    write_errors.append({"index": offset + index, "errmsg": str(e)})
+                    if ordered:
+                        return False
+        return True
+    
+    def find_one(self, query: Dict[str, Any] = None, projection=None) -> Optional[Dict[str, Any]]:
         """Find a single document."""
-        cursor = self.conn.cursor()
+        return next(iter(self.find(query, projection).limit(1)), None)
+    
+    def find(self, query: Dict[str, Any] = None, projection=None) -> 'SQLiteCursor':
+        """Find multiple documents, optionally selecting only the projected fields."""
+        return SQLiteCursor(self._conn, self.name, query, projection)
+    
+    def search(self, text: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Full-text search over report symptoms and location names.
         
-        if query and 'email' in query and self.name == "users":
-            cursor.execute("SELECT * FROM users WHERE email = ?", (query['email'],))
-        elif query and '_id' in query:
-            cursor.execute(f"SELECT * FROM {self.name} WHERE id = ?", (query['_id'],))
-        else:
-            cursor.execute(f"SELECT * FROM {self.name} LIMIT 1")
+        Results are ranked by BM25 (best first); each document gets a `score`
+        and an HTML-escaped `snippet` with matches wrapped in <mark> tags.
+        """
+        if self.name != "reports":
+            raise ValueError("Full-text search is only available for reports")
+        if not fts_enabled:
+            raise RuntimeError("Full-text search is not available in this SQLite build")
+        match = _fts_query(text)
+        if not match:
+            return []
         
-        row = cursor.fetchone()
-        if row:
-            return self._row_to_dict(row)
-        return None
+        projection = _get_projection(self.name)
+        select = ", ".join(f"reports.{c}" for c in projection.select.split(", "))
+        cursor = self.conn.execute(f"""
+            SELECT {select},
+                   bm25(reports_fts) AS score,
+                   snippet(reports_fts, -1, '{_HIT_START}', '{_HIT_END}', '…', 12) AS snippet
+            FROM reports_fts JOIN reports ON reports.id = reports_fts.rowid
+            WHERE reports_fts MATCH ?
+            ORDER BY score
+            LIMIT ?
+        """, (match, int(limit)))
+        results = []
+        for row in cursor:
+            doc = projection.to_dict(row)
+            # bm25() is lower-is-better; flip it so higher means more relevant
+            doc["score"] = -row["score"]
+            doc["snippet"] = _highlight(row["snippet"])
+            results.append(doc)
+        return results
     
-    def find(self, query: Dict[str, Any] = None) -> 'SQLiteCursor':
-        """Find multiple documents."""
-        return SQLiteCursor(self.conn, self.name, query)
+    def within_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+                    limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Reports whose coordinates fall inside a lat/lng bounding box.
+        
+        A box with min_lng > max_lng crosses the antimeridian.
+        """
+        return list(self._iter_bbox(min_lat, min_lng, max_lat, max_lng, limit))
+    
+    def near(self, lat: float, lng: float, radius_km: float, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Reports within `radius_km` of a point, nearest first, with `distance_km` set.
+        
+        The bounding box of the circle is looked up in the R*Tree and the
+        candidates are refined by haversine distance.
+        """
+        results = []
+        for doc in self._iter_bbox(*bbox_around(lat, lng, radius_km)):
+            distance = haversine_km(lat, lng, doc["lat"], doc["lng"])
+            if distance <= radius_km:
+                doc["distance_km"] = round(distance, 3)
+                results.append(doc)
+        results.sort(key=lambda d: d["distance_km"])
+        return results[:limit] if limit else results
+    
+    def _iter_bbox(self, min_lat, min_lng, max_lat, max_lng, limit=None):
+        if self.name != "reports":
+            raise ValueError("Spatial queries are only available for reports")
+        projection = _get_projection(self.name)
+        select = ", ".join(f"reports.{c}" for c in projection.select.split(", "))
+        # Exact bounds are re-checked on reports because R*Tree stores 32-bit floats
+        where = "reports.lat BETWEEN ? AND ? AND reports.lng BETWEEN ? AND ?"
+        if rtree_enabled:
+            sql = (f"SELECT {select} FROM reports_geo JOIN reports ON reports.id = reports_geo.id "
+                   f"WHERE reports_geo.max_lat >= ? AND reports_geo.min_lat <= ? "
+                   f"AND reports_geo.max_lng >= ? AND reports_geo.min_lng <= ? AND {where}")
+        else:
+            sql = f"SELECT {select} FROM reports WHERE {where}"
+        if limit:
+            sql += " LIMIT ?"
+        # A box crossing the antimeridian is two range queries, one on each side
+        spans = [(min_lng, max_lng)] if min_lng <= max_lng else [(min_lng, 180.0), (-180.0, max_lng)]
+        remaining = int(limit) if limit else None
+        for lo, hi in spans:
+            params = [min_lat, max_lat, lo, hi]
+            if rtree_enabled:
+                params = params + params
+            if remaining is not None:
+                params.append(remaining)
+            for row in self.conn.execute(sql, params):
+                yield projection.to_dict(row)
+                if remaining is not None:
+                    remaining -= 1
+            if remaining == 0:
+                return
+    
+    def aggregate(self, pipeline: List[Dict[str, Any]]):
+        """Run a $match/$group/$sort/$limit pipeline as a single SQL query."""
+        projection = _get_projection(self.name)
+        sql, params, outputs = compile_aggregate(
+            self.name, table_columns(self.name), pipeline, select=projection.select
+        )
+        cursor = self.conn.execute(sql, params)
+        return self._iter_aggregate(cursor, outputs, projection)
+    
+    def _iter_aggregate(self, cursor, outputs, projection):
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                if not outputs:
+                    yield projection.to_dict(row)
+                    continue
+                doc = {}
+                for name, value in zip(outputs, row):
+                    _set_path(doc, name, value)
+                yield doc
     
     def delete_one(self, query: Dict[str, Any]) -> Any:
         """Delete a single document."""
-        cursor = self.conn.cursor()
-        
-        if '_id' in query:
-            cursor.execute(f"DELETE FROM {self.name} WHERE id = ?", (query['_id'],))
-        elif 'email' in query and self.name == "users":
-            cursor.execute("DELETE FROM users WHERE email = ?", (query['email'],))
-        
-        self.conn.commit()
+        where, params = compile_where(table_columns(self.name), query)
+        with self._writing() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"DELETE FROM {self.name} WHERE id = (SELECT id FROM {self.name} WHERE {where} LIMIT 1)",
+                params
+            )
+            conn.commit()
         
         class DeleteResult:
             def __init__(self, count):
                 self.deleted_count = count
         
         return DeleteResult(cursor.rowcount)
-    
+
+    def update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> Any:
+        """Update a single document. Only `$set` is supported.
+
+        Structured columns are written directly; every field is also set in
+        the JSON `data` document so the two never disagree.
+        """
+        if set(update) != {"$set"} or not update["$set"]:
+            raise ValueError("update_one only supports a non-empty $set")
+        columns = table_columns(self.name)
+        assignments, values = [], []
+        json_paths, json_values = [], []
+        for field, value in update["$set"].items():
+            if field == "_id":
+                raise ValueError("_id cannot be updated")
+            field_sql(field, ())  # rejects names that are not plain dotted paths
+            value = _serialize_value(value)
+            if field in columns:
+                assignments.append(f"{field} = ?")
+                values.append(value)
+            if isinstance(value, (dict, list)):
+                json_paths.append(f"'$.{field}', json(?)")
+                json_values.append(json.dumps(value))
+            else:
+                json_paths.append(f"'$.{field}', ?")
+                json_values.append(value)
+        assignments.append(f"data = json_set(COALESCE(data, '{{}}'), {', '.join(json_paths)})")
+
+        where, params = compile_where(columns, query)
+        with self._writing() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"UPDATE {self.name} SET {', '.join(assignments)} "
+                f"WHERE id = (SELECT id FROM {self.name} WHERE {where} LIMIT 1)",
+                values + json_values + params
+            )
+            conn.commit()
+
+        class UpdateResult:
+            def __init__(self, count):
+                self.matched_count = count
+                self.modified_count = count
+
+        return UpdateResult(cursor.rowcount)
+
     def drop(self):
         """Drop the collection (table)."""
-        cursor = self.conn.cursor()
-        cursor.execute(f"DELETE FROM {self.name}")
-        self.conn.commit()
+        with self._writing() as conn:
+            conn.execute(f"DELETE FROM {self.name}")
+            conn.commit()
     
     def create_index(self, field, unique=False):
-        """Create an index (stub for compatibility)."""
-        # Indexes are already created in create_tables()
-        pass
-    
-    def _row_to_dict(self, row) -> Dict[str, Any]:
-        """Convert SQLite row to dictionary."""
-        if self.name == "reports":
-            # For reports, use structured columns
-            return {
-                "_id": row['id'],
-                "timestamp": row['timestamp'],
-                "reporter": row['reporter'],
-                "location_name": row['location_name'],
-                "lat": row['lat'],
-                "lng": row['lng'],
-                "symptoms": row['symptoms'],
-                "cases": row['cases'],
-                "turbidity": row['turbidity'],
-                "ph": row['ph'],
-                "chlorine": row['chlorine'],
-                "tds": row['tds'],
-                "fluoride": row['fluoride'],
-                "nitrate": row['nitrate'],
-                "chloride": row['chloride'],
-                "ec": row['ec'],
-                "ai_prediction": row['ai_prediction'],
-                "ai_confidence": row['ai_confidence'],
-            }
-        else:
-            # For other tables, parse from JSON data field
-            doc = json.loads(row['data']) if row['data'] else {}
-            doc['_id'] = row['id']
-            return doc
+        """Create an index on a column or JSON field (idempotent)."""
+        expr = field_sql(field, table_columns(self.name))
+        name = f"idx_{self.name}_{field.replace('.', '_')}{'_unique' if unique else ''}"
+        with self._writing() as conn:
+            conn.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {self.name}({expr})")
+            conn.commit()
+        return name
 
 
 class SQLiteCursor:
     """Cursor for iterating over query results."""
     
-    def __init__(self, conn: sqlite3.Connection, table_name: str, query: Dict[str, Any] = None):
-        self.conn = conn
+    def __init__(self, conn: Optional[sqlite3.Connection], table_name: str, query: Dict[str, Any] = None,
+                 projection=None):
+        self._conn = conn
         self.table_name = table_name
         self.query = query
-        self._sort_field = None
-        self._sort_order = None
+        self.projection = projection
+        self._sort = ()
         self._limit_value = None
+        self._batch_size = FETCH_BATCH_SIZE
+        self._as_tuples = False
     
-    def sort(self, field: str, order: int = 1):
-        """Sort results."""
-        self._sort_field = field
-        self._sort_order = "ASC" if order == 1 else "DESC"
+    def sort(self, field, order: int = 1):
+        """Sort results by a field, or by a list of (field, order) pairs."""
+        if isinstance(field, (list, tuple)):
+            self._sort = tuple((f, 1 if o == 1 else -1) for f, o in field)
+        else:
+            self._sort = ((field, 1 if order == 1 else -1),)
         return self
     
     def limit(self, count: int):
@@ -344,33 +1273,46 @@ class SQLiteCursor:
         self._limit_value = count
         return self
     
+    def batch_size(self, count: int):
+        """Number of rows fetched from SQLite per round trip."""
+        self._batch_size = max(1, count)
+        return self
+    
+    def as_tuples(self):
+        """Yield lightweight namedtuples (id first, then the projected fields) instead of dicts."""
+        self._as_tuples = True
+        return self
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self._conn if self._conn is not None else get_read_connection()
+    
     def __iter__(self):
         """Execute query and return iterator."""
         cursor = self.conn.cursor()
+        projection = _get_projection(self.table_name, self.projection)
         
-        # Build query
-        sql = f"SELECT * FROM {self.table_name}"
-        
-        # Add ORDER BY if specified
-        if self._sort_field:
-            sql += f" ORDER BY {self._sort_field} {self._sort_order}"
-        
-        # Add LIMIT if specified
-        if self._limit_value:
-            sql += f" LIMIT {self._limit_value}"
-        
-        cursor.execute(sql)
+        # Compile filter, sort and limit into one parameterized statement
+        sql, params = compile_find(
+            self.table_name, table_columns(self.table_name), self.query,
+            sort=self._sort, limit=self._limit_value, select=projection.select
+        )
+        cursor.execute(sql, params)
         
-        # Convert rows to dictionaries
-        collection = _SQLiteCollection(self.conn, self.table_name)
-        for row in cursor:
-            yield collection._row_to_dict(row)
+        # Stream rows in batches instead of materializing the result
+        convert = projection.to_tuple if self._as_tuples else projection.to_dict
+        while True:
+            rows = cursor.fetchmany(self._batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield convert(row)
 
 
 class _SQLiteCompat:
     """Compatibility layer to mimic MongoDB db object."""
     
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
         self.conn = conn
         self.name = os.path.basename(db_path) if db_path else "healthcore.db"
         
@@ -385,26 +1327,33 @@ class _SQLiteCompat:
 
 def get_collection(name: str):
     """Get a collection by registry key or raw name."""
-    if connection is None:
+    if pool is None:
         raise RuntimeError("Database not initialized. Call init_db() first.")
     
     table_name = COLLECTIONS.get(name, name)
-    return _SQLiteCollection(connection, table_name)
+    return _SQLiteCollection(None, table_name)
 
 
 def close_db():
-    """Close the database connection."""
-    global connection
-    if connection:
+    """Close the connection pool and every pooled connection."""
+    global pool, read_pool, writer
+    if pool:
         try:
-            connection.close()
+            if writer is not None:
+                writer.stop()
+                writer = None
+            release_connection()
+            if read_pool is not None:
+                read_pool.close()
+                read_pool = None
+            pool.close()
             logger.info("✅ SQLite database closed.")
         except Exception as e:
             logger.error(f"Error closing SQLite database: {e}")
         finally:
-            connection = None
+            pool = None
     else:
-        logger.info("SQLite connection was already None.")
+        logger.info("SQLite connection pool was already None.")
 
 
 # Create a global db object for compatibility
@@ -414,8 +1363,8 @@ class _MongoCompatWrapper:
     
     @property
     def db(self):
-        if connection:
-            return _SQLiteCompat(connection)
+        if pool:
+            return _SQLiteCompat()
         return None
 
 mongo = _MongoCompatWrapper()
@@ -0,0 +1,161 @@
+"""
+Process-pool backend for model inference.
+
+Tree traversal is CPU-bound and holds the GIL, so threaded workers scoring
+on the request thread serialize on it. `InferencePool` runs predict_proba in
+a pool of worker processes instead, each of which loads the model once (via
+predict_simple.load_model) when it starts. Each call carries the model
+version the parent is serving; a worker still on another version reloads
+before scoring, so results are never tagged with the wrong version.
+
+Feature batches of at least `shm_min_rows` rows are handed over through
+`multiprocessing.shared_memory` rather than pickled; smaller ones are sent
+inline. A worker that dies takes the pool down with BrokenProcessPool; the
+pool is then rebuilt and the call retried once. Calls that exceed `timeout`
+raise TimeoutError and the (possibly stuck) workers are replaced.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+
+def _init_worker(model_path, registry_root=None):
+    from models import predict_simple
+    from models.registry import ModelRegistry
+
+    if model_path:
+        predict_simple.MODEL_PATH = model_path
+        predict_simple.ARTIFACT_PATH = os.path.splitext(model_path)[0] + '.joblib'
+    if registry_root:
+        predict_simple.registry = ModelRegistry(registry_root)
+    predict_simple.load_model()
+
+
+def _score(features, shm_name=None, shape=None, version=None):
+    """predict_proba inside a worker; features arrive inline or via shared memory"""
+    from models import predict_simple
+
+    predict_simple._ensure_model()
+    state = predict_simple.current_state()
+    if version is not None and (state is None or state.version != version):
+        # The parent switched models since this worker last checked
+        predict_simple.load_model()
+        state = predict_simple.current_state()
+        if state is None or state.version != version:
+            raise RuntimeError(f"Inference worker serves model {state and state.version}, not {version}")
+    engine = state.engine if state is not None else None
+    if engine is None:
+        raise RuntimeError("Model not loaded in inference worker")
+    if shm_name is None:
+        return engine.predict_proba(features)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    # The parent owns (and unlinks) the block; don't let this process's tracker claim it
+    resource_tracker.unregister(shm._name, "shared_memory")
+    try:
+        return engine.predict_proba(np.ndarray(shape, dtype=np.float64, buffer=shm.buf))
+    finally:
+        shm.close()
+
+
+class InferencePool:
+    """predict_proba executed in worker processes"""
+
+    def __init__(self, processes=None, timeout=30.0, model_path=None,
+                 start_method="spawn", shm_min_rows=256, registry_root=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.timeout = timeout
+        self.model_path = model_path
+        self.registry_root = registry_root
+        self.start_method = start_method
+        self.shm_min_rows = shm_min_rows
+        self.pid = os.getpid()
+        self._executor = None
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.rows = 0
+        self.shm_batches = 0
+        self.restarts = 0
+        self.timeouts = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                    initargs=(self.model_path, self.registry_root),
+                )
+            return self._executor
+
+    def _restart(self, executor):
+        with self._lock:
+            if self._executor is not executor:
+                return  # another thread already replaced it
+            self._executor = None
+            self.restarts += 1
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def predict_proba(self, features, version=None):
+        """Score features with the workers' model (reloaded first if it isn't `version`)"""
+        features = np.ascontiguousarray(features, dtype=np.float64)
+        try:
+            return self._submit(features, version)
+        except BrokenProcessPool:
+            # A worker crashed and the pool was rebuilt; retry once on the new one
+            return self._submit(features, version)
+
+    def _submit(self, features, version):
+        executor = self._get_executor()
+        shm = None
+        shared = False
+        try:
+            if features.shape[0] >= self.shm_min_rows:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, features.nbytes))
+                np.ndarray(features.shape, dtype=np.float64, buffer=shm.buf)[:] = features
+                future = executor.submit(_score, None, shm.name, features.shape, version)
+                shared = True
+            else:
+                future = executor.submit(_score, features, None, None, version)
+            result = future.result(self.timeout)
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            self._restart(executor)
+            raise TimeoutError(f"Inference did not finish within {self.timeout}s")
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        with self._lock:
+            self.tasks += 1
+            self.rows += features.shape[0]
+            self.shm_batches += shared
+        return result
+
+    def stats(self):
+        return {
+            'processes': self.processes,
+            'tasks': self.tasks,
+            'rows': self.rows,
+            'shm_batches': self.shm_batches,
+            'restarts': self.restarts,
+            'timeouts': self.timeouts,
+        }
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,152 @@
+"""
+In-process micro-batching for concurrent single-row predictions.
+
+Request threads `submit` one input each and wait on a Future. A scheduler
+thread collects inputs until `max_batch_size` are queued or `max_wait`
+seconds have passed since the first one arrived, runs the batch handler once
+(e.g. predict_risk_levels, a single vectorized model call) and resolves
+every caller's Future with its own result.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+def _bucket(n):
+    """Histogram bucket for n: the smallest power of two >= n ("0" for 0)"""
+    if n <= 0:
+        return "0"
+    return str(1 << (n - 1).bit_length())
+
+
+class MicroBatcher:
+    """Groups concurrent submissions into batches for a list -> list handler"""
+
+    def __init__(self, handler, max_batch_size=32, max_wait=0.002, name="micro-batcher"):
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.batch_sizes = {}
+        self.queue_depths = {}
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def _ensure_started(self):
+        # A thread started before a fork does not exist in the child; start a new one there
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def submit(self, item):
+        """Queue one input; returns a Future resolved with its result"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def close(self):
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            thread.join(timeout=5)
+        self._thread = None
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'errors': self.errors,
+                'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+                'batch_size_histogram': dict(self.batch_sizes),
+                'queue_depth_histogram': dict(self.queue_depths),
+                'queue_depth': self._queue.qsize(),
+                'wait_ms_avg': self.wait_ms_total / self.items if self.items else 0.0,
+                'wait_ms_max': self.wait_ms_max,
+            }
+
+    def _run(self):
+        q = self._queue
+        while True:
+            first = q.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    # Take whatever is already queued without waiting
+                    item = q.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = q.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._process(batch, q.qsize())
+            if stop:
+                return
+
+    def _process(self, batch, depth):
+        started = time.perf_counter()
+        futures = [future for _, future, _ in batch]
+        try:
+            results = self.handler([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: handler returned {len(results)} results for {len(batch)} inputs")
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            failed = True
+        else:
+            for future, result in zip(futures, results):
+                future.set_result(result)
+            failed = False
+
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.errors += len(batch) if failed else 0
+            size = _bucket(len(batch))
+            self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+            pending = _bucket(depth)
+            self.queue_depths[pending] = self.queue_depths.get(pending, 0) + 1
+            for _, _, queued_at in batch:
+                wait_ms = (started - queued_at) * 1000
+                self.wait_ms_total += wait_ms
+                self.wait_ms_max = max(self.wait_ms_max, wait_ms)
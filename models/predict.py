@@ -1,26 +1,42 @@
-import pickle
+import threading
 import numpy as np
-import pandas as pd
+from models.predict_simple import _model_file, _read_package
 
-# Load trained health risk prediction model
-try:
-    with open('models/health_risk_prediction_model.pkl', 'rb') as f:
-        model_package = pickle.load(f)
-    
-    model = model_package['model']
-    scaler = model_package['scaler']
-    feature_names = model_package['feature_names']
-    classes = model_package['classes']
-    
-    print("Health risk prediction model loaded successfully")
-    print(f"Model accuracy: {model_package['accuracy']:.4f}")
-    print(f"Features: {feature_names}")
-    print(f"Risk levels: {list(classes)}")
-    
-except FileNotFoundError:
-    print("Model file 'health_risk_prediction_model.pkl' not found")
-    print("Please ensure the model is trained and saved first")
-    model = None
+# Trained health risk prediction model, loaded on first use (see _load_model)
+model = None
+scaler = None
+feature_names = None
+classes = None
+_loaded = False
+_load_lock = threading.Lock()
+
+
+def _load_model():
+    global model, scaler, feature_names, classes, _loaded
+    if _loaded:
+        return
+    with _load_lock:
+        if _loaded:
+            return
+        try:
+            # Same file predict_simple serves: the registry's active version, else HEALTH_MODEL_PATH
+            model_package = _read_package(_model_file())
+            
+            model = model_package['model']
+            scaler = model_package['scaler']
+            feature_names = model_package['feature_names']
+            classes = model_package['classes']
+            
+            print("Health risk prediction model loaded successfully")
+            print(f"Model accuracy: {model_package['accuracy']:.4f}")
+            print(f"Features: {feature_names}")
+            print(f"Risk levels: {list(classes)}")
+            
+        except FileNotFoundError:
+            print(f"Model file '{_model_file()}' not found")
+            print("Please ensure the model is trained and saved first")
+            model = None
+        _loaded = True
 
 def predict_risk_level(input_data):
     """
@@ -44,7 +60,7 @@ def predict_risk_level(input_data):
         - confidence: Confidence score
         - input_features: Features used for prediction
     """
-    
+    _load_model()
     if model is None:
         return {
             'error': 'Model not loaded. Please train and save the model first.',
@@ -1,33 +1,348 @@
 import pickle
+import threading
+import time
 import numpy as np
-import pandas as pd
 import os
+from typing import Any, NamedTuple, Optional
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from models.micro_batcher import MicroBatcher
+from models.prediction_cache import PredictionCache
+from models.registry import ModelRegistry, ShadowScorer
+from models.risk_grid import RiskGrid
+from models.tree_engine import compile_model
 
-# Load trained health risk prediction model
-model = None
-scaler = None
-feature_names = None
-classes = None
+# Nothing is loaded at import time: the model is loaded on first use (see
+# _ensure_model), so processes that never predict never pay for unpickling.
+MODEL_PATH = os.environ.get("HEALTH_MODEL_PATH") or os.path.join(
+    os.path.dirname(__file__), 'health_risk_prediction_model.pkl')
+# Preferred when present: joblib artifact loaded with mmap_mode='r', so forked
+# workers share the (compiled) tree arrays through the page cache
+ARTIFACT_PATH = os.path.splitext(MODEL_PATH)[0] + '.joblib'
+
+# Versioned artifacts; when it has an active version, that one is served
+registry = ModelRegistry()
+
+
+class ModelState(NamedTuple):
+    """A loaded model and everything derived from it, published as one unit"""
+    model: Any
+    scaler: Any
+    feature_names: list
+    classes: Any
+    version: Optional[str]
+    engine: Any  # what predict_proba runs on: compiled trees or the model itself
+
+
+# Trained health risk prediction model (see load_model). Swapped by a single
+# assignment, and every prediction reads it once, so a reload can never mix
+# one model's scores with another's version, classes or cache keys.
+_state = None
+_model_signature = None
+_load_attempted = False
+# Reentrant: _ensure_model starts the configured shadow while holding it
+_model_lock = threading.RLock()
+
+_STATE_FIELDS = {'model': 'model', 'scaler': 'scaler', 'feature_names': 'feature_names',
+                 'classes': 'classes', 'model_version': 'version'}
+
+
+def current_state():
+    """The loaded ModelState, or None; read it once and use it for a whole prediction"""
+    return _state
+
+
+def __getattr__(name):
+    # Read-only views of the current state under their historical module names
+    if name in _STATE_FIELDS:
+        state = _state
+        return getattr(state, _STATE_FIELDS[name]) if state is not None else None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _model_file():
+    active = registry.active_path()
+    if active is not None:
+        return active
+    return ARTIFACT_PATH if os.path.exists(ARTIFACT_PATH) else MODEL_PATH
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+
+def _read_package(path):
+    if path.endswith('.joblib'):
+        import joblib
+        return joblib.load(path, mmap_mode='r')
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def load_model(path=None):
+    """
+    (Re)load the model package from disk
+
+    The new package is read completely before it replaces the current one,
+    and a failed reload keeps serving the model that was already loaded.
+    """
+    global _state, _model_signature, _load_attempted
+    path = path or _model_file()
+    signature = _file_signature(path)
+    current = _state
+    state = None
+    try:
+        model_package = _read_package(path)
+        # Registry artifacts carry their version; plain files are versioned by mtime and size
+        state = ModelState(model_package['model'], model_package['scaler'], model_package['feature_names'],
+                           model_package['classes'],
+                           model_package.get('version') or f"{signature[1]}-{signature[2]}",
+                           build_engine(model_package['model'], model_package.get('compiled')))
+    except FileNotFoundError:
+        print("Model file not found")
+        print("Please ensure the model is trained and saved first")
+    except Exception as e:
+        if current is None:
+            raise
+        print(f"Could not load model from {path}, keeping version {current.version}: {e}")
+
+    if state is not None:
+        if RISK_GRID:
+            build_risk_grid(state)
+        _state = state
+        print("Health risk prediction model loaded successfully")
+        print(f"Model accuracy: {model_package['accuracy']:.4f}")
+    _model_signature = signature
+    _load_attempted = True
+    prediction_cache.clear()
+
+
+def build_artifact(src=None, version=None):
+    """Pickled model package with precompiled trees (and an optional registry version)"""
+    with open(src or MODEL_PATH, 'rb') as f:
+        package = pickle.load(f)
+    try:
+        package['compiled'] = compile_model(package['model'])
+    except TypeError:
+        package['compiled'] = None
+    if version is not None:
+        package['version'] = version
+    return package
+
+
+def save_artifact(src=None, dst=None):
+    """Write the pickled model package as a joblib artifact with precompiled trees"""
+    import joblib
+    dst = dst or ARTIFACT_PATH
+    joblib.dump(build_artifact(src), dst)
+    return dst
+
+
+def request_reload(*_):
+    """Check the model file (and registry pointer) on the next prediction; usable as a signal handler"""
+    global _last_model_check
+    _last_model_check = float('-inf')
+
+
+def activate_model(version):
+    """
+    Make a registered version the active model in this process now
+
+    The artifact is loaded before the registry pointer moves, so a broken
+    version is rejected while the current model keeps serving; other
+    processes switch on their next model-file check.
+    """
+    global _last_model_check
+    path = registry.path(version)
+    _read_package(path)  # raises if the artifact cannot be loaded
+    with _model_lock:
+        registry.activate(version)
+        load_model(path)
+        _last_model_check = time.monotonic()
+    return _state.version
+
+
+# Input keys in model feature order: ['pH', 'Total_Cases', 'TDS', 'F', 'NO3', 'Cl', 'EC in uS/cm']
+FEATURE_KEYS = ['ph', 'cases', 'tds', 'fluoride', 'nitrate', 'chloride', 'ec']
+# Median defaults for missing optional features (NaN = no default, value is required)
+FEATURE_DEFAULTS = np.array([np.nan, 0.0, 414.0, 0.35, 13.0, 50.0, 643.0])
+# Decimal places each feature is rounded to before scoring (sensor precision)
+FEATURE_PRECISION = [2, 0, 0, 2, 1, 1, 0]
+
+# Predictions keyed by (model version, quantized features); PREDICTION_CACHE_SIZE=0 disables
+prediction_cache = PredictionCache(
+    max_entries=int(os.environ.get("PREDICTION_CACHE_SIZE", "4096")),
+    ttl=float(os.environ.get("PREDICTION_CACHE_TTL", "300")),
+)
+# How often (seconds) to check whether the model file on disk changed
+MODEL_CHECK_INTERVAL = float(os.environ.get("MODEL_CHECK_INTERVAL", "5"))
+_last_model_check = 0.0
+
+# Inference engine: "numpy" (compiled trees), "sklearn", or "auto" (numpy when the model is a tree ensemble)
+PREDICTION_ENGINE = os.environ.get("PREDICTION_ENGINE", "auto").lower()
+
+
+def build_engine(model, compiled=None):
+    """Object whose predict_proba scores feature matrices for `model`, per PREDICTION_ENGINE"""
+    if model is None or PREDICTION_ENGINE == "sklearn":
+        return model
+    if compiled is not None:
+        return compiled
+    try:
+        return compile_model(model)
+    except TypeError as e:
+        if PREDICTION_ENGINE == "numpy":
+            raise
+        print(f"Compiled engine unavailable, using sklearn: {e}")
+        return model
+
+
+def get_engine():
+    """Engine of the loaded model (None when no model is loaded)"""
+    state = _state
+    return state.engine if state is not None else None
+
+
+def _ensure_model():
+    """Load the model on first use, then reload it when its file changes"""
+    global _last_model_check
+    if _state is None and not _load_attempted:
+        with _model_lock:
+            if _state is None and not _load_attempted:
+                load_model()
+                _last_model_check = time.monotonic()
+                if MODEL_SHADOW_VERSION and shadow is None:
+                    try:
+                        start_shadow(MODEL_SHADOW_VERSION)
+                    except Exception as e:
+                        print(f"Shadow model {MODEL_SHADOW_VERSION} not started: {e}")
+        return
+    # Checked at most every MODEL_CHECK_INTERVAL seconds
+    now = time.monotonic()
+    if now - _last_model_check < MODEL_CHECK_INTERVAL:
+        return
+    with _model_lock:
+        if now - _last_model_check < MODEL_CHECK_INTERVAL:
+            return
+        _last_model_check = now
+        if _file_signature(_model_file()) != _model_signature:
+            load_model()
+
+
+# Candidate registry version scored on a sample of live traffic (see start_shadow)
+MODEL_SHADOW_VERSION = os.environ.get("MODEL_SHADOW_VERSION")
+MODEL_SHADOW_SAMPLE = float(os.environ.get("MODEL_SHADOW_SAMPLE", "0.1"))
+shadow = None
+
+
+def start_shadow(version, sample_rate=None):
+    """Score a sampled fraction of predictions with a registered candidate version"""
+    global shadow
+    package = _read_package(registry.path(version))
+    engine = package.get('compiled')
+    if engine is None:
+        try:
+            engine = compile_model(package['model'])
+        except TypeError:
+            engine = package['model']
+    # Same lock as model swaps, so the feature check holds for the model being served
+    with _model_lock:
+        state = _state
+        if state is not None and list(package['feature_names']) != list(state.feature_names):
+            raise ValueError(f"Model {version} expects features {package['feature_names']}")
+        previous, shadow = shadow, ShadowScorer(
+            package.get('version') or version, engine, package['classes'],
+            sample_rate=MODEL_SHADOW_SAMPLE if sample_rate is None else sample_rate,
+        )
+        scorer = shadow
+    if previous is not None:
+        previous.close(wait=False)
+    return scorer
+
+
+def stop_shadow():
+    global shadow
+    with _model_lock:
+        previous, shadow = shadow, None
+    if previous is not None:
+        previous.close(wait=False)
+
+
+def _offer_shadow(state, features, probabilities, elapsed_ms):
+    scorer = shadow
+    if scorer is not None:
+        scorer.offer(features, np.asarray(state.classes)[probabilities.argmax(axis=1)], elapsed_ms)
+
+
+# Lookup grid for pH/cases-only readings (see models/risk_grid.py), rebuilt on every model load
+RISK_GRID = os.environ.get("RISK_GRID", "false").lower() in ("1", "true", "yes")
+RISK_GRID_PH_STEP = float(os.environ.get("RISK_GRID_PH_STEP", "0.01"))
+RISK_GRID_PH_RANGE = tuple(float(v) for v in os.environ.get("RISK_GRID_PH_RANGE", "4,10").split(","))
+RISK_GRID_MAX_CASES = int(os.environ.get("RISK_GRID_MAX_CASES", "100"))
+RISK_GRID_CASES_STEP = int(os.environ.get("RISK_GRID_CASES_STEP", "1"))
+risk_grid = None
+
+
+def build_risk_grid(state=None):
+    """Score the (pH, cases) grid with a model state (default: the loaded one) and check it against the model"""
+    global risk_grid
+    state = state or _state
+    try:
+        engine = state.engine
+        grid = RiskGrid.build(engine, FEATURE_DEFAULTS, ph_min=RISK_GRID_PH_RANGE[0], ph_max=RISK_GRID_PH_RANGE[1],
+                              ph_step=RISK_GRID_PH_STEP, max_cases=RISK_GRID_MAX_CASES,
+                              cases_step=RISK_GRID_CASES_STEP, model_version=state.version)
+        report = grid.verify(engine, FEATURE_DEFAULTS, ph_decimals=FEATURE_PRECISION[0])
+    except Exception as e:
+        print(f"Risk lookup grid not built: {e}")
+        risk_grid = None
+        return None
+    risk_grid = grid
+    print(f"Risk lookup grid: {grid.stats()['points']} points in {grid.build_ms:.0f} ms, "
+          f"{report['label_agreement']:.2%} agreement with the model "
+          f"(max probability error {report['max_probability_error']:.4f})")
+    return grid
+
+
+def _grid_lookup(state, features):
+    """(probabilities, on_grid mask) for quantized pH/cases-only rows, or (None, None)"""
+    grid = risk_grid
+    if grid is None or grid.model_version != state.version:
+        return None, None
+    return grid.lookup(features[:, 0], features[:, 1])
+
+
+def quantize_features(features):
+    """Round a (rows, 7) feature matrix to sensor precision"""
+    features = np.array(features, dtype=float)
+    for j, decimals in enumerate(FEATURE_PRECISION):
+        features[:, j] = np.round(features[:, j], decimals)
+    return features
+
+
+def _scored_result(state, features, probabilities):
+    k = int(probabilities.argmax())
+    prediction = state.classes[k]
+    confidence = float(probabilities[k])
+    safe_feature_names = [name.replace('μ', 'u') for name in state.feature_names]
+    return {
+        'predicted_risk_level': prediction,
+        'probabilities': dict(zip(state.classes, probabilities.tolist())),
+        'confidence': confidence,
+        'input_features': dict(zip(safe_feature_names, features.tolist())),
+        'interpretation': _interpret_risk_level(prediction, confidence),
+        'model_version': state.version,
+    }
+
+
+def _copy_result(result):
+    # Cached dicts are shared; hand out copies callers can modify
+    return dict(result, probabilities=dict(result['probabilities']),
+                input_features=dict(result['input_features']))
 
-try:
-    model_path = os.path.join(os.path.dirname(__file__), 'health_risk_prediction_model.pkl')
-    with open(model_path, 'rb') as f:
-        model_package = pickle.load(f)
-    
-    model = model_package['model']
-    scaler = model_package['scaler']
-    feature_names = model_package['feature_names']
-    classes = model_package['classes']
-    
-    print("Health risk prediction model loaded successfully")
-    print(f"Model accuracy: {model_package['accuracy']:.4f}")
-    # print(f"Features: {list(feature_names)}")
-    # print(f"Risk levels: {list(classes)}")
-    
-except FileNotFoundError:
-    print("Model file not found")
-    print("Please ensure the model is trained and saved first")
-    model = None
 
 def predict_risk_level(input_data):
     """
@@ -44,6 +359,10 @@ def predict_risk_level(input_data):
         - ec: Electrical Conductivity (optional)
         - temp: Temperature (not used in current model, included for compatibility)
     
+    Readings are rounded to FEATURE_PRECISION before scoring, and results
+    are served from prediction_cache when the same rounded reading was
+    scored recently by the same model.
+    
     Returns:
     dict: Dictionary containing:
         - predicted_risk_level: Predicted risk level
@@ -51,14 +370,10 @@ def predict_risk_level(input_data):
         - confidence: Confidence score
         - input_features: Features used for prediction
     """
-    
-    if model is None:
-        return {
-            'error': 'Model not loaded. Please train and save the model first.',
-            'predicted_risk_level': None,
-            'probabilities': None,
-            'confidence': None
-        }
+    _ensure_model()
+    state = _state  # one model for the whole prediction, even if a reload lands meanwhile
+    if state is None:
+        return _error_result('Model not loaded. Please train and save the model first.')
     
     try:
         # Extract required features
@@ -80,35 +395,206 @@ def predict_risk_level(input_data):
             input_data.get('ec', 643.0)                 # EC (median default)
         ]
         
-        # Convert to numpy array and reshape for prediction
-        feature_array = np.array(features).reshape(1, -1)
-        
-        # Make prediction
-        prediction = model.predict(feature_array)[0]
-        probabilities = model.predict_proba(feature_array)[0]
-        
-        # Create probability dictionary
-        prob_dict = dict(zip(classes, probabilities))
-        confidence = max(probabilities)
+        # Convert to a 1x7 array at sensor precision
+        feature_array = quantize_features([features])
+        if all(input_data.get(k) is None for k in FEATURE_KEYS[2:]):
+            probabilities, on_grid = _grid_lookup(state, feature_array)
+            if on_grid is not None and on_grid[0]:
+                return _scored_result(state, feature_array[0], probabilities[0])
+        key = (state.version, tuple(feature_array[0].tolist()))
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            return _copy_result(cached)
         
-        # Create input features dict with safe names
-        safe_feature_names = [name.replace('μ', 'u') for name in feature_names]
-        
-        return {
-            'predicted_risk_level': prediction,
-            'probabilities': prob_dict,
-            'confidence': float(confidence),
-            'input_features': dict(zip(safe_feature_names, features)),
-            'interpretation': _interpret_risk_level(prediction, confidence)
-        }
+        # Make prediction (one predict_proba; the label is its argmax)
+        started = time.perf_counter()
+        probabilities = _predict_proba(state, feature_array)
+        _offer_shadow(state, feature_array, probabilities, (time.perf_counter() - started) * 1000)
+        result = _scored_result(state, feature_array[0], probabilities[0])
+        prediction_cache.put(key, _copy_result(result))
+        return result
         
     except Exception as e:
-        return {
-            'error': f'Prediction failed: {str(e)}',
-            'predicted_risk_level': None,
-            'probabilities': None,
-            'confidence': None
-        }
+        return _error_result(f'Prediction failed: {str(e)}')
+
+def predict_risk_levels(inputs):
+    """
+    Predict health risk levels for many inputs with one model call
+
+    Parameters:
+    inputs (list): Input dicts as accepted by predict_risk_level
+
+    Returns:
+    list: One result per input, in order. Rows that could not be scored get
+    the same error shape as predict_risk_level; cached rows come from
+    prediction_cache and the rest are scored with a single predict_proba call.
+    """
+    _ensure_model()
+    state = _state
+    if state is None:
+        return [predict_risk_level(row) for row in inputs]
+
+    results = [None] * len(inputs)
+    matrix = np.full((len(inputs), len(FEATURE_KEYS)), np.nan)
+    for i, row in enumerate(inputs):
+        try:
+            values = dict(row)
+            if 'cases' not in values and 'total_cases' in values:
+                values['cases'] = values['total_cases']
+            for j, key in enumerate(FEATURE_KEYS):
+                value = values.get(key)
+                if value is not None:
+                    matrix[i, j] = float(value)
+            if np.isnan(matrix[i, 0]):
+                raise ValueError("pH is required for prediction")
+        except Exception as e:
+            results[i] = _error_result(f'Prediction failed: {str(e)}')
+
+    valid = np.flatnonzero([r is None for r in results])
+    if not valid.size:
+        return results
+
+    # Fill missing optional features with their medians in one pass
+    features = quantize_features(np.where(np.isnan(matrix[valid]), FEATURE_DEFAULTS, matrix[valid]))
+
+    # pH/cases-only readings come straight from the lookup grid
+    defaults_only = np.flatnonzero(np.isnan(matrix[valid][:, 2:]).all(axis=1))
+    if defaults_only.size:
+        probabilities, on_grid = _grid_lookup(state, features[defaults_only])
+        if on_grid is not None:
+            for n, row_probs in zip(defaults_only[on_grid], probabilities):
+                results[valid[n]] = _scored_result(state, features[n], row_probs)
+
+    keys = [(state.version, tuple(row)) for row in features.tolist()]
+    misses = []
+    for n, (i, key) in enumerate(zip(valid, keys)):
+        if results[i] is not None:
+            continue
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            results[i] = _copy_result(cached)
+        else:
+            misses.append(n)
+    if not misses:
+        return results
+
+    try:
+        started = time.perf_counter()
+        probabilities = _predict_proba(state, features[misses])
+        _offer_shadow(state, features[misses], probabilities, (time.perf_counter() - started) * 1000)
+    except Exception as e:
+        error = _error_result(f'Prediction failed: {str(e)}')
+        return [r if r is not None else dict(error) for r in results]
+
+    for n, row_probs in zip(misses, probabilities):
+        result = _scored_result(state, features[n], row_probs)
+        prediction_cache.put(keys[n], _copy_result(result))
+        results[valid[n]] = result
+    return results
+
+
+# Micro-batching of concurrent single predictions (see score_risk_level)
+PREDICTION_MICRO_BATCH = os.environ.get("PREDICTION_MICRO_BATCH", "false").lower() in ("1", "true", "yes")
+PREDICTION_BATCH_SIZE = int(os.environ.get("PREDICTION_BATCH_SIZE", "32"))
+PREDICTION_BATCH_WAIT_MS = float(os.environ.get("PREDICTION_BATCH_WAIT_MS", "2"))
+PREDICTION_TIMEOUT = float(os.environ.get("PREDICTION_TIMEOUT", "5"))
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """Shared MicroBatcher that scores queued inputs with predict_risk_levels"""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    predict_risk_levels,
+                    max_batch_size=PREDICTION_BATCH_SIZE,
+                    max_wait=PREDICTION_BATCH_WAIT_MS / 1000,
+                    name="prediction-batcher",
+                )
+    return _batcher
+
+
+# Where predict_proba runs: "inline" (request thread) or "process" (InferencePool workers)
+PREDICTION_BACKEND = os.environ.get("PREDICTION_BACKEND", "inline").lower()
+PREDICTION_PROCESSES = int(os.environ.get("PREDICTION_PROCESSES", "0")) or None
+_inference_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_inference_pool():
+    """
+    Worker pool for PREDICTION_BACKEND=process (one per serving process)
+
+    Workers load the same model file (or registry version) as this process;
+    the parent still loads it for classes/feature names and cache versioning,
+    and sends its model_version with every call so workers follow reloads
+    and activate_model.
+    """
+    global _inference_pool
+    with _pool_lock:
+        if _inference_pool is None or _inference_pool.pid != os.getpid():
+            from models.inference_pool import InferencePool
+            _inference_pool = InferencePool(
+                processes=PREDICTION_PROCESSES,
+                timeout=PREDICTION_TIMEOUT,
+                model_path=MODEL_PATH,
+                registry_root=registry.root,
+                start_method=os.environ.get("PREDICTION_MP_START", "spawn"),
+            )
+    return _inference_pool
+
+
+def _predict_proba(state, features):
+    if PREDICTION_BACKEND == "process":
+        return get_inference_pool().predict_proba(features, version=state.version)
+    return state.engine.predict_proba(features)
+
+
+def score_risk_level(input_data):
+    """
+    Predict one input the way request handlers should
+
+    With PREDICTION_MICRO_BATCH enabled the input joins concurrent requests
+    in one vectorized model call; otherwise this is predict_risk_level.
+    Returns the same dict shape either way.
+    """
+    if not PREDICTION_MICRO_BATCH:
+        return predict_risk_level(input_data)
+    try:
+        return get_batcher().submit(input_data).result(PREDICTION_TIMEOUT)
+    except FutureTimeoutError:
+        return _error_result(f'Prediction timed out after {PREDICTION_TIMEOUT}s')
+    except Exception as e:
+        return _error_result(f'Prediction failed: {str(e)}')
+
+
+def get_prediction_stats():
+    """Cache, micro-batcher, process-pool, shadow-model and lookup-grid counters"""
+    # Reporting must not start the worker pool (or the batcher thread) as a side effect
+    pool = _inference_pool if PREDICTION_BACKEND == "process" else None
+    state = _state
+    return {
+        'engine': PREDICTION_ENGINE,
+        'model_version': state.version if state is not None else None,
+        'registry_active': registry.active(),
+        'cache': prediction_cache.stats(),
+        'micro_batch': _batcher.stats() if PREDICTION_MICRO_BATCH and _batcher is not None else None,
+        'process_pool': pool.stats() if pool is not None and pool.pid == os.getpid() else None,
+        'shadow': shadow.stats() if shadow is not None else None,
+        'risk_grid': risk_grid.stats() if risk_grid is not None else None,
+    }
+
+
+def _error_result(message):
+    return {
+        'error': message,
+        'predicted_risk_level': None,
+        'probabilities': None,
+        'confidence': None
+    }
 
 def _interpret_risk_level(risk_level, confidence):
     """Provide interpretation of the risk level prediction"""
@@ -143,3 +629,8 @@ def predict_outbreak(input_data):
     }
     
     return risk_mapping.get(result['predicted_risk_level'], -1)
+
+
+if __name__ == "__main__":
+    # Build the mmap-friendly artifact next to the pickle
+    print(f"Wrote {save_artifact()}")
@@ -0,0 +1,251 @@
+# models/registry.py
+"""
+Versioned model artifacts and shadow scoring.
+
+    python -m models.registry register models/health_risk_prediction_model.pkl --activate
+    python -m models.registry list
+    python -m models.registry activate 20250101-120000
+
+Each registered version is a directory under MODEL_REGISTRY_DIR holding a
+joblib artifact (see predict_simple.build_artifact) stamped with its version
+and a small metadata.json. The `ACTIVE` file names the version served by
+predict_simple; it is replaced atomically, and serving processes pick the
+change up on their next model-file check (MODEL_CHECK_INTERVAL), on the
+reload signal, or immediately via predict_simple.activate_model.
+
+A `ShadowScorer` scores a sampled fraction of live traffic with a candidate
+version on a background thread and keeps latency and agreement counters;
+its answers are never returned to callers.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODEL_REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR") or os.path.join(os.path.dirname(__file__), "registry")
+ARTIFACT_NAME = "model.joblib"
+
+_VERSION_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+
+class ModelRegistry:
+    """Directory of versioned model artifacts plus a pointer to the active one"""
+
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        self.root = root
+
+    def _dir(self, version):
+        if not _VERSION_RE.match(version or ""):
+            raise ValueError(f"Invalid model version: {version!r}")
+        return os.path.join(self.root, version)
+
+    def path(self, version):
+        """Artifact path of a registered version (KeyError if unknown)"""
+        path = os.path.join(self._dir(version), ARTIFACT_NAME)
+        if not os.path.exists(path):
+            raise KeyError(f"Unknown model version: {version}")
+        return path
+
+    def versions(self):
+        """Metadata of every registered version, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in sorted(os.listdir(self.root)):
+            meta_path = os.path.join(self.root, name, "metadata.json")
+            if os.path.exists(meta_path):
+                with open(meta_path, encoding="utf-8") as f:
+                    found.append(json.load(f))
+        return sorted(found, key=lambda meta: meta["created_at"])
+
+    def active(self):
+        """Version named by the ACTIVE pointer, or None"""
+        try:
+            with open(os.path.join(self.root, "ACTIVE"), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def active_path(self):
+        version = self.active()
+        if version is None:
+            return None
+        try:
+            return self.path(version)
+        except (KeyError, ValueError):
+            return None
+
+    def register(self, src, version=None, activate=False):
+        """Copy a pickled model package into the registry as a new version"""
+        import joblib
+        from models.predict_simple import build_artifact
+
+        version = version or datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        final = self._dir(version)
+        if os.path.exists(final):
+            raise ValueError(f"Model version already registered: {version}")
+        os.makedirs(self.root, exist_ok=True)
+        staging = os.path.join(self.root, f".{version}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        try:
+            package = build_artifact(src, version=version)
+            joblib.dump(package, os.path.join(staging, ARTIFACT_NAME))
+            meta = {
+                "version": version,
+                "source": os.path.abspath(src),
+                "created_at": datetime.utcnow().isoformat(),
+                "model": type(package["model"]).__name__,
+                "accuracy": package.get("accuracy"),
+                "compiled": package.get("compiled") is not None,
+            }
+            with open(os.path.join(staging, "metadata.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+            # Readers never see a half-written version directory
+            os.replace(staging, final)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Point ACTIVE at a registered version (atomic rename)"""
+        self.path(version)
+        tmp = os.path.join(self.root, f".ACTIVE.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(version + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.root, "ACTIVE"))
+
+
+class ShadowScorer:
+    """Scores sampled batches with a candidate engine off the request path"""
+
+    def __init__(self, version, engine, classes, sample_rate=0.1, max_pending=8, rng=random.random):
+        self.version = version
+        self.engine = engine
+        self.classes = np.asarray(classes)
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self._rng = rng
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="shadow-scorer")
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pending = 0
+        self.batches = 0
+        self.rows = 0
+        self.agreements = 0
+        self.dropped = 0
+        self.errors = 0
+        self.primary_ms_total = 0.0
+        self.shadow_ms_total = 0.0
+        self.shadow_ms_max = 0.0
+        self.disagreements = {}
+
+    def offer(self, features, labels, primary_ms):
+        """Maybe queue a scored batch for comparison; never blocks or raises for the caller"""
+        if self.sample_rate <= 0 or self._rng() >= self.sample_rate:
+            return False
+        with self._lock:
+            # Request threads may still offer while the scorer is being replaced
+            if self._closed:
+                return False
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending += 1
+            self._executor.submit(self._compare, np.array(features), list(labels), primary_ms)
+        return True
+
+    def _compare(self, features, labels, primary_ms):
+        try:
+            started = time.perf_counter()
+            probabilities = self.engine.predict_proba(features)
+            shadow_ms = (time.perf_counter() - started) * 1000
+            candidate = self.classes[probabilities.argmax(axis=1)].tolist()
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                self.errors += 1
+            return
+        with self._lock:
+            self._pending -= 1
+            self.batches += 1
+            self.rows += len(labels)
+            self.primary_ms_total += primary_ms
+            self.shadow_ms_total += shadow_ms
+            self.shadow_ms_max = max(self.shadow_ms_max, shadow_ms)
+            for served, shadow in zip(labels, candidate):
+                if served == shadow:
+                    self.agreements += 1
+                else:
+                    pair = f"{served} -> {shadow}"
+                    self.disagreements[pair] = self.disagreements.get(pair, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'sample_rate': self.sample_rate,
+                'batches': self.batches,
+                'rows': self.rows,
+                'agreement_rate': self.agreements / self.rows if self.rows else None,
+                'disagreements': dict(self.disagreements),
+                'primary_ms_avg': self.primary_ms_total / self.batches if self.batches else 0.0,
+                'shadow_ms_avg': self.shadow_ms_total / self.batches if self.batches else 0.0,
+                'shadow_ms_max': self.shadow_ms_max,
+                'pending': self._pending,
+                'dropped': self.dropped,
+                'errors': self.errors,
+            }
+
+    def close(self, wait=True):
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=wait)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage versioned model artifacts")
+    parser.add_argument("--root", default=MODEL_REGISTRY_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    register = commands.add_parser("register", help="add a pickled model package as a new version")
+    register.add_argument("path")
+    register.add_argument("--version", default=None)
+    register.add_argument("--activate", action="store_true")
+    activate = commands.add_parser("activate", help="make a registered version the active one")
+    activate.add_argument("version")
+    commands.add_parser("list", help="show registered versions")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.root)
+    if args.command == "register":
+        version = registry.register(args.path, args.version, args.activate)
+        print(f"✅ Registered model version {version}" + (" (active)" if args.activate else ""))
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"✅ Active model version is now {args.version}")
+    else:
+        active = registry.active()
+        for meta in registry.versions():
+            marker = "*" if meta["version"] == active else " "
+            print(f"{marker} {meta['version']}  {meta['created_at']}  {meta['model']}  accuracy={meta['accuracy']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# models/rescore.py
+"""
+Re-score stored reports with the currently loaded model.
+
+    python -m models.rescore
+    python -m models.rescore --workers 4 --chunk-size 1000 --duty-cycle 0.25
+
+Reports are streamed in id order, RESCORE_CHUNK_SIZE at a time, skipping rows
+already scored by the current model version (`ai_model_version`). Each chunk
+is scored with one vectorized predict_proba call - split across an
+InferencePool when --workers > 1 - and written back with one executemany
+UPDATE. The last id of the chunk is stored in `rescore_checkpoints` in the
+same transaction, so an interrupted run resumes where it stopped.
+
+To share the database with live traffic the job only works `duty_cycle` of
+the time: after each chunk it sleeps long enough that writes from
+/api/report never wait behind it for long.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import sqlite_db
+from models import predict_simple
+
+logger = logging.getLogger(__name__)
+
+RESCORE_CHUNK_SIZE = int(os.environ.get("RESCORE_CHUNK_SIZE", "500"))
+RESCORE_DUTY_CYCLE = float(os.environ.get("RESCORE_DUTY_CYCLE", "0.5"))
+
+# Report columns in predict_simple.FEATURE_KEYS order
+_SELECT_SQL = f"""
+    SELECT id, {', '.join(predict_simple.FEATURE_KEYS)} FROM reports
+    WHERE id > ? AND ph IS NOT NULL AND cases IS NOT NULL AND ai_model_version IS NOT ?
+    ORDER BY id LIMIT ?
+"""
+_UPDATE_SQL = """
+    UPDATE reports SET ai_prediction = ?, ai_confidence = ?, ai_model_version = ?, ai_status = 'scored',
+        data = json_set(COALESCE(data, '{}'), '$.ai_prediction', ?, '$.ai_confidence', ?,
+                        '$.ai_model_version', ?, '$.ai_status', 'scored')
+    WHERE id = ?
+"""
+
+
+def _ensure_checkpoint_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rescore_checkpoints (
+            model_version TEXT PRIMARY KEY,
+            last_id INTEGER,
+            rows INTEGER,
+            updated_at TEXT
+        )
+    """)
+    conn.commit()
+
+
+def _load_checkpoint(conn, version: str):
+    row = conn.execute(
+        "SELECT last_id, rows FROM rescore_checkpoints WHERE model_version = ?", (version,)
+    ).fetchone()
+    return (row[0], row[1]) if row else (0, 0)
+
+
+def _features(rows) -> np.ndarray:
+    """(rows, 7) feature matrix with the same defaults/rounding as live scoring."""
+    matrix = np.array([row[1:] for row in rows], dtype=float)  # NULL -> nan
+    return predict_simple.quantize_features(np.where(np.isnan(matrix), predict_simple.FEATURE_DEFAULTS, matrix))
+
+
+def rescore_reports(chunk_size: int = RESCORE_CHUNK_SIZE, workers: int = 1,
+                    duty_cycle: float = RESCORE_DUTY_CYCLE, restart: bool = False,
+                    limit: Optional[int] = None) -> Dict[str, Any]:
+    """Re-score reports not yet scored by the loaded model.
+
+    `duty_cycle` must be in (0, 1]; 1 disables throttling.
+    Returns {"rows", "chunks", "seconds", "rows_per_sec", "model_version"}.
+    Requires init_db() to have been called.
+    """
+    if not 0 < duty_cycle <= 1:
+        raise ValueError(f"duty_cycle must be in (0, 1], got {duty_cycle}")
+    predict_simple._ensure_model()
+    state = predict_simple.current_state()
+    if state is None or state.version is None:
+        raise RuntimeError("No model loaded; train or copy the model file first")
+    version, engine, classes = state.version, state.engine, np.asarray(state.classes)
+
+    pool = threads = None
+    if workers > 1:
+        from models.inference_pool import InferencePool
+        pool = InferencePool(processes=workers, model_path=predict_simple.MODEL_PATH,
+                             registry_root=predict_simple.registry.root)
+        threads = ThreadPoolExecutor(workers)
+
+    def predict_proba(features):
+        if pool is None:
+            return engine.predict_proba(features)
+        parts = np.array_split(features, min(workers, len(features)))
+        # Workers that picked up another model reload to `version` (or fail) rather than mislabel rows
+        return np.vstack(list(threads.map(lambda part: pool.predict_proba(part, version=version), parts)))
+
+    try:
+        with sqlite_db.write_connection() as conn:
+            _ensure_checkpoint_table(conn)
+            if restart:
+                with conn:
+                    conn.execute("DELETE FROM rescore_checkpoints WHERE model_version = ?", (version,))
+            last_id, done = _load_checkpoint(conn, version)
+    finally:
+        sqlite_db.release_connection()
+    if done:
+        logger.info(f"↩️ Resuming re-score for model {version} after id {last_id} ({done} rows)")
+
+    rescored = chunks = 0
+    started = time.perf_counter()
+    try:
+        while limit is None or rescored < limit:
+            busy_started = time.perf_counter()
+            size = chunk_size if limit is None else min(chunk_size, limit - rescored)
+            try:
+                rows = sqlite_db.get_read_connection().execute(_SELECT_SQL, (last_id, version, size)).fetchall()
+            finally:
+                sqlite_db.release_connection()
+            if not rows:
+                break
+
+            probabilities = predict_proba(_features(rows))
+            best = probabilities.argmax(axis=1)
+            labels = classes[best].tolist()
+            confidences = probabilities[np.arange(len(rows)), best].tolist()
+            updates = [
+                (label, confidence, version, label, confidence, version, row[0])
+                for row, label, confidence in zip(rows, labels, confidences)
+            ]
+            last_id = rows[-1][0]
+
+            # Hold the writer only for the UPDATEs themselves
+            try:
+                with sqlite_db.write_connection() as conn:
+                    with conn:
+                        conn.executemany(_UPDATE_SQL, updates)
+                        conn.execute(
+                            "INSERT OR REPLACE INTO rescore_checkpoints (model_version, last_id, rows, updated_at) "
+                            "VALUES (?, ?, ?, ?)",
+                            (version, last_id, done + rescored + len(rows), datetime.utcnow().isoformat()),
+                        )
+            finally:
+                sqlite_db.release_connection()
+            rescored += len(rows)
+            chunks += 1
+
+            busy = time.perf_counter() - busy_started
+            if chunks % 20 == 0:
+                logger.info(f"   re-scored {done + rescored} reports (last id {last_id})")
+            if duty_cycle < 1:
+                time.sleep(busy * (1 - duty_cycle) / duty_cycle)
+    finally:
+        if pool is not None:
+            threads.shutdown()
+            pool.close()
+
+    seconds = time.perf_counter() - started
+    rate = rescored / seconds if seconds > 0 else 0.0
+    logger.info(f"✅ Re-scored {rescored} reports with model {version} in {seconds:.2f}s ({rate:,.0f} rows/sec)")
+    return {"rows": rescored, "chunks": chunks, "seconds": seconds, "rows_per_sec": rate, "model_version": version}
+
+
+def _duty_cycle(value: str) -> float:
+    duty_cycle = float(value)
+    if not 0 < duty_cycle <= 1:
+        raise argparse.ArgumentTypeError(f"must be in (0, 1], got {value}")
+    return duty_cycle
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Re-score stored reports with the current model")
+    parser.add_argument("--chunk-size", type=int, default=RESCORE_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="inference processes (1 = score inline)")
+    parser.add_argument("--duty-cycle", type=_duty_cycle, default=RESCORE_DUTY_CYCLE,
+                        help="fraction of wall time spent working; the rest is sleep (1 = no throttling)")
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many reports")
+    args = parser.parse_args(argv)
+
+    sqlite_db.init_db()
+    try:
+        rescore_reports(args.chunk_size, args.workers, args.duty_cycle, args.restart, args.limit)
+    finally:
+        sqlite_db.close_db()
+
+
+if __name__ == "__main__":
+    main()
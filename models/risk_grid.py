@@ -0,0 +1,99 @@
+# models/risk_grid.py
+"""
+Precomputed risk probabilities over a (pH, cases) grid.
+
+Most predictions only send pH and cases; the other five features are then
+the fixed medians in FEATURE_DEFAULTS, so the model's answer depends on two
+numbers only. `RiskGrid.build` scores every grid point once with the loaded
+model, after which such readings are answered by array indexing. Readings
+off the grid (pH or cases out of range) still go to the model.
+
+With ph_step equal to the pH sensor precision (0.01, see FEATURE_PRECISION)
+every rounded reading falls exactly on a grid point and the grid reproduces
+the model; coarser steps trade accuracy for memory, which `verify` measures.
+"""
+import threading
+import time
+
+import numpy as np
+
+
+class RiskGrid:
+    """(pH, cases) -> class probabilities for readings with default optional features"""
+
+    def __init__(self, probabilities, ph_min, ph_step, cases_step, model_version=None, build_ms=0.0):
+        self.probabilities = probabilities
+        self.ph_min = ph_min
+        self.ph_step = ph_step
+        self.cases_step = cases_step
+        self.model_version = model_version
+        self.build_ms = build_ms
+        self.verification = None
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, engine, defaults, ph_min=4.0, ph_max=10.0, ph_step=0.01, max_cases=100, cases_step=1,
+              model_version=None):
+        """Score every grid point with engine.predict_proba in one call"""
+        started = time.perf_counter()
+        n_ph = int(round((ph_max - ph_min) / ph_step)) + 1
+        n_cases = int(max_cases // cases_step) + 1
+        ph = np.round(ph_min + ph_step * np.arange(n_ph), 6)
+        cases = cases_step * np.arange(n_cases, dtype=float)
+        features = np.tile(np.asarray(defaults, dtype=float), (n_ph * n_cases, 1))
+        features[:, 0] = np.repeat(ph, n_cases)
+        features[:, 1] = np.tile(cases, n_ph)
+        probabilities = engine.predict_proba(features).reshape(n_ph, n_cases, -1)
+        build_ms = (time.perf_counter() - started) * 1000
+        return cls(probabilities, ph_min, ph_step, cases_step, model_version, build_ms)
+
+    @property
+    def shape(self):
+        return self.probabilities.shape[:2]
+
+    def lookup(self, ph, cases, count=True):
+        """Probabilities for the readings on the grid, and the mask of which those are"""
+        i = np.rint((np.asarray(ph, dtype=float) - self.ph_min) / self.ph_step)
+        j = np.rint(np.asarray(cases, dtype=float) / self.cases_step)
+        n_ph, n_cases = self.shape
+        on_grid = (i >= 0) & (i < n_ph) & (j >= 0) & (j < n_cases)
+        if count:
+            with self._lock:
+                self.hits += int(on_grid.sum())
+        return self.probabilities[i[on_grid].astype(np.intp), j[on_grid].astype(np.intp)], on_grid
+
+    def verify(self, engine, defaults, samples=2000, ph_decimals=2, seed=0):
+        """Compare grid answers with the model on random in-range readings"""
+        rng = np.random.default_rng(seed)
+        n_ph, n_cases = self.shape
+        features = np.tile(np.asarray(defaults, dtype=float), (samples, 1))
+        features[:, 0] = np.round(rng.uniform(self.ph_min, self.ph_min + self.ph_step * (n_ph - 1), samples),
+                                  ph_decimals)
+        features[:, 1] = rng.integers(0, int(self.cases_step * (n_cases - 1)) + 1, samples)
+        expected = engine.predict_proba(features)
+        looked_up, on_grid = self.lookup(features[:, 0], features[:, 1], count=False)
+        expected = expected[on_grid]
+        error = np.abs(looked_up - expected).max(axis=1)
+        self.verification = {
+            'samples': int(on_grid.sum()),
+            'label_agreement': float((looked_up.argmax(axis=1) == expected.argmax(axis=1)).mean()),
+            'max_probability_error': float(error.max()) if error.size else 0.0,
+            'mean_probability_error': float(error.mean()) if error.size else 0.0,
+        }
+        return self.verification
+
+    def stats(self):
+        n_ph, n_cases = self.shape
+        return {
+            'model_version': self.model_version,
+            'ph_range': [self.ph_min, round(self.ph_min + self.ph_step * (n_ph - 1), 6)],
+            'ph_step': self.ph_step,
+            'max_cases': self.cases_step * (n_cases - 1),
+            'cases_step': self.cases_step,
+            'points': n_ph * n_cases,
+            'bytes': int(self.probabilities.nbytes),
+            'build_ms': self.build_ms,
+            'hits': self.hits,
+            'verification': self.verification,
+        }
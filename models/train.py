@@ -0,0 +1,330 @@
+# models/train.py
+"""
+Train the health risk model from the raw CSVs (scripted train_model.ipynb).
+
+    python -m models.train --water water_quality_master.csv --outbreaks models/outbreak_master.csv
+    python -m models.train --integrated integrated_health_water_dataset.csv --jobs 3 --register v3
+
+The water quality and outbreak data are merged and labelled as in the
+notebook (outbreaks summed per State/District/Year/Month, risk level from the
+WHO-threshold score), but with vectorized pandas instead of row-wise apply.
+Unlike the notebook, which kept only the lab features with more than 1000
+non-null values and then dropped incomplete rows, the model always uses all
+seven FEATURE_NAMES (the inputs predict_simple serves) and trains on the rows
+that have every one of them, so sparse features shrink the training set
+instead of leaving the model. The resulting feature matrix is cached in TRAIN_CACHE_DIR under the SHA-256
+of the input files, so re-running with unchanged data skips straight to
+fitting.
+
+Candidate models are fitted concurrently in a process pool, splitting the
+cores between them (`n_jobs` for the forests). Each is then timed on the
+held-out set - fit seconds, batch and single-row predict_proba latency, and
+single-row latency through the compiled tree engine where it applies - and
+the most accurate one is written in the package format predict_simple
+loads. The write is an atomic rename, so serving processes that watch the
+model file never read a half-written pickle. A `.joblib` artifact next to
+the output is rewritten too, since predict_simple prefers it to the pickle.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger(__name__)
+
+TRAIN_CACHE_DIR = os.environ.get("TRAIN_CACHE_DIR") or os.path.join(os.path.dirname(__file__), ".train_cache")
+# Bump when the merge/labelling below changes, so stale cached matrices are not reused
+PIPELINE_VERSION = 1
+
+# Model features, in predict_simple.FEATURE_KEYS order
+FEATURE_NAMES = ['pH', 'Total_Cases', 'TDS', 'F', 'NO3', 'Cl', 'EC in μS/cm']
+RISK_LEVELS = np.array(['No Risk', 'Low Risk', 'Medium Risk', 'High Risk'])
+CANDIDATES = ('random_forest', 'gradient_boosting', 'logistic_regression')
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_key(paths):
+    digest = hashlib.sha256(f"v{PIPELINE_VERSION}:{','.join(FEATURE_NAMES)}".encode("utf-8"))
+    for path in paths:
+        digest.update(_file_hash(path).encode("ascii"))
+    return digest.hexdigest()[:32]
+
+
+def integrate(water, outbreaks):
+    """Water quality rows expanded over every outbreak year/month, with that month's outbreak totals"""
+    import pandas as pd
+
+    outbreaks = outbreaks.copy()
+    start = pd.to_datetime(outbreaks['Start_Date'], format='%d-%m-%y', errors='coerce')
+    outbreaks['Year'] = start.dt.year
+    outbreaks['Month'] = start.dt.month
+    outbreaks['Cases'] = pd.to_numeric(outbreaks['Cases'], errors='coerce')
+    outbreaks['Deaths'] = pd.to_numeric(outbreaks['Deaths'], errors='coerce')
+    totals = (outbreaks.groupby(['State', 'District', 'Year', 'Month'])
+              .agg(Total_Cases=('Cases', 'sum'), Total_Deaths=('Deaths', 'sum'),
+                   Outbreak_Count=('Unique_ID', 'count'))
+              .reset_index())
+
+    if 'Year' not in water.columns:
+        periods = pd.MultiIndex.from_product(
+            [sorted(outbreaks['Year'].dropna().unique()), range(1, 13)], names=['Year', 'Month']
+        ).to_frame(index=False)
+        water = water.merge(periods, how='cross')
+    merged = water.merge(totals, on=['State', 'District', 'Year', 'Month'], how='left')
+    for column in ('Total_Cases', 'Total_Deaths', 'Outbreak_Count'):
+        merged[column] = merged[column].fillna(0)
+    return merged
+
+
+def risk_levels(X):
+    """Notebook risk score (WHO thresholds) for a (rows, 7) matrix in FEATURE_NAMES order"""
+    ph, cases, tds, fluoride, nitrate = X[:, 0], X[:, 1], X[:, 2], X[:, 3], X[:, 4]
+    score = np.where((ph < 6.5) | (ph > 8.5), 2, np.where((ph < 7.0) | (ph > 8.0), 1, 0))
+    score += np.digitize(cases, [0, 5, 10], right=True)  # >0: 1, >5: 2, >10: 3
+    score += np.digitize(tds, [500, 1000], right=True)
+    score += np.where(fluoride > 1.5, 2, np.where(fluoride < 0.5, 1, 0))
+    score += np.digitize(nitrate, [25, 50], right=True)
+    return RISK_LEVELS[np.digitize(score, [1, 3, 6])]
+
+
+def build_dataset(water_path=None, outbreaks_path=None, integrated_path=None, cache_dir=TRAIN_CACHE_DIR):
+    """
+    Feature matrix and labels for training, from the on-disk cache when the inputs are unchanged
+
+    Parameters:
+    - water_path, outbreaks_path: raw CSVs to merge, or
+    - integrated_path: an already merged dataset (the notebook's integrated CSV)
+
+    Returns: (X, y, info) where info has the cache key, whether it was a hit, and the row count
+    """
+    paths = [integrated_path] if integrated_path else [water_path, outbreaks_path]
+    if not all(paths):
+        raise ValueError("Pass either an integrated dataset or both the water quality and outbreak CSVs")
+    key = _cache_key(paths)
+    cache_path = os.path.join(cache_dir, f"{key}.npz") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as cached:
+            X, y = cached['X'], cached['y']
+        return X, y, {'cache_key': key, 'cache_hit': True, 'rows': len(y)}
+
+    import pandas as pd
+
+    started = time.perf_counter()
+    if integrated_path:
+        data = pd.read_csv(integrated_path, low_memory=False)
+    else:
+        data = integrate(pd.read_csv(water_path, low_memory=False), pd.read_csv(outbreaks_path))
+    missing = [name for name in FEATURE_NAMES if name not in data.columns]
+    if missing:
+        raise ValueError(f"Training data is missing columns: {missing}")
+    features = data[FEATURE_NAMES].apply(pd.to_numeric, errors='coerce')
+    X = features.dropna().to_numpy(dtype=float)  # rows with all seven features (see module docstring)
+    y = risk_levels(X)
+    logger.info(f"Prepared {len(y)} training rows in {time.perf_counter() - started:.2f}s")
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{cache_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, X=X, y=y)
+        os.replace(tmp, cache_path)
+    return X, y, {'cache_key': key, 'cache_hit': False, 'rows': len(y)}
+
+
+def make_model(name, n_jobs=1):
+    """Unfitted candidate; logistic regression carries its own scaler since predict_simple feeds raw features"""
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if name == 'random_forest':
+        return RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced', n_jobs=n_jobs)
+    if name == 'gradient_boosting':
+        return GradientBoostingClassifier(n_estimators=100, random_state=42)
+    if name == 'logistic_regression':
+        return make_pipeline(StandardScaler(),
+                             LogisticRegression(random_state=42, class_weight='balanced', max_iter=1000))
+    raise ValueError(f"Unknown candidate model: {name}")
+
+
+def _fit(name, n_jobs, X, y):
+    started = time.perf_counter()
+    model = make_model(name, n_jobs).fit(X, y)
+    fit_seconds = time.perf_counter() - started
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = None  # served one request at a time; no thread pool per predict call
+    return name, model, fit_seconds
+
+
+def _latency_ms(predict_proba, X, repeats):
+    timings = []
+    for i in range(repeats):
+        row = X[i % len(X)][None, :]
+        started = time.perf_counter()
+        predict_proba(row)
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings))
+
+
+def evaluate(name, model, fit_seconds, X_test, y_test, repeats=200):
+    """Accuracy and fit/inference timings of a fitted candidate"""
+    from sklearn.metrics import accuracy_score
+    from models.tree_engine import compile_model
+
+    started = time.perf_counter()
+    probabilities = model.predict_proba(X_test)
+    batch_ms = (time.perf_counter() - started) * 1000
+    accuracy = accuracy_score(y_test, model.classes_[probabilities.argmax(axis=1)])
+    result = {
+        'model': name,
+        'accuracy': float(accuracy),
+        'fit_seconds': fit_seconds,
+        'batch_ms': batch_ms,
+        'batch_rows': len(X_test),
+        'single_row_ms': _latency_ms(model.predict_proba, X_test, repeats),
+        'compiled_single_row_ms': None,
+    }
+    try:
+        result['compiled_single_row_ms'] = _latency_ms(compile_model(model).predict_proba, X_test, repeats)
+    except TypeError:
+        pass
+    return result
+
+
+def train(X, y, candidates=CANDIDATES, jobs=None, test_size=0.2, seed=42):
+    """
+    Fit the candidates concurrently and time each on the held-out split
+
+    Parameters:
+    - jobs: processes to fit in (default: one per candidate, up to the CPU count);
+      cores left over are given to each model's own n_jobs
+
+    Returns: (best fitted model, list of per-candidate reports, most accurate first)
+    """
+    from sklearn.model_selection import train_test_split
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=seed, stratify=y)
+    cpus = os.cpu_count() or 1
+    jobs = max(1, min(jobs or cpus, len(candidates)))
+    n_jobs = max(1, cpus // jobs)
+
+    if jobs == 1:
+        fitted = [_fit(name, n_jobs, X_train, y_train) for name in candidates]
+    else:
+        # spawn: a forked child would inherit the parent's BLAS/OpenMP thread state
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(jobs, mp_context=context) as executor:
+            futures = [executor.submit(_fit, name, n_jobs, X_train, y_train) for name in candidates]
+            fitted = [future.result() for future in futures]
+
+    # Timed one at a time, after fitting, so candidates do not compete for cores
+    reports = [evaluate(name, model, fit_seconds, X_test, y_test) for name, model, fit_seconds in fitted]
+    models = {name: model for name, model, _ in fitted}
+    reports.sort(key=lambda report: (-report['accuracy'], report['single_row_ms']))
+    for report in reports:
+        report['jobs'] = jobs
+        report['n_jobs'] = n_jobs
+    return models[reports[0]['model']], reports
+
+
+def save_model(model, reports, dataset, output):
+    """Write the model package predict_simple loads (atomically)"""
+    package = {
+        'model': model,
+        'scaler': None,  # any scaling is inside the model pipeline
+        'feature_names': FEATURE_NAMES,
+        'classes': model.classes_,
+        'accuracy': reports[0]['accuracy'],
+        'trained_at': datetime.utcnow().isoformat(),
+        'training': {'dataset': dataset, 'candidates': reports},
+    }
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, f".{os.path.basename(output)}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        pickle.dump(package, f)
+    os.replace(tmp, output)
+    return output
+
+
+def run(water_path=None, outbreaks_path=None, integrated_path=None, output=None, candidates=CANDIDATES,
+        jobs=None, cache_dir=TRAIN_CACHE_DIR, artifact=False, register=None, activate=False, report_path=None):
+    """Build (or reuse) the dataset, train, save; returns the training report"""
+    from models import predict_simple
+
+    started = time.perf_counter()
+    X, y, dataset = build_dataset(water_path, outbreaks_path, integrated_path, cache_dir)
+    if dataset['cache_hit']:
+        logger.info(f"♻️ Reusing cached training data {dataset['cache_key']} ({dataset['rows']} rows)")
+    model, reports = train(X, y, candidates, jobs)
+    output = save_model(model, reports, dataset, output or predict_simple.MODEL_PATH)
+
+    for report in reports:
+        compiled = report['compiled_single_row_ms']
+        logger.info(f"   {report['model']:<20} accuracy={report['accuracy']:.4f} fit={report['fit_seconds']:.2f}s "
+                    f"batch={report['batch_ms']:.1f}ms/{report['batch_rows']} rows "
+                    f"single={report['single_row_ms']:.3f}ms"
+                    + (f" compiled={compiled:.3f}ms" if compiled is not None else ""))
+    result = {'output': output, 'best': reports[0]['model'], 'dataset': dataset, 'candidates': reports,
+              'seconds': time.perf_counter() - started}
+    artifact_path = os.path.splitext(output)[0] + '.joblib'
+    if artifact or os.path.exists(artifact_path):
+        # An existing artifact would keep serving the previous model, so it is always refreshed
+        tmp = os.path.join(os.path.dirname(artifact_path), f".{os.path.basename(artifact_path)}.{os.getpid()}.tmp")
+        predict_simple.save_artifact(output, tmp)
+        os.replace(tmp, artifact_path)
+        result['artifact'] = artifact_path
+    if register:
+        result['version'] = predict_simple.registry.register(output, register, activate)
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    logger.info(f"✅ Saved {reports[0]['model']} (accuracy {reports[0]['accuracy']:.4f}) to {output} "
+                f"in {result['seconds']:.2f}s")
+    return result
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Train the health risk prediction model")
+    parser.add_argument("--water", help="water quality CSV (water_quality_master.csv)")
+    parser.add_argument("--outbreaks", help="outbreak CSV (models/outbreak_master.csv)")
+    parser.add_argument("--integrated", help="already merged dataset, instead of --water/--outbreaks")
+    parser.add_argument("--output", default=None, help="model package path (default: the one predict_simple serves)")
+    parser.add_argument("--models", default=",".join(CANDIDATES), help="comma-separated candidates")
+    parser.add_argument("--jobs", type=int, default=None, help="models fitted concurrently (default: CPU count)")
+    parser.add_argument("--cache-dir", default=TRAIN_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true", help="always rebuild the feature matrix")
+    parser.add_argument("--artifact", action="store_true", help="also write the .joblib artifact")
+    parser.add_argument("--register", metavar="VERSION", help="add the model to the registry as VERSION")
+    parser.add_argument("--activate", action="store_true", help="make the registered version active")
+    parser.add_argument("--report", help="write the training report as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.integrated and not (args.water and args.outbreaks):
+        parser.error("pass --integrated, or both --water and --outbreaks")
+    run(args.water, args.outbreaks, args.integrated, args.output, tuple(args.models.split(",")), args.jobs,
+        None if args.no_cache else args.cache_dir, args.artifact, args.register, args.activate, args.report)
+
+
+if __name__ == "__main__":
+    main()
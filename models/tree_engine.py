@@ -0,0 +1,146 @@
+"""
+Compiled NumPy inference for fitted tree ensembles.
+
+sklearn's predict/predict_proba re-validate the input and dispatch every tree
+through joblib on each call, which dominates the cost of scoring one or a few
+rows. `compile_model` copies the fitted trees of a RandomForest / ExtraTrees /
+DecisionTree / GradientBoosting classifier into flat arrays (feature,
+threshold, left, right, leaf value) and `CompiledEnsemble.predict_proba`
+walks all trees at once with vectorized index arithmetic.
+
+Results match sklearn: inputs are cast to float32 before comparing with the
+thresholds, exactly like sklearn's tree code does.
+"""
+import numpy as np
+
+# Rows scored per traversal pass; bounds the (rows x trees x classes) buffer
+CHUNK_ROWS = 4096
+
+
+class CompiledEnsemble:
+    """Flat-array representation of a fitted tree ensemble."""
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth,
+                 classes, kind, n_features, learning_rate=1.0, init_raw=None, outputs_per_tree=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.kind = kind  # "average" (forests) or "boosting"
+        self.n_features_in_ = n_features
+        self.learning_rate = learning_rate
+        self.init_raw = init_raw
+        self.outputs_per_tree = outputs_per_tree
+
+    def _leaves(self, X):
+        """Leaf node index reached in every tree, shape (rows, trees)."""
+        idx = np.broadcast_to(self.roots, (X.shape[0], self.roots.size)).copy()
+        rows = np.arange(X.shape[0])[:, None]
+        # Leaves point to themselves, so max_depth steps land every row on a leaf
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[idx]] <= self.threshold[idx]
+            idx = np.where(go_left, self.left[idx], self.right[idx])
+        return idx
+
+    def _predict_chunk(self, X):
+        leaves = self._leaves(X)
+        if self.kind == "average":
+            return self.value[leaves].mean(axis=1)
+
+        # Boosting: one regression tree per (stage, class); value is the raw score
+        raw = self.value[leaves, 0].reshape(X.shape[0], -1, self.outputs_per_tree).sum(axis=1)
+        raw = self.init_raw + self.learning_rate * raw
+        if self.outputs_per_tree == 1:
+            p = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        raw = raw - raw.max(axis=1, keepdims=True)
+        exp = np.exp(raw)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features_in_}")
+        if X.shape[0] <= CHUNK_ROWS:
+            return self._predict_chunk(X)
+        return np.vstack([self._predict_chunk(X[i:i + CHUNK_ROWS]) for i in range(0, X.shape[0], CHUNK_ROWS)])
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def _flatten(trees, normalize):
+    """Concatenate sklearn Tree objects into global node arrays."""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree in trees:
+        n = tree.node_count
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        leaf = left == -1
+        node_ids = np.arange(n)
+        left = np.where(leaf, node_ids, left) + offset
+        right = np.where(leaf, node_ids, right) + offset
+        feature = np.where(leaf, 0, tree.feature).astype(np.int64)
+        threshold = np.where(leaf, np.inf, tree.threshold)
+
+        value = tree.value[:, 0, :].astype(np.float64)
+        if normalize:
+            totals = value.sum(axis=1, keepdims=True)
+            value = np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(left)
+        rights.append(right)
+        values.append(value)
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n
+    return (np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+            np.concatenate(rights), np.concatenate(values), np.array(roots, dtype=np.int64), max_depth)
+
+
+def compile_model(model):
+    """Compile a fitted sklearn tree classifier; raises TypeError for anything else."""
+    from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    n_features = model.n_features_in_
+    if isinstance(model, DecisionTreeClassifier):
+        model_trees, kind = [model], "average"
+    elif isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        model_trees, kind = list(model.estimators_), "average"
+    elif isinstance(model, GradientBoostingClassifier):
+        model_trees, kind = None, "boosting"
+    else:
+        raise TypeError(f"Cannot compile {type(model).__name__}; only tree ensembles are supported")
+
+    if kind == "average":
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise TypeError("Multi-output tree models are not supported")
+        arrays = _flatten([t.tree_ for t in model_trees], normalize=True)
+        return CompiledEnsemble(*arrays, classes=model.classes_, kind=kind, n_features=n_features)
+
+    init = model.init_
+    if init == "zero":
+        init_raw = np.zeros(model.estimators_.shape[1])
+    elif type(init).__name__ == "DummyClassifier" and getattr(init, "strategy", None) == "prior":
+        # A prior-based init is independent of X
+        init_raw = model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0]
+    else:
+        raise TypeError(f"Cannot compile gradient boosting with init={init!r}")
+    stages = model.estimators_  # shape (n_estimators, K)
+    arrays = _flatten([est.tree_ for est in stages.ravel()], normalize=False)
+    return CompiledEnsemble(
+        *arrays, classes=model.classes_, kind=kind, n_features=n_features,
+        learning_rate=model.learning_rate, init_raw=np.asarray(init_raw, dtype=np.float64),
+        outputs_per_tree=stages.shape[1],
+    )
@@ -1,16 +1,31 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-import csv
+import base64
+import json
+import logging
 import os
 import threading
 from database.db import mongo
-from models.predict_simple import predict_risk_level
+from database import sqlite_db
+from database.csv_log import CSVAuditLog, tail_records
+from models.micro_batcher import MicroBatcher
+from models import predict_simple
+from models.predict_simple import get_prediction_stats, predict_risk_levels, score_risk_level
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
 
 health_bp = Blueprint("health", __name__)
 
 
 CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "database", "reports.csv")
+# Keep a sidecar byte-offset index next to the CSV so fallback reads stay O(limit)
+CSV_INDEX = os.environ.get("REPORTS_CSV_INDEX", "false").lower() in ("1", "true", "yes")
 
 # Canonical CSV field order must match existing file schema
 CSV_FIELDS = [
@@ -33,16 +48,145 @@ CSV_FIELDS = [
     "ai_confidence",
 ]
 
+# Report columns the alerts builder needs (fetched as tuples, see alerts())
+ALERT_FIELDS = [
+    "timestamp",
+    "location_name",
+    "lat",
+    "lng",
+    "cases",
+    "turbidity",
+    "ph",
+    "ai_prediction",
+    "ai_confidence",
+]
+
 # Simple process-level lock to avoid interleaved writes
 csv_lock = threading.Lock()
+_csv_log = None
+
+
+def csv_log() -> CSVAuditLog:
+    """Shared buffered writer for the reports CSV (writes the header itself)."""
+    global _csv_log
+    with csv_lock:
+        if _csv_log is None or _csv_log.path != CSV_PATH:
+            if _csv_log is not None:
+                _csv_log.close()
+            _csv_log = CSVAuditLog(
+                CSV_PATH,
+                CSV_FIELDS,
+                flush_rows=int(os.environ.get("REPORTS_CSV_FLUSH_ROWS", "64")),
+                flush_interval=float(os.environ.get("REPORTS_CSV_FLUSH_MS", "1000")) / 1000,
+                max_bytes=int(os.environ.get("REPORTS_CSV_MAX_BYTES", str(64 * 1024 * 1024))),
+                rotate_daily=os.environ.get("REPORTS_CSV_ROTATE_DAILY", "false").lower() in ("1", "true", "yes"),
+            )
+        return _csv_log
+
+
+# Score reports in the background: /api/report stores the report with
+# ai_status "pending" and returns the compute_risk() answer straight away
+REPORT_ASYNC_SCORING = os.environ.get("REPORT_ASYNC_SCORING", "false").lower() in ("1", "true", "yes")
+_report_scorer = None
+_report_scorer_lock = threading.Lock()
+
+
+# Columns and the JSON document are written together, as Collection.update_one does
+_SCORED_SQL = """
+    UPDATE reports SET ai_prediction = ?, ai_confidence = ?, ai_model_version = ?, ai_status = ?,
+        data = json_set(COALESCE(data, '{}'), '$.ai_prediction', ?, '$.ai_confidence', ?,
+                        '$.ai_model_version', ?, '$.ai_status', ?)
+    WHERE id = ?
+"""
+
+
+def _score_and_store(items: list) -> list:
+    """Batch handler for the report scorer: one model call, then one write transaction."""
+    try:
+        results = predict_risk_levels([input_data for _, input_data in items])
+        updates = []
+        for (report_id, _), result in zip(items, results):
+            if result.get("error"):
+                values = (None, None, None, "failed")
+            else:
+                values = (result["predicted_risk_level"], result["confidence"], result.get("model_version"), "scored")
+            updates.append(values + values + (report_id,))
+        with sqlite_db.write_connection() as conn:
+            with conn:
+                conn.executemany(_SCORED_SQL, updates)
+    finally:
+        # The scorer thread is not a request; hand its connection back to the pool
+        sqlite_db.release_connection()
+    return results
+
+
+def report_scorer() -> MicroBatcher:
+    """Background batcher that fills in ai_prediction/ai_confidence for stored reports."""
+    global _report_scorer
+    with _report_scorer_lock:
+        if _report_scorer is None:
+            _report_scorer = MicroBatcher(
+                _score_and_store,
+                max_batch_size=int(os.environ.get("REPORT_SCORING_BATCH_SIZE", "64")),
+                max_wait=float(os.environ.get("REPORT_SCORING_WAIT_MS", "50")) / 1000,
+                name="report-scorer",
+            )
+        return _report_scorer
+
+
+# Lock file held by the one process per database that requeues pending reports
+_requeue_lock = None
+
+
+def _requeue_leader() -> bool:
+    """Whether this process requeues pending reports.
+
+    Every gunicorn worker runs create_app(); the first to take an exclusive
+    lock next to the database keeps it for its lifetime and requeues, the
+    others skip. A replacement for a dead leader takes over.
+    """
+    global _requeue_lock
+    path = f"{sqlite_db.db_path}.requeue.lock"
+    if _requeue_lock is not None and _requeue_lock.name == path:
+        return True
+    if fcntl is None:
+        return True  # no workers to coordinate with on this platform
+    lock = open(path, "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return False
+    if _requeue_lock is not None:
+        _requeue_lock.close()
+    _requeue_lock = lock
+    return True
+
+
+def requeue_pending_reports() -> int:
+    """Queue reports left pending by a previous run (once per database, see _requeue_leader)."""
+    if not REPORT_ASYNC_SCORING or not _requeue_leader():
+        return 0
+    # Served by the ai_status index
+    pending = mongo.db.reports.find({"ai_status": "pending"}, projection=["ph", "cases", "tds", "fluoride",
+                                                                          "nitrate", "chloride", "ec"])
+    queued = 0
+    try:
+        for doc in pending:
+            report_scorer().submit((doc["_id"], _prediction_input(doc)))
+            queued += 1
+    finally:
+        sqlite_db.release_connection()
+    return queued
 
 
-def ensure_csv_header():
-    os.makedirs(os.path.dirname(CSV_PATH), exist_ok=True)
-    if not os.path.exists(CSV_PATH):
-        with open(CSV_PATH, mode="w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(CSV_FIELDS)
+def _prediction_input(fields: dict) -> dict:
+    """Model input for a report: pH and cases plus whichever lab readings were given."""
+    input_data = {"ph": fields["ph"], "cases": fields["cases"]}
+    for key in ("tds", "fluoride", "nitrate", "chloride", "ec"):
+        if fields.get(key) is not None:
+            input_data[key] = fields[key]
+    return input_data
 
 
 def compute_risk(cases: int | None, turbidity: float | None) -> str:
@@ -78,7 +222,7 @@ def predict():
                 input_data[field] = float(data[field])
         
         # Get prediction
-        result = predict_risk_level(input_data)
+        result = score_risk_level(input_data)
         
         return jsonify({
             "success": True,
@@ -86,7 +230,8 @@ def predict():
             "confidence": result['confidence'],
             "probabilities": result['probabilities'],
             "interpretation": result['interpretation'],
-            "input_features": result['input_features']
+            "input_features": result['input_features'],
+            "model_version": result.get('model_version'),
         })
         
     except Exception as e:
@@ -96,6 +241,123 @@ def predict():
         }), 500
 
 
+# Upper bound on rows per /prediction/batch request
+PREDICTION_BATCH_MAX = int(os.environ.get("PREDICTION_BATCH_MAX", "1000"))
+
+
+@health_bp.route("/prediction/batch", methods=["POST"])
+def predict_batch():
+    data = request.get_json(silent=True)
+    rows = data.get("inputs") if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows:
+        return jsonify({
+            "success": False,
+            "error": "Expected a non-empty JSON list of inputs (or {\"inputs\": [...]})"
+        }), 400
+    if len(rows) > PREDICTION_BATCH_MAX:
+        return jsonify({
+            "success": False,
+            "error": f"Too many inputs: {len(rows)} (max {PREDICTION_BATCH_MAX})"
+        }), 413
+
+    # Same contract as /prediction: ph and cases are required per row
+    inputs, errors = [], {}
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict) or row.get('ph') is None or row.get('cases') is None:
+            errors[i] = "Missing required fields: ph and cases are required"
+            inputs.append({})
+        else:
+            inputs.append(row)
+
+    predictions = iter(predict_risk_levels([row for i, row in enumerate(inputs) if i not in errors]))
+    results = []
+    for i in range(len(rows)):
+        result = {"error": errors[i]} if i in errors else next(predictions)
+        if result.get('error'):
+            results.append({"success": False, "error": result['error']})
+        else:
+            results.append({
+                "success": True,
+                "prediction": result['predicted_risk_level'],
+                "confidence": result['confidence'],
+                "probabilities": result['probabilities'],
+                "interpretation": result['interpretation'],
+                "input_features": result['input_features'],
+                "model_version": result.get('model_version'),
+            })
+
+    failed = sum(1 for r in results if not r["success"])
+    return jsonify({"success": failed == 0, "count": len(results), "errors": failed, "results": results})
+
+
+@health_bp.route("/prediction/stats", methods=["GET"])
+def prediction_stats():
+    return jsonify(get_prediction_stats())
+
+
+# /models admin calls must send it in the X-Admin-Token header; unset disables them
+MODEL_ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN")
+
+
+def _admin_denied():
+    if not MODEL_ADMIN_TOKEN:
+        return jsonify({"error": "Model admin is disabled (set MODEL_ADMIN_TOKEN)"}), 403
+    if request.headers.get("X-Admin-Token") != MODEL_ADMIN_TOKEN:
+        return jsonify({"error": "Admin token required"}), 403
+    return None
+
+
+@health_bp.route("/models", methods=["GET"])
+def list_models():
+    shadow = predict_simple.shadow
+    return jsonify({
+        "active": predict_simple.model_version,
+        "registry_active": predict_simple.registry.active(),
+        "versions": predict_simple.registry.versions(),
+        "shadow": shadow.stats() if shadow is not None else None,
+    })
+
+
+@health_bp.route("/models/activate", methods=["POST"])
+def activate_model():
+    denied = _admin_denied()
+    if denied:
+        return denied
+    version = (request.get_json(silent=True) or {}).get("version")
+    try:
+        active = predict_simple.activate_model(version)
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Could not load model {version}: {e}"}), 500
+    return jsonify({"status": "ok", "active": active})
+
+
+@health_bp.route("/models/shadow", methods=["POST"])
+def shadow_model():
+    denied = _admin_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    version = data.get("version")
+    if not version:
+        predict_simple.stop_shadow()
+        return jsonify({"status": "ok", "shadow": None})
+    try:
+        sample_rate = float(data.get("sample_rate", predict_simple.MODEL_SHADOW_SAMPLE))
+    except (TypeError, ValueError):
+        return jsonify({"error": "sample_rate must be a number"}), 400
+    try:
+        scorer = predict_simple.start_shadow(version, sample_rate)
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "ok", "shadow": scorer.stats()})
+
+
 @health_bp.route("/prediction/features", methods=["GET"])
 def get_features():
     return jsonify({
@@ -154,42 +416,129 @@ def get_features():
     })
 
 
-def get_reports(limit: int = 200):
-    items = []
-    # Try MongoDB first
+def encode_cursor(timestamp, report_id) -> str:
+    """Opaque page cursor for a (timestamp, id) position."""
+    raw = json.dumps([timestamp, report_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError on malformed input."""
     try:
-        cursor = mongo.db.reports.find().sort("timestamp", -1).limit(limit)
-        for r in cursor:
-            r.pop("_id", None)
-            items.append(r)
-        if items:
-            return items
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, report_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
     except Exception:
-        pass
+        raise ValueError("Invalid cursor")
+    if not isinstance(timestamp, str) or not isinstance(report_id, int):
+        raise ValueError("Invalid cursor")
+    return timestamp, report_id
+
+
+def get_reports_page(limit: int = 200, next_cursor: str | None = None, before_cursor: str | None = None,
+                     fields: list | None = None):
+    """Newest-first page of reports using keyset pagination on (timestamp, id).
+
+    `next_cursor` continues towards older reports, `before_cursor` goes back
+    towards newer ones. Both become a range seek on idx_reports_timestamp, so
+    every page costs the same regardless of how deep it is.
+
+    With `fields`, only those columns are read and items are tuples of
+    (id, *fields) instead of dicts.
+
+    Reports without a timestamp sort last (SQLite orders NULL lowest); their
+    cursors carry "" as the timestamp, like COALESCE(timestamp, ''). The
+    dated and undated ranges are sought separately - a (timestamp, id) range
+    on the index, then an id range over `timestamp IS NULL` once the first is
+    exhausted - since an OR across both would scan the whole index.
+    """
+    newest_first = [("timestamp", -1), ("_id", -1)]
+    undated_newest_first = [("_id", -1)]
+    if before_cursor:
+        ts, report_id = decode_cursor(before_cursor)
+        if ts:
+            ranges = [({"timestamp": {"$gte": ts}, "$or": [{"timestamp": {"$gt": ts}}, {"_id": {"$gt": report_id}}]},
+                       [("timestamp", 1), ("_id", 1)])]
+        else:
+            ranges = [({"timestamp": None, "_id": {"$gt": report_id}}, [("_id", 1)]),
+                      ({"timestamp": {"$ne": None}}, [("timestamp", 1), ("_id", 1)])]
+    elif next_cursor:
+        ts, report_id = decode_cursor(next_cursor)
+        if ts:
+            ranges = [({"timestamp": {"$lte": ts}, "$or": [{"timestamp": {"$lt": ts}}, {"_id": {"$lt": report_id}}]},
+                       newest_first),
+                      ({"timestamp": None}, undated_newest_first)]
+        else:
+            ranges = [({"timestamp": None, "_id": {"$lt": report_id}}, undated_newest_first)]
+    else:
+        ranges = [({"timestamp": {"$ne": None}}, newest_first), ({"timestamp": None}, undated_newest_first)]
+
+    try:
+        # Fetch one extra row to know whether another page exists
+        rows = []
+        for query, order in ranges:
+            if len(rows) > limit:
+                break
+            cursor = mongo.db.reports.find(query, fields).sort(order).limit(limit + 1 - len(rows))
+            rows.extend(cursor.as_tuples() if fields else cursor)
+    except Exception:
+        rows = None
+
+    if rows is None or (not rows and not (next_cursor or before_cursor)):
+        # Fallback to CSV (no paging there)
+        items = _get_csv_reports(limit)
+        if fields:
+            items = [(None, *(r.get(f) for f in fields)) for r in items]
+        return {"items": items, "next": None, "before": None}
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before_cursor:
+        rows.reverse()
+
+    def edge(row):
+        return (row.timestamp or "", row.id) if fields else (row["timestamp"] or "", row["_id"])
+
+    page = {"items": rows, "next": None, "before": None}
+    if rows:
+        if has_more or before_cursor:
+            page["next"] = encode_cursor(*edge(rows[-1]))
+        if next_cursor or (before_cursor and has_more):
+            page["before"] = encode_cursor(*edge(rows[0]))
+    if not fields:
+        for r in rows:
+            r.pop("_id", None)
+    return page
+
 
-    # Fallback to CSV
-    if os.path.exists(CSV_PATH):
-        with open(CSV_PATH, mode="r", encoding="utf-8") as f:
-            for row in list(csv.DictReader(f))[-limit:]:
-                items.append({
-                    "timestamp": row.get("timestamp"),
-                    "reporter": row.get("reporter"),
-                    "location_name": row.get("location_name"),
-                    "lat": float(row["lat"]) if row.get("lat") else None,
-                    "lng": float(row["lng"]) if row.get("lng") else None,
-                    "symptoms": row.get("symptoms"),
-                    "cases": int(row["cases"]) if row.get("cases") else None,
-                    "turbidity": float(row["turbidity"]) if row.get("turbidity") else None,
-                    "ph": float(row["ph"]) if row.get("ph") else None,
-                    "chlorine": float(row["chlorine"]) if row.get("chlorine") else None,
-                    "tds": float(row["tds"]) if row.get("tds") else None,
-                    "fluoride": float(row["fluoride"]) if row.get("fluoride") else None,
-                    "nitrate": float(row["nitrate"]) if row.get("nitrate") else None,
-                    "chloride": float(row["chloride"]) if row.get("chloride") else None,
-                    "ec": float(row["ec"]) if row.get("ec") else None,
-                    "ai_prediction": row.get("ai_prediction"),
-                    "ai_confidence": float(row["ai_confidence"]) if row.get("ai_confidence") else None,
-                })
+def get_reports(limit: int = 200):
+    return get_reports_page(limit)["items"]
+
+
+def _get_csv_reports(limit: int):
+    """Last `limit` reports from the CSV log (used when the database is unavailable)."""
+    items = []
+    csv_log().flush()
+    # Only the tail of the file is read and parsed, not the whole log
+    for row in tail_records(CSV_PATH, limit, use_index=CSV_INDEX):
+        items.append({
+            "timestamp": row.get("timestamp"),
+            "reporter": row.get("reporter"),
+            "location_name": row.get("location_name"),
+            "lat": float(row["lat"]) if row.get("lat") else None,
+            "lng": float(row["lng"]) if row.get("lng") else None,
+            "symptoms": row.get("symptoms"),
+            "cases": int(row["cases"]) if row.get("cases") else None,
+            "turbidity": float(row["turbidity"]) if row.get("turbidity") else None,
+            "ph": float(row["ph"]) if row.get("ph") else None,
+            "chlorine": float(row["chlorine"]) if row.get("chlorine") else None,
+            "tds": float(row["tds"]) if row.get("tds") else None,
+            "fluoride": float(row["fluoride"]) if row.get("fluoride") else None,
+            "nitrate": float(row["nitrate"]) if row.get("nitrate") else None,
+            "chloride": float(row["chloride"]) if row.get("chloride") else None,
+            "ec": float(row["ec"]) if row.get("ec") else None,
+            "ai_prediction": row.get("ai_prediction"),
+            "ai_confidence": float(row["ai_confidence"]) if row.get("ai_confidence") else None,
+        })
     return items
 
 
@@ -227,28 +576,30 @@ def report():
     chloride = to_float(data.get("chloride"))
     ec = to_float(data.get("ec"))
     
-    # AI Prediction
+    # AI Prediction (deferred to the report scorer in async mode)
     ai_prediction = None
     ai_confidence = None
-    if ph is not None and cases is not None:
+    ai_model_version = None
+    scorable = ph is not None and cases is not None
+    ai_status = "pending" if scorable and REPORT_ASYNC_SCORING else None
+    if scorable and not REPORT_ASYNC_SCORING:
         try:
-            input_data = {'ph': ph, 'cases': cases}
-            if tds is not None: input_data['tds'] = tds
-            if fluoride is not None: input_data['fluoride'] = fluoride
-            if nitrate is not None: input_data['nitrate'] = nitrate
-            if chloride is not None: input_data['chloride'] = chloride
-            if ec is not None: input_data['ec'] = ec
-            
-            result = predict_risk_level(input_data)
+            result = score_risk_level(_prediction_input({
+                "ph": ph, "cases": cases, "tds": tds, "fluoride": fluoride,
+                "nitrate": nitrate, "chloride": chloride, "ec": ec,
+            }))
             ai_prediction = result['predicted_risk_level']
             ai_confidence = result['confidence']
-        except Exception as e:
-            print(f"AI prediction failed: {e}")
+            ai_model_version = result.get('model_version')
+        except Exception:
+            logger.exception("⚠️ AI prediction failed")
             # Continue without AI prediction
 
     # Write to MongoDB (primary storage)
+    stored = False
+    report_id = None
     try:
-        mongo.db.reports.insert_one({
+        document = {
             "timestamp": timestamp,
             "reporter": reporter,
             "location_name": location_name,
@@ -266,14 +617,45 @@ def report():
             "ec": ec,
             "ai_prediction": ai_prediction,
             "ai_confidence": ai_confidence,
-        })
+            "ai_model_version": ai_model_version,
+        }
+        if ai_status:
+            document["ai_status"] = ai_status
+        report_id = mongo.db.reports.insert_one(document).inserted_id
+        stored = True
     except Exception:
         # Ignore Mongo failure and proceed to CSV fallback
         pass
 
+    if ai_status == "pending":
+        try:
+            if report_id is None:
+                raise RuntimeError("report was not stored")
+            report_scorer().submit((report_id, _prediction_input(document)))
+        except Exception:
+            # Nowhere to write a late prediction back to; score it now instead
+            ai_status = None
+            try:
+                result = score_risk_level(_prediction_input(document))
+                ai_prediction = result['predicted_risk_level']
+                ai_confidence = result['confidence']
+                ai_model_version = result.get('model_version')
+            except Exception:
+                logger.exception("⚠️ AI prediction failed")
+            try:
+                if report_id is not None:
+                    mongo.db.reports.update_one({"_id": report_id}, {"$set": {
+                        "ai_prediction": ai_prediction,
+                        "ai_confidence": ai_confidence,
+                        "ai_model_version": ai_model_version,
+                        "ai_status": "scored" if ai_prediction else "failed",
+                    }})
+            except Exception:
+                # The stored report keeps ai_status "pending" and is requeued on restart
+                pass
+
     # Also append to CSV as a portable log (fallback)
     try:
-        ensure_csv_header()
         row = [
             timestamp,
             reporter or "",
@@ -293,44 +675,147 @@ def report():
             ai_prediction or "",
             ai_confidence if ai_confidence is not None else "",
         ]
-        with csv_lock:
-            with open(CSV_PATH, mode="a", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(row)
+        log = csv_log()
+        log.write(row)
+        if not stored:
+            # The CSV is the only copy of this report, don't leave it buffered
+            log.flush()
     except Exception:
         # Intentionally ignore CSV fallback errors to not block API success
         pass
 
     # Return AI prediction if available, otherwise fallback to simple risk calculation
     risk = ai_prediction if ai_prediction else compute_risk(cases, turbidity)
-    return jsonify({"status": "ok", "risk": risk, "ai_prediction": ai_prediction, "ai_confidence": ai_confidence}), 201
+    body = {"status": "ok", "id": report_id, "risk": risk, "ai_prediction": ai_prediction, "ai_confidence": ai_confidence}
+    if ai_status == "pending":
+        # Provisional risk; poll /api/report/<id> for the model's answer
+        body["ai_status"] = ai_status
+    return jsonify(body), 201
+
+
+@health_bp.route("/report/<int:report_id>", methods=["GET"])
+def get_report(report_id: int):
+    doc = mongo.db.reports.find_one({"_id": report_id}, projection=[
+        "timestamp", "location_name", "cases", "turbidity", "ai_prediction", "ai_confidence", "ai_status",
+    ])
+    if doc is None:
+        return jsonify({"error": "Report not found"}), 404
+    ai_prediction = doc.get("ai_prediction")
+    return jsonify({
+        "id": doc["_id"],
+        "timestamp": doc.get("timestamp"),
+        "location_name": doc.get("location_name"),
+        "risk": ai_prediction if ai_prediction else compute_risk(doc.get("cases"), doc.get("turbidity")),
+        "ai_prediction": ai_prediction,
+        "ai_confidence": doc.get("ai_confidence"),
+        "ai_status": doc.get("ai_status") or ("scored" if ai_prediction else None),
+    })
 
 
-@health_bp.route("/reports", methods=["GET"])
-def reports():
+def _page_args():
     try:
         limit = int(request.args.get('limit', '200'))
     except Exception:
         limit = 200
     limit = max(1, min(limit, 1000))
-    return jsonify({"items": get_reports(limit)})
+    return limit, request.args.get('next') or None, request.args.get('before') or None
 
 
-@health_bp.route("/alerts", methods=["GET"])
-def alerts():
+@health_bp.route("/reports", methods=["GET"])
+def reports():
+    limit, next_cursor, before_cursor = _page_args()
+    try:
+        page = get_reports_page(limit, next_cursor, before_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page)
+
+
+@health_bp.route("/reports/search", methods=["GET"])
+def search_reports():
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({"error": "Missing required query parameter: q"}), 400
+    try:
+        limit = int(request.args.get('limit', '50'))
+    except Exception:
+        limit = 50
+    limit = max(1, min(limit, 200))
+
+    try:
+        results = mongo.db.reports.search(q, limit)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 501
+    for r in results:
+        r.pop("_id", None)
+    return jsonify({"query": q, "items": results})
+
+
+def _float_arg(name: str):
+    value = request.args.get(name)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Query parameter '{name}' must be a number")
+
+
+def _spatial_limit():
     try:
         limit = int(request.args.get('limit', '200'))
     except Exception:
         limit = 200
-    limit = max(1, min(limit, 1000))
+    return max(1, min(limit, 1000))
+
+
+@health_bp.route("/reports/near", methods=["GET"])
+def reports_near():
+    try:
+        lat = _float_arg("lat")
+        lng = _float_arg("lng")
+        radius_km = _float_arg("radius_km") if request.args.get("radius_km") else 10.0
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or not (0 < radius_km <= 500):
+        return jsonify({"error": "lat/lng out of range or radius_km not in (0, 500]"}), 400
+
+    items = mongo.db.reports.near(lat, lng, radius_km, limit=_spatial_limit())
+    for r in items:
+        r.pop("_id", None)
+    return jsonify({"items": items})
+
+
+@health_bp.route("/reports/bbox", methods=["GET"])
+def reports_bbox():
+    try:
+        bounds = [_float_arg(name) for name in ("min_lat", "min_lng", "max_lat", "max_lng")]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    min_lat, min_lng, max_lat, max_lng = bounds
+    # min_lng > max_lng is a box that crosses the antimeridian
+    if min_lat > max_lat or not all(-180 <= lng <= 180 for lng in (min_lng, max_lng)):
+        return jsonify({"error": "min_lat must not exceed max_lat and lng must be within [-180, 180]"}), 400
+
+    items = mongo.db.reports.within_bbox(min_lat, min_lng, max_lat, max_lng, limit=_spatial_limit())
+    for r in items:
+        r.pop("_id", None)
+    return jsonify({"items": items})
+
+
+@health_bp.route("/alerts", methods=["GET"])
+def alerts():
+    limit, next_cursor, before_cursor = _page_args()
+    try:
+        page = get_reports_page(limit, next_cursor, before_cursor, fields=ALERT_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     alerts_out = []
-    for r in get_reports(limit):
+    for _, timestamp, location_name, lat, lng, cases, turbidity, ph, ai_prediction, ai_confidence in page["items"]:
         # Use AI prediction if available, otherwise fallback to simple calculation
-        if r.get("ai_prediction"):
-            risk = r.get("ai_prediction")
+        if ai_prediction:
+            risk = ai_prediction
         else:
-            risk = compute_risk(r.get("cases"), r.get("turbidity"))
+            risk = compute_risk(cases, turbidity)
         
         # Convert AI risk levels to simple format for alerts
         if risk in ("Low Risk", "Medium Risk", "High Risk", "Low", "Medium", "High"):
@@ -342,20 +827,20 @@ def alerts():
                 alert_risk = "High"
             
             alerts_out.append({
-                "timestamp": r.get("timestamp"),
+                "timestamp": timestamp,
                 "message": f"{alert_risk} Risk Alert",
                 "risk": alert_risk,
-                "location_name": r.get("location_name") or "Unknown",
-                "lat": r.get("lat"),
-                "lng": r.get("lng"),
+                "location_name": location_name or "Unknown",
+                "lat": lat,
+                "lng": lng,
                 "details": ", ".join(filter(None, [
-                    f"cases={r['cases']}" if r.get("cases") is not None else None,
-                    f"turbidity={r['turbidity']}" if r.get("turbidity") is not None else None,
-                    f"pH={r['ph']}" if r.get("ph") is not None else None,
-                    f"AI Confidence: {int(r['ai_confidence']*100)}%" if r.get("ai_confidence") else None,
+                    f"cases={cases}" if cases is not None else None,
+                    f"turbidity={turbidity}" if turbidity is not None else None,
+                    f"pH={ph}" if ph is not None else None,
+                    f"AI Confidence: {int(ai_confidence*100)}%" if ai_confidence else None,
                 ]))
             })
-    return jsonify({"alerts": alerts_out})
+    return jsonify({"alerts": alerts_out, "next": page["next"], "before": page["before"]})
 
 
 @health_bp.route("/clear", methods=["POST"])
@@ -365,8 +850,7 @@ def clear_data():
         mongo.db.reports.drop()
         
         # Clear CSV file
-        if os.path.exists(CSV_PATH):
-            os.remove(CSV_PATH)
+        csv_log().clear()
         
         return jsonify({"status": "ok", "message": "All data cleared successfully"}), 200
     except Exception as e:
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from models.predict_simple import predict_risk_level
+from models.predict_simple import score_risk_level
 import traceback
 
 prediction_bp = Blueprint("prediction", __name__)
@@ -33,7 +33,7 @@ def predict():
             return jsonify({"error": "Cases count is required"}), 400
         
         # Make prediction
-        result = predict_risk_level(data)
+        result = score_risk_level(data)
         
         if 'error' in result:
             return jsonify({"error": result['error']}), 500
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Shared fixtures for the test suite.
+"""
+import os
+import sys
+
+import pytest
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import sqlite_db
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Fresh SQLite database in a temp directory."""
+    monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "test.db"))
+    compat = sqlite_db.init_db()
+    yield compat
+    sqlite_db.close_db()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for the CSV log helpers in database/csv_log.py.
+"""
+import csv
+import os
+import sys
+
+import pytest
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import csv_log
+
+
+FIELDS = ["timestamp", "symptoms", "cases"]
+
+
+def _write_rows(path, rows, mode="w", lineterminator="\r\n"):
+    with open(path, mode, newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator=lineterminator)
+        if mode == "w":
+            writer.writerow(FIELDS)
+        writer.writerows(rows)
+
+
+def _rows(start, stop):
+    # Every third row has a quoted field with a comma and an embedded newline
+    return [
+        [f"2025-01-01T00:00:{i:02d}", f"fever,\n\"rash\" {i}" if i % 3 == 0 else "fever", str(i)]
+        for i in range(start, stop)
+    ]
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_tail_records_handles_quoted_multiline_fields(tmp_path, monkeypatch, use_index):
+    monkeypatch.setattr(csv_log, "BLOCK_SIZE", 16)  # force many block boundaries
+    path = str(tmp_path / "reports.csv")
+    _write_rows(path, _rows(0, 40))
+
+    with open(path, newline="", encoding="utf-8") as f:
+        expected = list(csv.DictReader(f))
+
+    assert csv_log.tail_records(path, 5, use_index=use_index) == expected[-5:]
+    assert csv_log.tail_records(path, 5, offset=7, use_index=use_index) == expected[-12:-7]
+    assert csv_log.tail_records(path, 100, use_index=use_index) == expected
+    assert csv_log.tail_records(path, 5, offset=40, use_index=use_index) == []
+
+    # Appends (with a different line ending) are picked up incrementally
+    _write_rows(path, _rows(40, 45), mode="a", lineterminator="\n")
+    tail = csv_log.tail_records(path, 3, use_index=use_index)
+    assert [r["cases"] for r in tail] == ["42", "43", "44"]
+    assert tail[0]["symptoms"] == 'fever,\n"rash" 42'
+
+
+def test_index_ignores_partial_record_and_rebuilds_after_truncate(tmp_path):
+    path = str(tmp_path / "reports.csv")
+    _write_rows(path, _rows(0, 10))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('2025-01-02T00:00:00,"still being writ')
+
+    count, covered = csv_log.update_index(path)
+    assert count == 10 and covered < os.path.getsize(path)
+
+    _write_rows(path, _rows(0, 2))
+    assert csv_log.update_index(path)[0] == 2
+    assert [r["cases"] for r in csv_log.tail_records(path, 5, use_index=True)] == ["0", "1"]
+
+
+def test_index_is_dropped_with_the_csv_and_checks_content(tmp_path):
+    path = str(tmp_path / "reports.csv")
+    log = csv_log.CSVAuditLog(path, FIELDS, flush_rows=100, flush_interval=0)
+    for i in range(20):
+        log.write(["2025-01-01", "x", f"old{i}"])
+    log.flush()
+    assert len(csv_log.tail_records(path, 20, use_index=True)) == 20
+
+    log.clear()
+    assert not os.path.exists(csv_log.index_path(path))
+    for i in range(20):
+        log.write(["2025-01-02", "y" * 40, f"new{i}"])
+    log.close()
+    assert [r["cases"] for r in csv_log.tail_records(path, 20, use_index=True)] == [f"new{i}" for i in range(20)]
+
+    # Rewritten in place (same inode, not smaller) with other record boundaries:
+    # the first-record hash no longer matches, so the offsets are rebuilt
+    size = os.path.getsize(path)
+    rows = [["2025-01-03", "z" * 80, "mod0"]] + [["2025-01-03", "z", f"mod{i}"] for i in range(1, 80)]
+    with open(path, "r+", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(rows)
+        f.truncate()
+    assert os.path.getsize(path) >= size
+    assert [r["cases"] for r in csv_log.tail_records(path, 80, use_index=True)] == [f"mod{i}" for i in range(80)]
+
+
+def _append_rows(path, worker, count):
+    log = csv_log.CSVAuditLog(path, FIELDS, flush_rows=7, flush_interval=0)
+    for i in range(count):
+        log.write([f"2025-01-01T00:00:{i % 60:02d}", f"worker {worker}, row {i}" + "x" * 200, str(i)])
+    log.close()
+
+
+def test_audit_log_buffers_and_appends_whole_rows_across_processes(tmp_path):
+    import multiprocessing
+
+    path = str(tmp_path / "reports.csv")
+    log = csv_log.CSVAuditLog(path, FIELDS, flush_rows=3, flush_interval=0)
+    log.write(["t", "fever", "1"])
+    log.write(["t", "fever", "2"])
+    assert not os.path.exists(path)  # still buffered
+    log.write(["t", "fever", "3"])
+    stats = log.stats()
+    assert (stats["rows"], stats["flushes"], stats["pending"]) == (3, 1, 0)
+    assert stats["flush_ms_max"] >= stats["flush_ms_avg"] > 0
+    log.close()
+
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_append_rows, args=(path, w, 100)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == FIELDS
+    assert len(rows) == 1 + 3 + 400
+    assert all(len(r) == 3 for r in rows)
+
+
+def test_audit_log_rotates_and_compresses(tmp_path):
+    import gzip
+    import time
+
+    path = str(tmp_path / "reports.csv")
+    log = csv_log.CSVAuditLog(path, FIELDS, flush_rows=1, flush_interval=0, max_bytes=200)
+    for i in range(10):
+        log.write(["2025-01-01T00:00:00", "fever", str(i)])
+    log.close()
+    assert log.stats()["rotations"] >= 1
+
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        archives = sorted(p for p in os.listdir(tmp_path) if p.endswith(".gz"))
+        if len(archives) == log.stats()["rotations"]:
+            break
+        time.sleep(0.05)
+    assert archives
+
+    seen = []
+    for name in archives:
+        with gzip.open(tmp_path / name, "rt", newline="") as f:
+            seen += [r["cases"] for r in csv.DictReader(f)]
+    with open(path, newline="") as f:
+        seen += [r["cases"] for r in csv.DictReader(f)]
+    assert sorted(seen, key=int) == [str(i) for i in range(10)]
@@ -1 +1,286 @@
-# test_db.py placeholder
+#!/usr/bin/env python3
+"""
+Tests for the SQLite storage layer (connection pool, collections, queries).
+"""
+import os
+import sqlite3
+import sys
+import threading
+
+import pytest
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import sqlite_db
+
+
+def _report(**overrides):
+    report = {
+        "timestamp": "2025-09-27T20:52:30",
+        "reporter": "Test",
+        "location_name": "Test Village",
+        "lat": 26.1,
+        "lng": 91.7,
+        "symptoms": "fever",
+        "cases": 3,
+        "ph": 7.1,
+        "ai_prediction": "Low Risk",
+        "ai_confidence": 0.8,
+    }
+    report.update(overrides)
+    return report
+
+
+def test_pool_reuses_connections_across_threads(db):
+    reports = sqlite_db.get_collection("REPORTS")
+    reports.insert_one(_report())
+    sqlite_db.release_connection()
+
+    def worker():
+        for _ in range(10):
+            assert len(list(reports.find().limit(5))) == 1
+            sqlite_db.release_connection()
+
+    threads = [threading.Thread(target=worker) for _ in range(sqlite_db.POOL_SIZE * 2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = sqlite_db.get_pool_stats()
+    assert stats["open"] <= sqlite_db.POOL_SIZE
+    assert stats["in_use"] == 0
+    assert stats["checkouts"] == stats["checkins"]
+    journal_mode = sqlite_db.get_connection().execute("PRAGMA journal_mode").fetchone()[0]
+    assert journal_mode == "wal"
+
+
+def test_pool_reclaims_connections_of_exited_threads(tmp_path):
+    pool = sqlite_db.ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=0.5)
+    leaked = []
+    thread = threading.Thread(target=lambda: leaked.append(pool.checkout()))  # never checked in
+    thread.start()
+    thread.join()
+
+    assert pool.checkout() is leaked[0]
+    assert pool.stats()["reclaimed"] == 1
+    pool.close()
+
+
+def test_data_survives_request_teardown(db):
+    reports = sqlite_db.get_collection("REPORTS")
+    reports.insert_one(_report())
+    sqlite_db.release_connection()
+    assert sqlite_db.mongo.db is not None
+    assert len(list(sqlite_db.mongo.db.reports.find())) == 1
+
+
+def test_insert_many_returns_ids_and_reports_errors(db):
+    reports = sqlite_db.get_collection("REPORTS")
+    result = reports.insert_many([_report(cases=i) for i in range(1200)], chunk_size=500)
+    assert len(result.inserted_ids) == 1200
+    assert result.inserted_ids == list(range(result.inserted_ids[0], result.inserted_ids[0] + 1200))
+    assert reports.find_one({"_id": result.inserted_ids[-1]})["cases"] == 1199
+
+    users = sqlite_db.get_collection("USERS")
+    docs = [{"email": "a@x.org"}, {"email": "a@x.org"}, {"email": "b@x.org"}]
+    with pytest.raises(sqlite_db.BulkWriteError) as ordered_err:
+        users.insert_many(docs)
+    assert ordered_err.value.details["nInserted"] == 1
+    assert users.find_one({"email": "b@x.org"}) is None
+
+    with pytest.raises(sqlite_db.BulkWriteError) as unordered_err:
+        users.insert_many(docs, ordered=False)
+    # a@x.org already exists from the ordered attempt
+    assert [e["index"] for e in unordered_err.value.details["writeErrors"]] == [0, 1]
+    assert users.find_one({"email": "b@x.org"}) is not None
+
+
+def test_find_compiles_filters_to_sql(db):
+    reports = sqlite_db.get_collection("REPORTS")
+    reports.insert_many([
+        _report(timestamp=f"2025-01-0{i}T00:00:00", cases=i, location_name=loc, ai_prediction=risk)
+        for i, (loc, risk) in enumerate([
+            ("Agra", "Low Risk"), ("Pune", "High Risk"), ("Agra", "High Risk"), ("Goa", None),
+        ], start=1)
+    ])
+
+    def cases(query):
+        return [r["cases"] for r in reports.find(query).sort("timestamp", -1)]
+
+    assert cases({"location_name": "Agra"}) == [3, 1]
+    assert cases({"timestamp": {"$gte": "2025-01-02", "$lt": "2025-01-04"}}) == [3, 2]
+    assert cases({"ai_prediction": {"$in": ["High Risk"]}, "cases": {"$ne": 2}}) == [3]
+    assert cases({"ai_prediction": {"$exists": False}}) == [4]
+    assert cases({"$or": [{"cases": {"$lte": 1}}, {"location_name": "Goa"}]}) == [4, 1]
+    with pytest.raises(ValueError):
+        list(reports.find({"cases": {"$regex": "1"}}))
+
+    alerts = sqlite_db.get_collection("ALERTS")
+    alerts.insert_many([{"level": "High", "created_at": "2025-01-01", "source": {"kind": "ai"}}])
+    assert alerts.find_one({"level": "High", "source.kind": "ai"})["source"] == {"kind": "ai"}
+    plan = sqlite_db.get_connection().execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM alerts WHERE level = ? ORDER BY created_at DESC", ("High",)
+    ).fetchall()
+    assert "idx_alerts_level" in " ".join(row[3] for row in plan)
+
+
+def test_find_projection_and_tuple_rows(db):
+    reports = sqlite_db.get_collection("REPORTS")
+    reports.insert_many([_report(cases=i) for i in range(10)])
+
+    docs = list(reports.find({"cases": {"$gte": 5}}, {"cases": 1, "_id": 0}).sort("cases", 1).batch_size(3))
+    assert docs == [{"cases": i} for i in range(5, 10)]
+
+    rows = list(reports.find(None, ["location_name", "cases"]).sort("cases", -1).limit(2).as_tuples())
+    assert [(r.location_name, r.cases) for r in rows] == [("Test Village", 9), ("Test Village", 8)]
+
+    assert "symptoms" not in reports.find_one(None, {"symptoms": 0})
+
+    users = sqlite_db.get_collection("USERS")
+    users.insert_one({"email": "a@x.org", "profile": {"district": "Supaul"}})
+    assert users.find_one({"email": "a@x.org"}, ["profile.district"])["profile"] == {"district": "Supaul"}
+
+
+def test_write_behind_groups_concurrent_inserts(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "test.db"))
+    sqlite_db.init_db(write_behind=True)
+    try:
+        reports = sqlite_db.get_collection("REPORTS")
+        ids = []
+
+        def reporter(n):
+            for i in range(25):
+                ids.append(reports.insert_one(_report(cases=n * 100 + i)).inserted_id)
+            sqlite_db.release_connection()
+
+        threads = [threading.Thread(target=reporter, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(set(ids)) == 200 and None not in ids
+
+        assert reports.insert_one(_report(cases=-1), durable=False).inserted_id is None
+        sqlite_db.flush_writes()
+        assert reports.find_one({"cases": -1}) is not None
+
+        stats = sqlite_db.get_pool_stats()["writer"]
+        assert stats["written"] == 201
+        assert stats["commits"] < stats["written"]
+    finally:
+        sqlite_db.close_db()
+
+
+def test_group_commit_writer_fails_instead_of_hanging(tmp_path):
+    pool = sqlite_db.ConnectionPool(str(tmp_path / "writer.db"), size=1, timeout=0.5)
+    conn = pool.checkout()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    pool.checkin(conn)
+    writer = sqlite_db.GroupCommitWriter(pool)
+
+    # The single (split-mode) writer is shared: no second connection is opened
+    assert writer.submit("INSERT INTO t VALUES (1)") == 1
+    assert pool.stats()["open"] == 1 and pool.stats()["in_use"] == 0
+
+    # No connection for the writer: the caller gets the error
+    held = pool.checkout()
+    with pytest.raises(TimeoutError):
+        writer.submit("INSERT INTO t VALUES (2)")
+    pool.checkin(held)
+
+    writer.stop()
+    with pytest.raises(RuntimeError):
+        writer.submit("INSERT INTO t VALUES (3)")
+    pool.close()
+
+
+def test_aggregate_and_duplicate_report(db):
+    from database.migration_db import create_unique_index_with_report, find_duplicate_values
+
+    reports = sqlite_db.get_collection("REPORTS")
+    reports.insert_many([
+        _report(location_name=loc, cases=cases, ai_prediction=risk)
+        for loc, cases, risk in [
+            ("Agra", 2, "Low Risk"), ("Agra", 8, "High Risk"), ("Pune", 5, "High Risk"), ("Goa", 1, "Low Risk"),
+        ]
+    ])
+
+    by_location = list(reports.aggregate([
+        {"$match": {"cases": {"$gte": 2}}},
+        {"$group": {"_id": "$location_name", "n": {"$sum": 1}, "total": {"$sum": "$cases"},
+                    "avg": {"$avg": "$cases"}, "worst": {"$max": "$cases"}}},
+        {"$sort": {"total": -1}},
+        {"$limit": 1},
+    ]))
+    assert by_location == [{"_id": "Agra", "n": 2, "total": 10, "avg": 5.0, "worst": 8}]
+
+    histogram = list(reports.aggregate([
+        {"$group": {"_id": {"risk": "$ai_prediction"}, "count": {"$count": {}}}},
+        {"$sort": {"_id.risk": 1}},
+    ]))
+    assert histogram == [{"_id": {"risk": "High Risk"}, "count": 2}, {"_id": {"risk": "Low Risk"}, "count": 2}]
+
+    # A misspelled output field must not silently compare against a string constant
+    group = {"$group": {"_id": "$location_name", "total": {"$sum": "$cases"}}}
+    for typo in ({"$match": {"totl": {"$gt": 1}}}, {"$sort": {"totl": -1}}):
+        with pytest.raises(ValueError):
+            list(reports.aggregate([group, typo]))
+
+    assert find_duplicate_values(reports, "location_name") == [{"_id": "Agra", "count": 2}]
+    assert create_unique_index_with_report(reports, "location_name") is False
+    assert create_unique_index_with_report(reports, "reporter.name") is True
+
+
+def test_split_mode_reads_use_read_only_connections(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "test.db"))
+    sqlite_db.init_db(storage_mode="split")
+    try:
+        reports = sqlite_db.get_collection("REPORTS")
+        errors = []
+
+        def writer():
+            for i in range(50):
+                reports.insert_one(_report(cases=i))
+
+        def reader():
+            try:
+                for _ in range(50):
+                    list(reports.find().sort("timestamp", -1).limit(20))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                sqlite_db.release_connection()
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors
+        assert len(list(reports.find())) == 50
+        with pytest.raises(sqlite3.OperationalError):
+            sqlite_db.get_read_connection().execute("DELETE FROM reports")
+
+        stats = sqlite_db.get_pool_stats()
+        assert stats["mode"] == "split" and stats["size"] == 1
+        assert stats["readers"]["checkouts"] >= 6
+    finally:
+        sqlite_db.close_db()
+
+
+def test_update_one_sets_columns_and_document(db):
+    reports = sqlite_db.get_collection("REPORTS")
+    report_id = reports.insert_one(_report(ai_prediction=None, ai_confidence=None)).inserted_id
+
+    result = reports.update_one({"_id": report_id}, {"$set": {
+        "ai_prediction": "High Risk", "ai_confidence": 0.9, "ai_status": "scored", "meta": {"model": "v2"},
+    }})
+    assert result.matched_count == 1
+    doc = reports.find_one({"ai_prediction": "High Risk"}, projection=["ai_confidence", "ai_status", "meta.model"])
+    assert doc == {"_id": report_id, "ai_confidence": 0.9, "ai_status": "scored", "meta": {"model": "v2"}}
+    assert reports.update_one({"_id": report_id + 1}, {"$set": {"cases": 1}}).matched_count == 0
+    with pytest.raises(ValueError):
+        reports.update_one({"_id": report_id}, {"$inc": {"cases": 1}})
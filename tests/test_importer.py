@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming CSV/NDJSON importer in database/importer.py.
+"""
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import importer, sqlite_db
+
+
+def test_outbreak_csv_coerces_dates_counts_and_spilled_comments(db, tmp_path):
+    path = tmp_path / "outbreaks.csv"
+    path.write_text(
+        "Unique_ID,State,District,Disease,Cases,Deaths,Start_Date,Report_Date,Status,Comments\n"
+        "BH/SUP/2019/01/01,Bihar,Supaul,Measles,05,00,02-01-19,06-01-19,outbreak. House,to house survey done. All\n"
+        'KN/HAV/2019/01/09,Karnataka,Haveri,Diarrheal,25,01,31-12-18,01-01-19,done,"quoted, with\nnewline",extra\n',
+        encoding="utf-8",
+    )
+    result = importer.import_file(str(path), "outbreaks")
+    assert result["rows"] == 2
+
+    datasets = sqlite_db.get_collection("DATASETS")
+    supaul = datasets.find_one({"location_name": "Supaul"})
+    assert (supaul["Cases"], supaul["Deaths"]) == (5, 0)
+    assert supaul["timestamp"] == supaul["Start_Date"] == "2019-01-02"
+    haveri = datasets.find_one({"District": "Haveri"})
+    assert haveri["Comments"] == "quoted, with\nnewline,extra"
+    assert haveri["Report_Date"] == "2019-01-01"
+
+
+def test_import_resumes_from_checkpoint_and_rebuilds_indexes(db, tmp_path, monkeypatch):
+    path = tmp_path / "reports.ndjson"
+    path.write_text("".join(
+        json.dumps({"timestamp": f"2025-01-01T00:00:{i:02d}", "cases": f"{i:02d}", "ph": "7.2"}) + "\n"
+        for i in range(50)
+    ))
+
+    real_coerce = importer.to_int
+
+    def flaky(value):
+        if value == "37":
+            raise KeyboardInterrupt
+        return real_coerce(value)
+
+    monkeypatch.setattr(importer, "_column_types", lambda conn, table: {"cases": flaky})
+    with pytest.raises(KeyboardInterrupt):
+        importer.import_file(str(path), "reports", chunk_size=10)
+    monkeypatch.undo()
+
+    conn = sqlite_db.get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 30
+    index_names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+    assert "idx_reports_timestamp" in index_names
+
+    result = importer.import_file(str(path), "reports", chunk_size=10)
+    assert (result["skipped"], result["rows"]) == (30, 20)
+    rows = conn.execute("SELECT cases, ph FROM reports ORDER BY id").fetchall()
+    assert [tuple(r) for r in rows] == [(i, 7.2) for i in range(50)]
+
+
+def test_import_keeps_unique_and_user_indexes(db, tmp_path, monkeypatch):
+    conn = sqlite_db.get_connection()
+    conn.execute("CREATE UNIQUE INDEX idx_reports_unique_ts ON reports(timestamp)")
+    conn.execute("CREATE INDEX idx_reports_location ON reports(location_name)")
+    conn.commit()
+    during_load = []
+    real_drop = importer._drop_indexes
+
+    def spy(conn, table, names):
+        sql = real_drop(conn, table, names)
+        during_load.extend(conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table,)
+        ).fetchall())
+        return sql
+
+    monkeypatch.setattr(importer, "_drop_indexes", spy)
+    path = tmp_path / "reports.csv"
+    path.write_text("timestamp,cases\n" + "".join(f"2025-01-01T00:00:{i:02d},{i}\n" for i in range(5)))
+    importer.import_file(str(path), "reports")
+
+    # Only the schema's own indexes were down during the load
+    remaining = {r[0] for r in during_load}
+    assert {"idx_reports_unique_ts", "idx_reports_location"} <= remaining
+    assert not remaining & {"idx_reports_timestamp", "idx_reports_ai_status"}
+    with pytest.raises(sqlite3.IntegrityError):
+        importer.import_file(str(path), "reports", restart=True, force=True)
+    # The duplicates were refused on insert, not after being committed
+    assert conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 5
+
+
+def test_reimport_of_same_or_replaced_file_is_refused(db, tmp_path):
+    path = tmp_path / "reports.csv"
+    path.write_text("timestamp,cases\n" + "".join(f"2025-01-01,{i}\n" for i in range(5)))
+    assert importer.import_file(str(path), "reports")["rows"] == 5
+    assert importer.import_file(str(path), "reports")["rows"] == 0  # nothing new
+
+    with pytest.raises(ValueError, match="already imported"):
+        importer.import_file(str(path), "reports", restart=True)
+
+    # Same size, different rows: not the file the checkpoint belongs to
+    path.write_text("timestamp,cases\n" + "".join(f"2025-01-02,{i}\n" for i in range(5)))
+    with pytest.raises(ValueError, match="not the file"):
+        importer.import_file(str(path), "reports")
+    conn = sqlite_db.get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 5
+
+    assert importer.import_file(str(path), "reports", force=True)["rows"] == 5
+    # Appending to the new file resumes from its checkpoint
+    with open(path, "a") as f:
+        f.write("2025-01-02,5\n")
+    assert importer.import_file(str(path), "reports")["rows"] == 1
+    assert conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 11
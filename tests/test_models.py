@@ -1 +1,507 @@
-# test_models.py placeholder
+#!/usr/bin/env python3
+"""
+Tests for the risk prediction helpers in models/predict_simple.py.
+
+The trained pickle is not part of the repository, so these tests fit a small
+forest with the same feature layout and risk classes on synthetic readings.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import predict_simple
+
+FEATURE_NAMES = ['pH', 'Total_Cases', 'TDS', 'F', 'NO3', 'Cl', 'EC in μS/cm']
+
+
+def synthetic_readings(n, seed=0):
+    """Random readings labelled with a simplified version of the notebook's risk score."""
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.uniform(5.5, 9.5, n),       # pH
+        rng.integers(0, 40, n),         # Total_Cases
+        rng.uniform(50, 2000, n),       # TDS
+        rng.uniform(0, 3, n),           # F
+        rng.uniform(0, 100, n),         # NO3
+        rng.uniform(5, 600, n),         # Cl
+        rng.uniform(100, 3000, n),      # EC
+    ])
+    score = ((X[:, 0] < 6.5) | (X[:, 0] > 8.5)) * 2 + np.digitize(X[:, 1], [1, 6, 11]) + (X[:, 2] > 1000) * 2
+    labels = np.array(['No Risk', 'Low Risk', 'Medium Risk', 'High Risk'])[np.digitize(score, [1, 3, 5])]
+    return X, labels
+
+
+@pytest.fixture
+def risk_model(tmp_path, monkeypatch):
+    from sklearn.ensemble import RandomForestClassifier
+    from models.registry import ModelRegistry
+
+    X, y = synthetic_readings(600)
+    model = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=42).fit(X, y)
+    # Keep a real model file or registry in the checkout from replacing the fixture model on reload
+    home = tmp_path / "risk_model"
+    monkeypatch.setattr(predict_simple, "MODEL_PATH", str(home / "model.pkl"))
+    monkeypatch.setattr(predict_simple, "ARTIFACT_PATH", str(home / "model.joblib"))
+    monkeypatch.setattr(predict_simple, "registry", ModelRegistry(str(home / "registry")))
+    monkeypatch.setattr(predict_simple, "_model_signature", None)
+    monkeypatch.setattr(predict_simple, "_state", predict_simple.ModelState(
+        model, None, FEATURE_NAMES, model.classes_, None, predict_simple.build_engine(model)))
+    return model
+
+
+def test_batch_matches_single_predictions(risk_model):
+    X, _ = synthetic_readings(50, seed=1)
+    inputs = [dict(zip(predict_simple.FEATURE_KEYS, row)) for row in X]
+    inputs[3] = {"ph": 7.2, "total_cases": 4}  # defaults filled in
+    inputs[7] = {"cases": 3}                    # missing pH
+    inputs[9] = {"ph": "acidic", "cases": 1}    # not a number
+
+    results = predict_simple.predict_risk_levels(inputs)
+    assert len(results) == 50
+    assert "pH is required" in results[7]["error"] and results[7]["predicted_risk_level"] is None
+    assert "Prediction failed" in results[9]["error"]
+
+    for row, result in zip(inputs, results):
+        if result.get("error"):
+            continue
+        single = predict_simple.predict_risk_level(row)
+        assert result["predicted_risk_level"] == single["predicted_risk_level"]
+        assert result["confidence"] == pytest.approx(single["confidence"])
+        assert result["probabilities"] == pytest.approx(single["probabilities"])
+
+    assert results[3]["input_features"]["TDS"] == 414.0
+    assert results[3]["input_features"]["Total_Cases"] == 4
+
+
+def test_batch_endpoint_returns_per_row_results(risk_model, tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "test.db"))
+    from app import create_app
+    from database import sqlite_db
+
+    client = create_app().test_client()
+    try:
+        resp = client.post("/api/prediction/batch", json={"inputs": [
+            {"ph": 7.1, "cases": 2}, {"ph": 9.4, "cases": 30, "tds": 1500}, {"cases": 1},
+        ]})
+        body = resp.get_json()
+        assert resp.status_code == 200
+        assert (body["count"], body["errors"], body["success"]) == (3, 1, False)
+        assert [r["success"] for r in body["results"]] == [True, True, False]
+        assert body["results"][1]["prediction"] in risk_model.classes_
+
+        assert client.post("/api/prediction/batch", json={"inputs": []}).status_code == 400
+    finally:
+        sqlite_db.close_db()
+
+
+def outbreak_features():
+    """Numeric features / disease labels from the bundled outbreak dataset."""
+    import csv
+
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "outbreak_master.csv")
+    X, y = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                _, month, year = (int(p) for p in row["Start_Date"].split("-"))
+                X.append([int(row["Cases"]), int(row["Deaths"]), month, year, len(row["State"])])
+            except (ValueError, KeyError, AttributeError):
+                continue
+            y.append(row["Disease"] if row["Disease"] in ("Diarrheal", "Food Poisoning", "Chickenpox") else "Other")
+    return np.array(X, dtype=float), np.array(y)
+
+
+@pytest.mark.parametrize("dataset", ["water", "outbreak"])
+def test_compiled_engine_matches_sklearn(dataset):
+    from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+    from models.tree_engine import compile_model
+
+    X, y = synthetic_readings(1500) if dataset == "water" else outbreak_features()
+    split = int(len(X) * 0.8)
+    candidates = [
+        RandomForestClassifier(n_estimators=40, random_state=42, class_weight="balanced"),
+        ExtraTreesClassifier(n_estimators=20, random_state=42),
+        GradientBoostingClassifier(n_estimators=30, random_state=42),
+        GradientBoostingClassifier(n_estimators=30, random_state=42),  # binary
+    ]
+    for i, estimator in enumerate(candidates):
+        labels = y if i < 3 else (y == y[0])
+        model = estimator.fit(X[:split], labels[:split])
+        compiled = compile_model(model)
+        np.testing.assert_allclose(compiled.predict_proba(X[split:]), model.predict_proba(X[split:]), atol=1e-12)
+        assert (compiled.predict(X[split:]) == model.predict(X[split:])).all()
+
+
+def test_engine_switch(risk_model, monkeypatch):
+    from sklearn.linear_model import LogisticRegression
+    from models.tree_engine import CompiledEnsemble
+
+    assert isinstance(predict_simple.get_engine(), CompiledEnsemble)
+    monkeypatch.setattr(predict_simple, "PREDICTION_ENGINE", "sklearn")
+    assert predict_simple.build_engine(risk_model) is risk_model
+
+    X, y = synthetic_readings(200)
+    linear = LogisticRegression(max_iter=200).fit(X, y)
+    monkeypatch.setattr(predict_simple, "PREDICTION_ENGINE", "auto")
+    assert predict_simple.build_engine(linear) is linear  # not a tree model, falls back
+    monkeypatch.setattr(predict_simple, "PREDICTION_ENGINE", "numpy")
+    with pytest.raises(TypeError):
+        predict_simple.build_engine(linear)
+
+
+def test_prediction_cache_lru_ttl_counters():
+    from models.prediction_cache import PredictionCache
+
+    now = [0.0]
+    cache = PredictionCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # evicts b, the least recently used
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None  # expired
+    assert cache.stats() == dict(cache.stats(), hits=1, misses=2, evictions=1, expirations=1, entries=1)
+
+
+def test_predictions_are_cached_per_quantized_reading_and_model_file(risk_model, tmp_path, monkeypatch):
+    import pickle
+
+    path = tmp_path / "model.pkl"
+
+    def save(model):
+        with open(path, "wb") as f:
+            pickle.dump({"model": model, "scaler": None, "feature_names": FEATURE_NAMES,
+                         "classes": model.classes_, "accuracy": 1.0}, f)
+
+    save(risk_model)
+    for name in ("_state", "_model_signature"):
+        monkeypatch.setattr(predict_simple, name, getattr(predict_simple, name))  # restored afterwards
+    monkeypatch.setattr(predict_simple, "MODEL_PATH", str(path))
+    monkeypatch.setattr(predict_simple, "MODEL_CHECK_INTERVAL", 0)
+    predict_simple.load_model()
+    cache = predict_simple.prediction_cache
+
+    first = predict_simple.predict_risk_level({"ph": 7.123, "cases": 4})
+    before = cache.stats()
+    again = predict_simple.predict_risk_level({"ph": 7.1249, "cases": 4.2})  # same at sensor precision
+    assert again == first and again["input_features"]["pH"] == 7.12
+    assert cache.stats()["hits"] == before["hits"] + 1
+
+    batch = predict_simple.predict_risk_levels([{"ph": 7.12, "cases": 4}, {"ph": 6.0, "cases": 30}])
+    assert batch[0] == first
+    assert cache.stats()["hits"] == before["hits"] + 2
+
+    # A new model file invalidates everything cached for the old one
+    from sklearn.ensemble import RandomForestClassifier
+    X, y = synthetic_readings(300, seed=3)
+    save(RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y))
+    os.utime(path, ns=(1, 1))
+    invalidations = cache.stats()["invalidations"]
+    predict_simple.predict_risk_level({"ph": 7.12, "cases": 4})
+    assert cache.stats()["invalidations"] > invalidations
+    assert predict_simple.model is not risk_model
+
+
+def test_joblib_artifact_is_memory_mapped(risk_model, tmp_path, monkeypatch):
+    import pickle
+
+    src = tmp_path / "model.pkl"
+    with open(src, "wb") as f:
+        pickle.dump({"model": risk_model, "scaler": None, "feature_names": FEATURE_NAMES,
+                     "classes": risk_model.classes_, "accuracy": 1.0}, f)
+    for name in ("_state", "_model_signature"):
+        monkeypatch.setattr(predict_simple, name, getattr(predict_simple, name))  # restored afterwards
+
+    artifact = predict_simple.save_artifact(str(src), str(tmp_path / "model.joblib"))
+    predict_simple.load_model(artifact)
+    engine = predict_simple.get_engine()
+    assert isinstance(engine.threshold, np.memmap)
+
+    X, _ = synthetic_readings(20, seed=4)
+    np.testing.assert_allclose(engine.predict_proba(X), risk_model.predict_proba(X))
+
+
+def test_micro_batcher_groups_concurrent_calls():
+    import threading
+    from models.micro_batcher import MicroBatcher
+
+    seen = []
+
+    def handler(items):
+        seen.append(len(items))
+        if "boom" in items:
+            raise RuntimeError("boom")
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(handler, max_batch_size=8, max_wait=0.05)
+    results = {}
+    start = threading.Barrier(20)
+
+    def caller(n):
+        start.wait()
+        results[n] = batcher(n, timeout=5)
+
+    threads = [threading.Thread(target=caller, args=(n,)) for n in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {n: n * 2 for n in range(20)}
+    assert max(seen) == 8 and len(seen) < 20
+
+    with pytest.raises(RuntimeError):
+        batcher("boom", timeout=5)
+    stats = batcher.stats()
+    assert stats["items"] == 21 and stats["errors"] == 1
+    assert sum(stats["batch_size_histogram"].values()) == stats["batches"]
+    assert set(stats["batch_size_histogram"]) <= {"1", "2", "4", "8"}
+    batcher.close()
+
+
+def test_score_risk_level_uses_micro_batcher(risk_model, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setattr(predict_simple, "PREDICTION_MICRO_BATCH", True)
+    monkeypatch.setattr(predict_simple, "_batcher", None)
+    X, _ = synthetic_readings(64, seed=7)
+    inputs = [dict(zip(predict_simple.FEATURE_KEYS, row)) for row in X]
+    try:
+        with ThreadPoolExecutor(16) as pool:
+            batched = list(pool.map(predict_simple.score_risk_level, inputs))
+        assert batched == [predict_simple.predict_risk_level(row) for row in inputs]
+        stats = predict_simple.get_prediction_stats()["micro_batch"]
+        assert stats["items"] == 64
+    finally:
+        predict_simple.get_batcher().close()
+
+
+def test_inference_pool_matches_inline_and_recovers_from_crash(risk_model, tmp_path):
+    import pickle
+    from models.inference_pool import InferencePool
+
+    path = tmp_path / "model.pkl"
+    with open(path, "wb") as f:
+        pickle.dump({"model": risk_model, "scaler": None, "feature_names": FEATURE_NAMES,
+                     "classes": risk_model.classes_, "accuracy": 1.0}, f)
+
+    pool = InferencePool(processes=2, timeout=60, model_path=str(path), shm_min_rows=100)
+    try:
+        small, _ = synthetic_readings(10, seed=5)
+        large, _ = synthetic_readings(500, seed=6)
+        np.testing.assert_allclose(pool.predict_proba(small), risk_model.predict_proba(small))
+        np.testing.assert_allclose(pool.predict_proba(large), risk_model.predict_proba(large))
+        assert pool.stats()["shm_batches"] == 1
+
+        for process in list(pool._executor._processes.values()):
+            process.kill()
+            process.join()
+        np.testing.assert_allclose(pool.predict_proba(small), risk_model.predict_proba(small))
+        assert pool.stats()["restarts"] == 1 and pool.stats()["tasks"] == 3
+
+        # Workers reload when the parent serves a newer model than theirs
+        from sklearn.ensemble import RandomForestClassifier
+        X, y = synthetic_readings(300, seed=7)
+        newer = RandomForestClassifier(n_estimators=5, max_depth=3, random_state=1).fit(X, y)
+        with open(path, "wb") as f:
+            pickle.dump({"model": newer, "scaler": None, "feature_names": FEATURE_NAMES,
+                         "classes": newer.classes_, "accuracy": 1.0}, f)
+        st = os.stat(path)
+        version = f"{st.st_mtime_ns}-{st.st_size}"
+        np.testing.assert_allclose(pool.predict_proba(small, version=version), newer.predict_proba(small))
+        with pytest.raises(RuntimeError, match="not unknown"):
+            pool.predict_proba(small, version="unknown")
+    finally:
+        pool.close()
+
+
+def test_prediction_stats_do_not_start_the_process_pool(monkeypatch):
+    monkeypatch.setattr(predict_simple, "PREDICTION_BACKEND", "process")
+    monkeypatch.setattr(predict_simple, "_inference_pool", None)
+    assert predict_simple.get_prediction_stats()["process_pool"] is None
+    assert predict_simple._inference_pool is None
+
+
+def test_rescore_backfill_checkpoints_and_matches_live_scoring(risk_model, tmp_path, monkeypatch):
+    import pickle
+    from database import sqlite_db
+    from models import rescore
+
+    path = tmp_path / "model.pkl"
+    with open(path, "wb") as f:
+        pickle.dump({"model": risk_model, "scaler": None, "feature_names": FEATURE_NAMES,
+                     "classes": risk_model.classes_, "accuracy": 1.0}, f)
+    for name in ("_state", "_model_signature"):
+        monkeypatch.setattr(predict_simple, name, getattr(predict_simple, name))  # restored afterwards
+    monkeypatch.setattr(predict_simple, "MODEL_PATH", str(path))
+    monkeypatch.setattr(predict_simple, "ARTIFACT_PATH", str(tmp_path / "model.joblib"))
+    predict_simple.load_model()
+
+    monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "test.db"))
+    sqlite_db.init_db()
+    try:
+        X, _ = synthetic_readings(40, seed=8)
+        docs = [dict(zip(predict_simple.FEATURE_KEYS, row), ai_prediction="stale") for row in X]
+        docs[5] = {"cases": 3, "ai_prediction": "stale"}  # no pH, nothing to score
+        docs[6].update(ai_model_version=predict_simple.model_version, ai_prediction="current")
+        sqlite_db.get_collection("REPORTS").insert_many(docs)
+        sqlite_db.release_connection()
+
+        first = rescore.rescore_reports(chunk_size=8, duty_cycle=1, limit=16)
+        assert (first["rows"], first["chunks"]) == (16, 2)
+        rest = rescore.rescore_reports(chunk_size=8, workers=2, duty_cycle=0.9)
+        assert rest["rows"] == 38 - 16  # resumed after the checkpoint
+
+        rows = list(sqlite_db.get_collection("REPORTS").find(
+            projection=["ph", "ai_prediction", "ai_confidence", "ai_model_version", "ai_status"]))
+        by_id = {doc["_id"]: doc for doc in rows}
+        assert by_id[6]["ai_prediction"] == "stale" and by_id[7]["ai_prediction"] == "current"
+        for i, doc in enumerate(rows):
+            if i in (5, 6):
+                continue
+            live = predict_simple.predict_risk_level(docs[i])
+            assert doc["ai_prediction"] == live["predicted_risk_level"]
+            assert doc["ai_confidence"] == pytest.approx(live["confidence"])
+            assert (doc["ai_model_version"], doc["ai_status"]) == (predict_simple.model_version, "scored")
+        assert rescore.rescore_reports()["rows"] == 0
+        # 0 would mean "never sleep", the opposite of the throttle it asks for
+        with pytest.raises(ValueError, match="duty_cycle"):
+            rescore.rescore_reports(duty_cycle=0)
+    finally:
+        sqlite_db.close_db()
+
+
+def test_registry_hot_swap_and_shadow_scoring(risk_model, tmp_path, monkeypatch):
+    import pickle
+    import threading
+    from sklearn.ensemble import ExtraTreesClassifier
+    from models.registry import ModelRegistry
+
+    X, y = synthetic_readings(400, seed=9)
+    candidate = ExtraTreesClassifier(n_estimators=10, max_depth=4, random_state=0).fit(X, y)
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    for version, model in (("v1", risk_model), ("v2", candidate)):
+        src = tmp_path / f"{version}.pkl"
+        with open(src, "wb") as f:
+            pickle.dump({"model": model, "scaler": None, "feature_names": FEATURE_NAMES,
+                         "classes": model.classes_, "accuracy": 0.9}, f)
+        registry.register(str(src), version)
+    for name in ("_state", "_model_signature", "shadow", "_last_model_check"):
+        monkeypatch.setattr(predict_simple, name, getattr(predict_simple, name))  # restored afterwards
+    monkeypatch.setattr(predict_simple, "registry", registry)
+
+    assert predict_simple.activate_model("v1") == "v1"
+    assert registry.active() == "v1" and [m["version"] for m in registry.versions()] == ["v1", "v2"]
+    inputs = [dict(zip(predict_simple.FEATURE_KEYS, row)) for row in X[:50]]
+    assert {r["model_version"] for r in predict_simple.predict_risk_levels(inputs)} == {"v1"}
+
+    # Requests keep being answered while the active version flips underneath them, and every
+    # answer comes from the model its version names
+    features = predict_simple.quantize_features(X[:50])
+    labels = {"v1": list(risk_model.predict(features)), "v2": list(candidate.predict(features))}
+    errors, stop = [], threading.Event()
+
+    def traffic():
+        while not stop.is_set():
+            for i, r in enumerate(predict_simple.predict_risk_levels(inputs)):
+                if r.get("error") or r["predicted_risk_level"] != labels[r["model_version"]][i]:
+                    errors.append(r)
+
+    threads = [threading.Thread(target=traffic) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for _ in range(5):
+        predict_simple.activate_model("v2")
+        predict_simple.activate_model("v1")
+    stop.set()
+    for t in threads:
+        t.join()
+    assert errors == []
+    with pytest.raises(KeyError):
+        predict_simple.activate_model("v3")
+    assert predict_simple.model_version == "v1"
+
+    scorer = predict_simple.start_shadow("v2", sample_rate=1.0)
+    predict_simple.prediction_cache.clear()  # only rows the model actually scores are shadowed
+    served = predict_simple.predict_risk_levels(inputs)
+    scorer.close()
+    stats = predict_simple.get_prediction_stats()["shadow"]
+    expected = np.mean([r["predicted_risk_level"] for r in served] == candidate.predict(
+        predict_simple.quantize_features([[r["input_features"][n.replace("μ", "u")] for n in FEATURE_NAMES]
+                                          for r in served])))
+    assert (stats["version"], stats["rows"], stats["batches"]) == ("v2", 50, 1)
+    assert stats["agreement_rate"] == pytest.approx(expected)
+    # Requests still holding a replaced scorer get a no-op, not RuntimeError
+    assert scorer.offer(X[:2], ["Low Risk", "Low Risk"], 1.0) is False
+    predict_simple.stop_shadow()
+
+
+def test_risk_grid_serves_ph_cases_only_readings(risk_model, monkeypatch):
+    monkeypatch.setattr(predict_simple, "_state", predict_simple.current_state()._replace(version="grid-test"))
+    monkeypatch.setattr(predict_simple, "risk_grid", None)
+    X, _ = synthetic_readings(200, seed=10)
+    two_feature = [{"ph": round(ph, 3), "cases": int(cases)} for ph, cases in X[:, :2]]
+    two_feature += [{"ph": 11.2, "cases": 3}, {"ph": 7.0, "cases": 500}]  # off the grid
+    full = [dict(zip(predict_simple.FEATURE_KEYS, row)) for row in X[:20]]
+    expected = predict_simple.predict_risk_levels(two_feature + full)
+
+    grid = predict_simple.build_risk_grid()
+    assert grid.verification["label_agreement"] == 1.0
+    assert grid.verification["max_probability_error"] < 1e-12
+    predict_simple.prediction_cache.clear()
+    served = predict_simple.predict_risk_levels(two_feature + full)
+    assert [r["probabilities"] for r in served] == [r["probabilities"] for r in expected]
+    assert grid.hits == 200
+    assert predict_simple.predict_risk_level(two_feature[0]) == expected[0]
+    assert grid.hits == 201
+    assert predict_simple.get_prediction_stats()["risk_grid"]["points"] == 601 * 101
+
+    monkeypatch.setattr(predict_simple, "RISK_GRID_PH_STEP", 0.5)
+    coarse = predict_simple.build_risk_grid()
+    assert coarse.shape == (13, 101) and coarse.verification["max_probability_error"] > 0
+
+
+def test_training_pipeline_caches_dataset_and_writes_loadable_model(tmp_path, monkeypatch):
+    import csv
+    from models import train
+
+    # Hand-checked rows of the notebook's risk score: pH, cases, TDS, F and NO3 points
+    X = np.array([[7.5, 0, 300, 1.0, 10, 0, 0], [6.8, 3, 600, 0.3, 30, 0, 0], [9.0, 12, 1200, 2.0, 60, 0, 0]])
+    assert train.risk_levels(X).tolist() == ['No Risk', 'Medium Risk', 'High Risk']
+
+    # Water samples in districts that appear in the bundled outbreak data
+    outbreaks = os.path.join(os.path.dirname(predict_simple.__file__), "outbreak_master.csv")
+    with open(outbreaks, encoding="utf-8") as f:
+        districts = sorted({(row["State"], row["District"]) for row in csv.DictReader(f)})[:40]
+    readings, _ = synthetic_readings(len(districts), seed=5)
+    water = tmp_path / "water.csv"
+    with open(water, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["State", "District"] + [n for n in FEATURE_NAMES if n != "Total_Cases"])
+        for (state, district), row in zip(districts, readings):
+            writer.writerow([state, district] + [round(v, 2) for i, v in enumerate(row) if i != 1])
+
+    kwargs = dict(water_path=str(water), outbreaks_path=outbreaks, cache_dir=str(tmp_path / "cache"),
+                  report_path=str(tmp_path / "report.json"))
+    first = train.run(output=str(tmp_path / "a.pkl"), jobs=2, **kwargs)
+    assert not first["dataset"]["cache_hit"] and first["dataset"]["rows"] > len(districts)
+    assert {c["model"] for c in first["candidates"]} == set(train.CANDIDATES)
+    assert all(c["fit_seconds"] > 0 and c["single_row_ms"] > 0 for c in first["candidates"])
+    assert first["candidates"][0]["accuracy"] == max(c["accuracy"] for c in first["candidates"])
+
+    # A leftover artifact next to the output would shadow the new pickle, so it is rewritten
+    (tmp_path / "b.joblib").write_bytes(b"stale")
+    second = train.run(output=str(tmp_path / "b.pkl"), candidates=("random_forest",), jobs=1, **kwargs)
+    assert second["dataset"] == dict(first["dataset"], cache_hit=True)
+    assert predict_simple._read_package(second["artifact"])["training"]["candidates"] == second["candidates"]
+
+    for name in ("_state", "_model_signature"):
+        monkeypatch.setattr(predict_simple, name, getattr(predict_simple, name))  # restored afterwards
+    predict_simple.load_model(first["output"])
+    result = predict_simple.predict_risk_level({"ph": 9.2, "cases": 15, "tds": 1500})
+    assert result["predicted_risk_level"] in train.RISK_LEVELS
@@ -1 +1,226 @@
-# test_routes.py placeholder
+#!/usr/bin/env python3
+"""
+Tests for the /api routes in routes/health_routes.py.
+"""
+import fcntl
+import os
+import sys
+
+import pytest
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import sqlite_db
+import routes.health_routes as health_routes
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client backed by a temp database and CSV log."""
+    monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(health_routes, "CSV_PATH", str(tmp_path / "reports.csv"))
+    from app import create_app
+    app = create_app()
+    yield app.test_client()
+    sqlite_db.close_db()
+
+
+def _seed_reports(count):
+    reports = sqlite_db.get_collection("REPORTS")
+    # Two reports per timestamp so pages have to break ties on id
+    reports.insert_many([
+        {"timestamp": f"2025-01-01T00:{i // 2:02d}:00", "location_name": f"Site {i}", "cases": i}
+        for i in range(count)
+    ])
+    sqlite_db.release_connection()
+
+
+def test_reports_keyset_pagination(client):
+    _seed_reports(25)
+
+    seen = []
+    page = client.get("/api/reports?limit=10").get_json()
+    assert page["before"] is None
+    while True:
+        seen.extend(r["cases"] for r in page["items"])
+        if not page["next"]:
+            break
+        page = client.get(f"/api/reports?limit=10&next={page['next']}").get_json()
+    assert seen == list(range(24, -1, -1))
+
+    # Walk back from the last page towards the newest reports
+    back = client.get(f"/api/reports?limit=10&before={page['before']}").get_json()
+    assert [r["cases"] for r in back["items"]] == list(range(14, 4, -1))
+
+    alerts = client.get("/api/alerts?limit=5").get_json()
+    assert len(alerts["alerts"]) == 5 and alerts["next"]
+
+    assert client.get("/api/reports?next=garbage").status_code == 400
+
+
+def test_reports_pagination_reaches_reports_without_timestamp(client):
+    _seed_reports(6)
+    sqlite_db.get_collection("REPORTS").insert_many([{"location_name": "Undated", "cases": 100 + i} for i in range(5)])
+    sqlite_db.release_connection()
+
+    seen, pages = [], [client.get("/api/reports?limit=4").get_json()]
+    while True:
+        seen.extend(r["cases"] for r in pages[-1]["items"])
+        if not pages[-1]["next"]:
+            break
+        pages.append(client.get(f"/api/reports?limit=4&next={pages[-1]['next']}").get_json())
+    assert seen == list(range(5, -1, -1)) + list(range(104, 99, -1))
+
+    # Paging back out of the undated tail returns the previous page
+    back = client.get(f"/api/reports?limit=4&before={pages[-1]['before']}").get_json()
+    assert back["items"] == pages[-2]["items"]
+
+
+def test_reports_pages_seek_the_index_at_any_depth(client):
+    _seed_reports(30)
+    sqlite_db.get_collection("REPORTS").insert_many([{"location_name": "Undated", "cases": 100 + i} for i in range(5)])
+    conn = sqlite_db.get_read_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        page = health_routes.get_reports_page(4)
+        while page["next"]:
+            page = health_routes.get_reports_page(4, next_cursor=page["next"])
+        health_routes.get_reports_page(4, before_cursor=page["before"])
+        health_routes.get_reports_page(4, before_cursor=health_routes.encode_cursor("2025-01-01T00:05:00", 11))
+    finally:
+        conn.set_trace_callback(None)
+
+    plans = [" | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql))
+             for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+    assert len(plans) > 10
+    for plan in plans:
+        assert plan.startswith("SEARCH reports USING") and "TEMP B-TREE" not in plan, plan
+    sqlite_db.release_connection()
+
+
+def test_report_search_ranks_and_highlights(client):
+    reports = sqlite_db.get_collection("REPORTS")
+    reports.insert_many([
+        {"timestamp": "2025-01-01", "location_name": "Madurai Temple", "symptoms": "Mild fever, stomach upset"},
+        {"timestamp": "2025-01-02", "location_name": "Jaipur", "symptoms": "Severe vomiting <b>and</b> fever"},
+        {"timestamp": "2025-01-03", "location_name": "Pune", "symptoms": "No symptoms"},
+    ])
+    sqlite_db.release_connection()
+
+    items = client.get("/api/reports/search?q=vomit fever").get_json()["items"]
+    assert [r["location_name"] for r in items] == ["Jaipur"]
+    assert "<mark>vomiting</mark>" in items[0]["snippet"]
+    assert "&lt;b&gt;" in items[0]["snippet"]
+
+    assert len(client.get("/api/reports/search?q=fever").get_json()["items"]) == 2
+    assert client.get("/api/reports/search?q=madurai").get_json()["items"][0]["symptoms"].startswith("Mild")
+    assert client.get("/api/reports/search").status_code == 400
+
+
+def test_spatial_report_queries(client):
+    reports = sqlite_db.get_collection("REPORTS")
+    reports.insert_many([
+        {"timestamp": "2025-01-01", "location_name": "Well", "lat": 26.1445, "lng": 91.7362},
+        {"timestamp": "2025-01-01", "location_name": "Village 5km", "lat": 26.1895, "lng": 91.7362},
+        {"timestamp": "2025-01-01", "location_name": "Town 30km", "lat": 26.4145, "lng": 91.7362},
+        {"timestamp": "2025-01-01", "location_name": "No GPS"},
+    ])
+    sqlite_db.release_connection()
+
+    near = client.get("/api/reports/near?lat=26.1445&lng=91.7362&radius_km=10").get_json()["items"]
+    assert [r["location_name"] for r in near] == ["Well", "Village 5km"]
+    assert 4.9 < near[1]["distance_km"] < 5.1
+
+    box = client.get("/api/reports/bbox?min_lat=26&min_lng=91&max_lat=26.5&max_lng=92").get_json()["items"]
+    assert len(box) == 3
+
+    assert client.get("/api/reports/near?lat=abc&lng=1").status_code == 400
+
+    # Neighbours across the antimeridian, and around a pole
+    reports.insert_many([
+        {"timestamp": "2025-01-01", "location_name": "Fiji east", "lat": -17.0, "lng": 179.98},
+        {"timestamp": "2025-01-01", "location_name": "Fiji west", "lat": -17.0, "lng": -179.98},
+        {"timestamp": "2025-01-01", "location_name": "Pole camp", "lat": 89.99, "lng": -120.0},
+    ])
+    sqlite_db.release_connection()
+    near = client.get("/api/reports/near?lat=-17&lng=179.99&radius_km=10").get_json()["items"]
+    assert sorted(r["location_name"] for r in near) == ["Fiji east", "Fiji west"]
+    near = client.get("/api/reports/near?lat=89.99&lng=60&radius_km=5").get_json()["items"]
+    assert [r["location_name"] for r in near] == ["Pole camp"]
+    box = client.get("/api/reports/bbox?min_lat=-18&min_lng=179&max_lat=-16&max_lng=-179").get_json()["items"]
+    assert sorted(r["location_name"] for r in box) == ["Fiji east", "Fiji west"]
+    assert client.get("/api/reports/bbox?min_lat=1&min_lng=0&max_lat=0&max_lng=1").status_code == 400
+
+
+def test_async_report_scoring(client, monkeypatch):
+    scored = []
+
+    def fake_predictions(inputs):
+        scored.append(len(inputs))
+        return [{"predicted_risk_level": "High Risk", "confidence": 0.9} if row["ph"] < 9 else
+                {"error": "Prediction failed: bad reading", "predicted_risk_level": None, "confidence": None}
+                for row in inputs]
+
+    monkeypatch.setattr(health_routes, "REPORT_ASYNC_SCORING", True)
+    monkeypatch.setattr(health_routes, "_report_scorer", None)
+    monkeypatch.setattr(health_routes, "predict_risk_levels", fake_predictions)
+
+    resp = client.post("/api/report", json={"location_name": "Well", "ph": 7.0, "cases": 7, "tds": 300})
+    body = resp.get_json()
+    assert resp.status_code == 201
+    assert (body["ai_status"], body["risk"], body["ai_prediction"]) == ("pending", "Medium", None)
+    failing = client.post("/api/report", json={"ph": 9.5, "cases": 1}).get_json()
+    unscored = client.post("/api/report", json={"cases": 2}).get_json()
+    assert "ai_status" not in unscored
+
+    health_routes.report_scorer().close()  # drains the queue
+    report = client.get(f"/api/report/{body['id']}").get_json()
+    assert (report["ai_status"], report["ai_prediction"], report["risk"]) == ("scored", "High Risk", "High Risk")
+    assert client.get(f"/api/report/{failing['id']}").get_json()["ai_status"] == "failed"
+    assert client.get(f"/api/report/{unscored['id']}").get_json()["ai_status"] is None
+    assert client.get("/api/report/999").status_code == 404
+    assert sum(scored) == 2
+
+    # Reports still pending when the process stopped are picked up again, by one process only
+    leftover = sqlite_db.get_collection("REPORTS").insert_one({"ph": 7.5, "cases": 3, "ai_status": "pending"})
+    monkeypatch.setattr(health_routes, "_requeue_lock", None)
+    with open(f"{sqlite_db.db_path}.requeue.lock", "a") as other_worker:
+        fcntl.flock(other_worker, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        assert health_routes.requeue_pending_reports() == 0
+    assert health_routes.requeue_pending_reports() == 1
+    health_routes.report_scorer().close()
+    assert client.get(f"/api/report/{leftover.inserted_id}").get_json()["ai_prediction"] == "High Risk"
+
+    # With the scorer and the model both unavailable the report is still stored
+    def broken(*_):
+        raise RuntimeError("down")
+
+    monkeypatch.setattr(health_routes, "report_scorer", broken)
+    monkeypatch.setattr(health_routes, "score_risk_level", broken)
+    resp = client.post("/api/report", json={"ph": 7.0, "cases": 4})
+    assert resp.status_code == 201 and resp.get_json()["risk"] == "Low"
+    assert client.get(f"/api/report/{resp.get_json()['id']}").get_json()["ai_status"] == "failed"
+
+
+def test_model_admin_routes(client, tmp_path, monkeypatch):
+    from models import predict_simple
+    from models.registry import ModelRegistry
+
+    monkeypatch.setattr(predict_simple, "registry", ModelRegistry(str(tmp_path / "registry")))
+    body = client.get("/api/models").get_json()
+    assert (body["versions"], body["registry_active"], body["shadow"]) == ([], None, None)
+
+    # Without a configured token the admin calls are refused outright
+    monkeypatch.setattr(health_routes, "MODEL_ADMIN_TOKEN", None)
+    assert client.post("/api/models/activate", json={"version": "nope"}).status_code == 403
+    assert client.post("/api/models/shadow", json={}).status_code == 403
+
+    monkeypatch.setattr(health_routes, "MODEL_ADMIN_TOKEN", "secret")
+    assert client.post("/api/models/activate", json={"version": "nope"}).status_code == 403
+    admin = {"X-Admin-Token": "secret"}
+    assert client.post("/api/models/activate", json={"version": "nope"}, headers=admin).status_code == 404
+    assert client.post("/api/models/activate", json={"version": "../etc"}, headers=admin).status_code == 400
+    assert client.post("/api/models/shadow", json={"version": "nope"}, headers=admin).status_code == 404
+    assert client.post("/api/models/shadow", json={}, headers=admin).get_json()["shadow"] is None
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar snapshot export in database/snapshot.py.
+"""
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import snapshot, sqlite_db
+
+
+def _insert_reports(start, stop):
+    sqlite_db.get_collection("REPORTS").insert_many([
+        {"timestamp": f"2025-01-01T00:{i:02d}:00", "location_name": "Agra" if i % 2 else "Pune",
+         "cases": None if i == 3 else i, "ph": 7.0 + i / 10, "ai_prediction": "High Risk" if i > 4 else None}
+        for i in range(start, stop)
+    ])
+
+
+def test_reports_snapshot_is_incremental_and_memory_mapped(db, tmp_path):
+    out = str(tmp_path / "reports")
+    _insert_reports(0, 6)
+    assert snapshot.export_dataset(out, "reports")["rows"] == 6
+
+    # A crashed export leaves bytes past the manifest's row count behind
+    with open(os.path.join(out, "ph.bin"), "ab") as f:
+        f.write(b"\0" * 12)
+    _insert_reports(6, 10)
+    assert snapshot.export_dataset(out, "reports")["rows"] == 10
+    assert snapshot.export_dataset(out, "reports")["rows"] == 10
+
+    snap = snapshot.load_snapshot(out)
+    assert isinstance(snap["ph"], np.memmap)
+    np.testing.assert_allclose(snap["ph"], [7.0 + i / 10 for i in range(10)])
+    assert snap["timestamp"][1] == np.datetime64("2025-01-01T00:01:00")
+    assert list(snap.valid("cases")).index(False) == 3
+
+    df = snap.to_pandas()
+    assert df["location_name"].tolist()[:2] == ["Pune", "Agra"]
+    assert df["cases"].isna().tolist() == [i == 3 for i in range(10)]
+    assert df["ai_prediction"].isna().sum() == 5
+
+
+def test_reports_snapshot_picks_up_backdated_updated_and_deleted_reports(db, tmp_path):
+    out = str(tmp_path / "reports")
+    _insert_reports(0, 6)
+    snapshot.export_dataset(out, "reports")
+
+    reports = sqlite_db.get_collection("REPORTS")
+    reports.insert_one({"timestamp": "2024-12-31T00:00:00", "location_name": "Late", "cases": 1})
+    reports.update_one({"cases": 2}, {"$set": {"ai_prediction": "Low Risk", "ph": 6.5}})
+    manifest = snapshot.export_dataset(out, "reports")
+    assert manifest["rows"] == 7 and manifest["watermark"]["id"] == 7
+
+    snap = snapshot.load_snapshot(out)
+    df = snap.to_pandas()
+    assert df["location_name"].iloc[-1] == "Late"
+    assert (df["ai_prediction"].iloc[2], df["ph"].iloc[2]) == ("Low Risk", 6.5)
+    assert snapshot.export_dataset(out, "reports")["rows"] == 7
+
+    # Deleting an exported report rebuilds the snapshot without it
+    reports.delete_one({"cases": 4})
+    snapshot.export_dataset(out, "reports")
+    snap = snapshot.load_snapshot(out)
+    assert list(snap["id"]) == [1, 2, 3, 4, 6, 7]
+
+
+def test_reports_snapshot_updates_are_copy_on_write(db, tmp_path):
+    out = str(tmp_path / "reports")
+    _insert_reports(0, 6)
+    snapshot.export_dataset(out, "reports")
+    before = snapshot.load_snapshot(out)
+
+    reports = sqlite_db.get_collection("REPORTS")
+    reports.update_one({"cases": 2}, {"$set": {"ai_prediction": "Medium Risk"}})
+    assert snapshot.export_dataset(out, "reports")["generation"] == 1
+
+    # The published generation is untouched; the new codes live in the next one
+    assert before.to_pandas()["ai_prediction"].isna().iloc[2]
+    assert snapshot.load_snapshot(out).to_pandas()["ai_prediction"].iloc[2] == "Medium Risk"
+
+    for generation, label in ((2, "Low Risk"), (3, "High Risk")):
+        reports.update_one({"cases": 2}, {"$set": {"ai_prediction": label}})
+        assert snapshot.export_dataset(out, "reports")["generation"] == generation
+    assert os.path.exists(os.path.join(out, "ph.g2.bin"))
+    assert not os.path.exists(os.path.join(out, "ph.g1.bin"))
+    assert snapshot.load_snapshot(out).to_pandas()["ai_prediction"].iloc[2] == "High Risk"
+
+
+def test_outbreak_snapshot_coerces_csv(db, tmp_path, monkeypatch):
+    csv_path = tmp_path / "outbreaks.csv"
+    csv_path.write_text(
+        "Unique_ID,State,District,Disease,Cases,Deaths,Start_Date,Report_Date,Status,Comments\n"
+        "BH/SUP/2019/01/01,Bihar,Supaul,Measles,05,00,02-01-19,06-01-19,outbreak,survey done\n"
+    )
+    monkeypatch.setattr(snapshot, "OUTBREAKS_CSV", str(csv_path))
+    out = str(tmp_path / "outbreaks")
+    snapshot.export_dataset(out, "outbreaks")
+
+    snap = snapshot.load_snapshot(out)
+    assert snap["Cases"][0] == 5
+    assert snap["Start_Date"][0] == np.datetime64("2019-01-02")
+    assert snap.values("District")[snap["District"][0]] == "Supaul"
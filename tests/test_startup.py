@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: how long importing the app and calling create_app() takes.
+
+Runs in a fresh interpreter so the numbers reflect a cold gunicorn worker.
+Run with `pytest -s tests/test_startup.py` to see the timings.
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous default; tighten locally with STARTUP_BUDGET_S to catch regressions
+STARTUP_BUDGET_S = float(os.environ.get("STARTUP_BUDGET_S", "5"))
+
+# Modules only needed once a prediction is made
+HEAVY_MODULES = ["pandas", "sklearn", "joblib", "scipy", "matplotlib"]
+
+SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.create_app()
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "create_app_s": t2 - t1,
+                  "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def test_create_app_startup_cost(tmp_path):
+    env = dict(os.environ, SQLITE_DB_PATH=str(tmp_path / "startup.db"), PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    timings = json.loads(out.strip().splitlines()[-1])
+    total = timings["import_s"] + timings["create_app_s"]
+    print(f"\nimport app: {timings['import_s'] * 1000:.0f} ms, "
+          f"create_app(): {timings['create_app_s'] * 1000:.0f} ms")
+
+    assert timings["loaded"] == []
+    assert total < STARTUP_BUDGET_S